@@ -1,23 +1,22 @@
+import logging
 import pandas as pd
-from tkinter import *
-from tkinter import ttk
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import PatternFill, Font, Alignment
 from math import ceil
-import re
-from PIL import Image, ImageTk
-import traceback
 import os
+import time
 import numpy as np
 import warnings 
-import contextlib
+
+try:
+    from .cadastros import obter_cadastros
+except ImportError:
+    # Executado de dentro da própria pasta (python main.py)
+    from cadastros import obter_cadastros
+
+logger = logging.getLogger(__name__)
 
 # Suppress xlrd / Excel warnings
 warnings.simplefilter("ignore")
 
-# Optionally suppress all print output from the engine
-with contextlib.redirect_stdout(None), contextlib.redirect_stderr(None):
-    df = pd.read_excel("Template.xlsx", engine="openpyxl")
 warnings.filterwarnings(
     "ignore",
     category=UserWarning,
@@ -35,8 +34,20 @@ warnings.filterwarnings(
 
 
 
-caminho_base = os.getcwd()
-    
+# Pasta do Viajante: BD, Demandas e as planilhas da interface partem daqui, não do cwd do processo
+caminho_base = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_TEMPLATE = os.path.join(caminho_base, 'Template.xlsx')
+ARQUIVO_VIAJANTE = os.path.join(caminho_base, 'VIAJANTE.xlsx')
+ARQUIVO_VOLUME = os.path.join(caminho_base, 'Volume_por_rota.xlsx')
+
+
+def marcar_tempo(tempos, etapa, inicio):
+    """Soma em tempos[etapa] os segundos desde inicio (tempos=None não mede); retorna o novo início"""
+    agora = time.perf_counter()
+    if tempos is not None:
+        tempos[etapa] = tempos.get(etapa, 0.0) + (agora - inicio)
+    return agora
+
 
 def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
     """
@@ -48,7 +59,7 @@ def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
 
     # Verifica se a pasta de demandas existe
     if not os.path.isdir(caminho_pasta):
-        print(f"Aviso: A pasta '{caminho_pasta}' não foi encontrada.")
+        logger.warning("A pasta '%s' não foi encontrada.", caminho_pasta)
         return pd.DataFrame()
 
     # Lista para armazenar os DataFrames de cada arquivo processado
@@ -116,7 +127,7 @@ def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
 
                 # Verifica se todas as colunas necessárias existem no arquivo
                 if not all(coluna in df_excel.columns for coluna in colunas_originais_necessarias):
-                    print(f"Aviso: O arquivo '{nome_arquivo}' não contém todas as colunas necessárias e será ignorado.")
+                    logger.warning("O arquivo '%s' não contém todas as colunas necessárias e será ignorado.", nome_arquivo)
                     continue
 
                 # 1. Seleciona apenas as colunas que nos interessam
@@ -129,13 +140,13 @@ def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
                 lista_dfs.append(df_temp)
 
         except Exception as e:
-            print(f"Erro ao processar o arquivo '{nome_arquivo}': {e}")
+            logger.error("Erro ao processar o arquivo '%s': %s", nome_arquivo, e)
             continue
 
     # --- LÓGICA FINAL PARA CONSOLIDAR OS DADOS ---
     # Se a lista de DataFrames estiver vazia, retorna um DataFrame vazio
     if not lista_dfs:
-        print("Nenhum dado válido foi processado.")
+        logger.debug('Nenhum dado válido foi processado.')
         return pd.DataFrame()
     
     # Concatena todos os DataFrames da lista em um único DataFrame final
@@ -187,7 +198,7 @@ def desenhar_caminhoes(canvas, ocupacao, caminhao_img):
             x_offset = margem + 90  # centraliza abaixo dos dois
             y_offset = margem + 130
 
-        canvas.create_image(x_offset + 12, y_offset + 17, image=caminhao_img, anchor=NW)
+        canvas.create_image(x_offset + 12, y_offset + 17, image=caminhao_img, anchor="nw")
 
         x_inicial_grade = x_offset + 50
         y_inicial_grade = y_offset + 10
@@ -204,134 +215,271 @@ def desenhar_caminhoes(canvas, ocupacao, caminhao_img):
 
 
 
-def calcular_empilhamento_line_haul(df_saturacao, db_empilhamento):
-    empilhamento_rows = []
+COLUNAS_EMPILHAMENTO = [
+    'FORNECEDOR', 'EMBALAGEM_BASE', 'EMBALAGEM_SOBREPOSTA', 'CAPACIDADE_VEÍCULO',
+    'TOTAL_DE_EMBALAGENS_BASE', 'TOTAL_DE_EMBALAGENS_SOBREPOSTA',
+    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR', 'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR',
+    'EMBALAGENS_BASE_RESTANTE', 'EMBALAGENS_SOBREPOSTA_RESTANTE', 'CHAVE',
+    'TOTAL_EMBALAGENS_EMPILHADAS', 'SATURAÇÃO', 'EMPILHAMENTO BASE'
+]
+
 
+def _empilhar(df_saturacao, db_empilhamento, empilhamento_fixo=None):
+    """
+    Motor de empilhamento: cruza embalagens base x sobrepostas do mesmo fornecedor por merge
+    com as regras de (COD FORNECEDOR, MDR BASE, MDR SOBREPOSTA) e calcula quantos conjuntos
+    cabem de uma vez.
+
+    Cada conjunto usa EMPILHAMENTO BASE caixas base + 1 sobreposta, então o número de conjuntos é
+    min(base // emp_base, floor(sobrepostas)) - o mesmo resultado de decrementar caixa a caixa.
+    empilhamento_fixo: usa esse valor no lugar do EMPILHAMENTO BASE do cadastro (line haul = 1).
+    """
     base_df = df_saturacao[df_saturacao['EMBALAGEM_BASE'] == 1]
     sobre_df = df_saturacao[df_saturacao['EMBALAGEM_SOBREPOSTA'] == 1]
+    if base_df.empty or sobre_df.empty:
+        return pd.DataFrame()
 
-    for _, base_row in base_df.iterrows():
-        for _, sobre_row in sobre_df.iterrows():
-            if base_row['COD FORNECEDOR'] == sobre_row['COD FORNECEDOR']:
-                fornecedor = base_row['COD FORNECEDOR']
-                embal_base = base_row['EMBALAGEM']
-                embal_sobre = sobre_row['EMBALAGEM']
-
-                empilhamento_match = db_empilhamento[
-                    (db_empilhamento['COD FORNECEDOR'] == fornecedor) &
-                    (db_empilhamento['MDR BASE'] == embal_base) &
-                    (db_empilhamento['MDR SOBREPOSTA'] == embal_sobre)
-                ]
+    base = pd.DataFrame({
+        'ORDEM_BASE': np.arange(len(base_df)),
+        'COD FORNECEDOR': base_df['COD FORNECEDOR'].astype(object).values,
+        'MDR BASE': base_df['EMBALAGEM'].astype(object).values,
+        'CAPACIDADE_VEÍCULO': base_df['CAPACIDADE'].values,
+        'TOTAL_DE_EMBALAGENS_BASE': base_df['TOTAL DE CXS'].values,
+    })
+    sobre = pd.DataFrame({
+        'ORDEM_SOBRE': np.arange(len(sobre_df)),
+        'COD FORNECEDOR': sobre_df['COD FORNECEDOR'].astype(object).values,
+        'MDR SOBREPOSTA': sobre_df['EMBALAGEM'].astype(object).values,
+        'TOTAL_DE_EMBALAGENS_SOBREPOSTA': sobre_df['TOTAL DE CXS'].values,
+    })
+
+    # Primeira regra cadastrada para cada (fornecedor, base, sobreposta), como no filtro .iloc[0]
+    chaves = ['COD FORNECEDOR', 'MDR BASE', 'MDR SOBREPOSTA']
+    regras = db_empilhamento[chaves + ['EMPILHAMENTO BASE']].dropna(subset=chaves)
+    regras = regras.astype({c: object for c in chaves}).drop_duplicates(chaves)
+
+    # base -> regras -> sobreposta: só os pares cadastrados são gerados
+    pares = base.merge(regras, on=['COD FORNECEDOR', 'MDR BASE'])
+    pares = pares.merge(sobre, on=['COD FORNECEDOR', 'MDR SOBREPOSTA'])
+    if pares.empty:
+        return pd.DataFrame()
+    pares = pares.sort_values(['ORDEM_BASE', 'ORDEM_SOBRE'], kind='mergesort').reset_index(drop=True)
+
+    if empilhamento_fixo is not None:
+        pares['EMPILHAMENTO BASE'] = empilhamento_fixo
+    total_base = pares['TOTAL_DE_EMBALAGENS_BASE']
+    total_sobre = pares['TOTAL_DE_EMBALAGENS_SOBREPOSTA']
+    emp_base = pares['EMPILHAMENTO BASE']
+
+    # Conjuntos empilhados: limitados pelas sobrepostas e, com emp_base > 0, pelas bases
+    inicia = (total_base >= emp_base) & (total_sobre >= 1)
+    limite_base = np.floor_divide(total_base, emp_base.where(emp_base > 0))
+    conjuntos = np.floor(total_sobre).where(~(emp_base > 0), np.minimum(limite_base, np.floor(total_sobre)))
+    conjuntos = conjuntos.where(inicia, 0).astype(int)
+
+    usadas_base = (conjuntos * emp_base).where(conjuntos > 0, 0)
+
+    resultado = pd.DataFrame({
+        'FORNECEDOR': pares['COD FORNECEDOR'],
+        'EMBALAGEM_BASE': pares['MDR BASE'],
+        'EMBALAGEM_SOBREPOSTA': pares['MDR SOBREPOSTA'],
+        'CAPACIDADE_VEÍCULO': pares['CAPACIDADE_VEÍCULO'],
+        'TOTAL_DE_EMBALAGENS_BASE': total_base,
+        'TOTAL_DE_EMBALAGENS_SOBREPOSTA': total_sobre,
+        'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
+        'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': conjuntos,
+        'EMBALAGENS_BASE_RESTANTE': total_base - usadas_base,
+        'EMBALAGENS_SOBREPOSTA_RESTANTE': total_sobre - conjuntos,
+        'CHAVE': (pares['COD FORNECEDOR'].map(str) + '-' + pares['MDR BASE'].map(str) + '-'
+                  + pares['MDR SOBREPOSTA'].map(str)),
+        'TOTAL_EMBALAGENS_EMPILHADAS': usadas_base + conjuntos,
+        'SATURAÇÃO': (usadas_base + conjuntos) / pares['CAPACIDADE_VEÍCULO'],
+        'EMPILHAMENTO BASE': emp_base,
+    })
+    # FORNECEDOR/EMBALAGENS voltam aos tipos inferidos das linhas originais
+    return resultado.infer_objects()[COLUNAS_EMPILHAMENTO]
 
-                if empilhamento_match.empty:
-                    continue
 
-                capacidade_veiculo = base_row['CAPACIDADE']
-
-                total_base = base_row['TOTAL DE CXS']
-                total_sobre = sobre_row['TOTAL DE CXS']
-
-                usadas_base = 0
-                usadas_sobre = 0
-
-                # Empilha 1 base com 1 sobreposta (não considera EMPILHAMENTO BASE)
-                while total_base >= 1 and total_sobre >= 1:
-                    total_base -= 1
-                    total_sobre -= 1
-                    usadas_base += 1
-                    usadas_sobre += 1
-
-                total_empilhado = usadas_base + usadas_sobre
-                chave = f"{fornecedor}-{embal_base}-{embal_sobre}"
-               
-                saturacao = total_empilhado / capacidade_veiculo
-
-                empilhamento_rows.append({
-                    'FORNECEDOR': fornecedor,
-                    'EMBALAGEM_BASE': embal_base,
-                    'EMBALAGEM_SOBREPOSTA': embal_sobre,
-                    'CAPACIDADE_VEÍCULO': capacidade_veiculo,
-                    'TOTAL_DE_EMBALAGENS_BASE': base_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA': sobre_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': usadas_sobre,
-                    'EMBALAGENS_BASE_RESTANTE': total_base,
-                    'EMBALAGENS_SOBREPOSTA_RESTANTE': total_sobre,
-                    'CHAVE': chave,
-                    'TOTAL_EMBALAGENS_EMPILHADAS': total_empilhado,
-                    'SATURAÇÃO': saturacao,
-                    'EMPILHAMENTO BASE': 1  # fixo, pois é 1:1
-                })
-
-    return pd.DataFrame(empilhamento_rows)
+def calcular_empilhamento_line_haul(df_saturacao, db_empilhamento):
+    # Empilha 1 base com 1 sobreposta (não considera EMPILHAMENTO BASE)
+    return _empilhar(df_saturacao, db_empilhamento, empilhamento_fixo=1)
 
 
 def calcular_empilhamento(df_saturacao, db_empilhamento):
-    empilhamento_rows = []
+    return _empilhar(df_saturacao, db_empilhamento)
 
-    base_df = df_saturacao[df_saturacao['EMBALAGEM_BASE'] == 1]
-    sobre_df = df_saturacao[df_saturacao['EMBALAGEM_SOBREPOSTA'] == 1]
 
-    for _, base_row in base_df.iterrows():
-        for _, sobre_row in sobre_df.iterrows():
-            if base_row['COD FORNECEDOR'] == sobre_row['COD FORNECEDOR']:
-                fornecedor = base_row['COD FORNECEDOR']
-                embal_base = base_row['EMBALAGEM']
-                embal_sobre = sobre_row['EMBALAGEM']
 
-                empilhamento_match = db_empilhamento[
-                    (db_empilhamento['COD FORNECEDOR'] == fornecedor) &
-                    (db_empilhamento['MDR BASE'] == embal_base) &
-                    (db_empilhamento['MDR SOBREPOSTA'] == embal_sobre)
-                ]
 
-                if empilhamento_match.empty:
-                    continue
 
-                emp_base = empilhamento_match.iloc[0]['EMPILHAMENTO BASE']
-                capacidade_veiculo = base_row['CAPACIDADE']
+def tipar_como_excel(df, dtype=None):
+    """
+    Aplica a um DataFrame em memória a mesma inferência de tipos de uma ida e volta
+    pelo Excel (to_excel + read_excel): colunas de texto cujos valores são todos
+    numéricos viram números e colunas totalmente vazias viram float (NaN).
+    dtype: tipos explícitos por coluna, como no read_excel.
+    """
+    df = df.copy()
+    dtype = dtype or {}
+    for col in df.columns:
+        if col in dtype:
+            continue
+        serie = df[col]
+        if not (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+            continue
+        nao_nulos = serie.dropna()
+        if nao_nulos.empty:
+            df[col] = np.nan
+        elif pd.to_numeric(nao_nulos, errors='coerce').notna().all():
+            df[col] = pd.to_numeric(serie, errors='coerce')
+    for col, tipo in dtype.items():
+        if col not in df.columns:
+            continue
+        if tipo is str:
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        else:
+            df[col] = df[col].astype(tipo)
+    return df
+
 
-                total_base = base_row['TOTAL DE CXS']
-                total_sobre = sobre_row['TOTAL DE CXS']
+def pertence_aos_pares(chave_1, chave_2, pares):
+    """1 quando o par (chave_1, chave_2) da linha está no conjunto de pares, senão 0"""
+    if not pares:
+        return pd.Series(0, index=chave_1.index)
+    indice = pd.MultiIndex.from_arrays([chave_1.astype(object), chave_2.astype(object)])
+    return pd.Series(indice.isin(list(pares)).astype(int), index=chave_1.index)
 
-                usadas_base = 0
-                usadas_sobre = 0
 
-                while total_base >= emp_base and total_sobre >= 1:
-                    total_base -= emp_base
-                    total_sobre -= 1
-                    usadas_base += emp_base
-                    usadas_sobre += 1
+def resolver_capacidade(embalagens, codigos_veiculo, cadastros, rotulo='cod veic'):
+    """
+    Capacidade de cada par (embalagem, veículo): o código do veículo vira a coluna de capacidade
+    do db_MDR (ex: 4 -> "14 x 2,4 x 2,78") e um único merge com cadastros.capacidade_por_mdr
+    traz o valor, comparando o MDR exato em caixa alta. Retorna uma Series alinhada a embalagens
+    (None/NaN quando não há capacidade).
+    """
+    chaves = pd.DataFrame({
+        'MDR': embalagens.map(lambda v: str(v).upper()).astype(object),
+        'VEICULOS': codigos_veiculo.map(cadastros.mapa_coluna_capacidade).astype(object),
+    }, index=embalagens.index)
 
-                total_empilhado = usadas_base + usadas_sobre
-                chave = f"{fornecedor}-{embal_base}-{embal_sobre}"
-                
-                saturacao = total_empilhado / capacidade_veiculo
+    for cod_veic in codigos_veiculo[chaves['VEICULOS'].isna()].dropna().unique():
+        logger.error('Código de veículo (%s) %s não mapeado (falta em VEÍCULOS.xlsx)', rotulo, cod_veic)
+    colunas_ausentes = set(chaves['VEICULOS'].dropna()) - set(cadastros.db_MDR_capacidade.columns)
+    for coluna in colunas_ausentes:
+        logger.error("Coluna '%s' não encontrada no db_MDR (%s)", coluna, rotulo)
+
+    capacidades = cadastros.capacidade_por_mdr.astype({'MDR': object, 'VEICULOS': object})
+    resultado = chaves.merge(capacidades, on=['MDR', 'VEICULOS'], how='left')
+    capacidade = pd.Series(resultado['CAPACIDADE'].values, index=embalagens.index)
+
+    faltantes = chaves[capacidade.isna() & chaves['VEICULOS'].notna() & ~chaves['VEICULOS'].isin(colunas_ausentes)]
+    for mdr, coluna in faltantes.drop_duplicates().itertuples(index=False):
+        logger.warning("Capacidade não encontrada para MDR %s na coluna '%s' (%s)", mdr, coluna, rotulo)
+    return capacidade
+
+
+def normalizar_template(template):
+    """Tipos do template em memória iguais aos da leitura do Template.xlsx"""
+    return tipar_como_excel(template, dtype={'COD FORNECEDOR': int, 'DESENHO': str})
 
-                empilhamento_rows.append({
-                    'FORNECEDOR': fornecedor,
-                    'EMBALAGEM_BASE': embal_base,
-                    'EMBALAGEM_SOBREPOSTA': embal_sobre,
-                    'CAPACIDADE_VEÍCULO': capacidade_veiculo,
-                    'TOTAL_DE_EMBALAGENS_BASE': base_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA': sobre_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': usadas_sobre,
-                    'EMBALAGENS_BASE_RESTANTE': total_base,
-                    'EMBALAGENS_SOBREPOSTA_RESTANTE': total_sobre,
-                    'CHAVE': chave,
-                    'TOTAL_EMBALAGENS_EMPILHADAS': total_empilhado,
-                    'SATURAÇÃO': saturacao,
-                    'EMPILHAMENTO BASE': emp_base
-                })
 
-    return pd.DataFrame(empilhamento_rows)
+COLUNAS_TEMPLATE = [
+    'COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO', 'QTDE', 'DESCRIÇÃO MATERIAL',
+    'MDR', 'DESCRIÇÃO DA EMBALAGEM', 'QME', 'QTD EMBALAGENS', 'TIPO SATURACAO',
+    'VEICULO', 'M³', 'PESO MAT', 'PESO MDR', 'PESO TOTAL', 'PESO_MAXIMO', 'Mês'
+]
 
 
+def enriquecer_template(template, cadastros):
+    """
+    Enriquecimento do template pelos cadastros (MDR, QME, embalagens, M³ e pesos).
+    Só PESO_MAXIMO depende do veículo da linha; o resto vale para qualquer veículo.
+    """
+    # --- Mapeamentos únicos para .map() seguros ---
+    mapa_fornecedores = cadastros.mapa_fornecedores
+
+    # Mapas baseados na chave composta
+    mapa_pn = cadastros.mapa_pn
+    mapa_mdr = cadastros.mapa_mdr
+    mapa_qme = cadastros.mapa_qme
+    mapa_peso_pn = cadastros.mapa_peso_pn
 
+    # Mapas vindos do db_MDR
+    mapa_descricao_mdr = cadastros.mapa_descricao_mdr
+    mapa_volume = cadastros.mapa_volume
+    mapa_peso_mdr = cadastros.mapa_peso_mdr
+    mapa_peso_max = cadastros.mapa_peso_max
 
+    # Passo 1: primeiro trazer MDR pelo DESENHO, para podermos montar a KEY
+    template['MDR'] = template['DESENHO'].map(cadastros.mapa_mdr_por_desenho)
+
+
+    # Passo 2: agora que já temos MDR no template, podemos montar a KEY
+    template['KEY'] = template['DESENHO'].astype(str) + '_' + template['MDR'].astype(str)
+    
 
-def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao_img, usar_manual=False,caminho_BD = 'BD'):
+    # Passo 3: enriquecer com os mapas
+    template['PESO_MAXIMO'] = template['VEICULO'].map(mapa_peso_max)
+    template['MAP_KEY'] = (template['COD IMS'].fillna(template['COD FORNECEDOR']).astype(str).str.split('/').str[0] )
+
+   
+    template['MAP_KEY'] = pd.to_numeric(template['MAP_KEY'], errors='coerce')
+    template['FORNECEDOR'] =template['MAP_KEY'].map(mapa_fornecedores)
+   
+    template = template.drop(columns=['MAP_KEY'])
+   
+    template['DESCRIÇÃO MATERIAL'] = template['KEY'].map(mapa_pn)
+    template['MDR'] = template['KEY'].map(mapa_mdr)  # reforça MDR correto do KEY
+    template['DESCRIÇÃO DA EMBALAGEM'] = template['MDR'].map(mapa_descricao_mdr)
+    template['QME'] = template['KEY'].map(mapa_qme)
+
+    template['QTD EMBALAGENS'] = np.ceil(template['QTDE'] / template['QME'])
+
+    template['M³'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_volume), 1)
+    template['PESO MAT'] = round(template['QTDE'] * template['KEY'].map(mapa_peso_pn), 1)
+    template['PESO MDR'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_peso_mdr), 1)
+    template['PESO TOTAL'] = template['PESO MAT'] + template['PESO MDR']
+    return template
+
+
+def agrupar_saturacao(template, cadastros):
+    """Base da aba Saturação: caixas e pallets por (fornecedor, embalagem), antes das capacidades"""
+    df_saturacao = (
+        template.groupby(['COD FORNECEDOR', 'FORNECEDOR', 'MDR'], as_index=False)['QTD EMBALAGENS']
+        .sum()
+        .rename(columns={'MDR': 'EMBALAGEM', 'QTD EMBALAGENS': 'TOTAL DE CXS'})
+    )
+
+    # Recupera a coluna VEICULO para cada fornecedor + embalagem
+    col_veiculo = template[['COD FORNECEDOR', 'MDR', 'VEICULO']].drop_duplicates()
+    col_veiculo = col_veiculo.rename(columns={'MDR': 'EMBALAGEM'})
+
+    df_saturacao = df_saturacao.merge(col_veiculo, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')
+
+    mapa_paletizavel = cadastros.mapa_paletizavel
+    mapa_cxs_por_pallet = cadastros.mapa_cxs_por_pallet
+
+    df_saturacao['CX_PALETIZÁVEL'] = df_saturacao['EMBALAGEM'].map(mapa_paletizavel).fillna(0).astype(int)
+    df_saturacao['CXS_POR_PALLET'] = df_saturacao.apply(
+        lambda row: 1 if row['CX_PALETIZÁVEL'] != 1 else (
+            mapa_cxs_por_pallet.get(row['EMBALAGEM'], 1) or 1), axis=1
+    )
+    df_saturacao['CXS/PALLETS_TOTAL'] = df_saturacao['TOTAL DE CXS'] / df_saturacao['CXS_POR_PALLET']
+    return df_saturacao
+
+
+def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao_img, usar_manual=False,caminho_BD = 'BD',
+                          template=None, exportar_excel=True, tempos=None):
+    """
+    Enriquece o template de demanda e calcula saturação/empilhamento.
+
+    template: DataFrame já montado (pipeline em memória). Se None, lê Template.xlsx.
+    exportar_excel: grava VIAJANTE.xlsx formatado (False no modo headless).
+    tempos: dict opcional que recebe os segundos por etapa (enriquecimento, saturacao, empilhamento, sat_por_linha)
+
+    Returns:
+        Dict {'template', 'saturacao', 'empilhamento'} com os DataFrames, ou None em caso de erro
+    """
 
 
     def split_key_logic(code):
@@ -354,7 +502,10 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
 
 
         # --- Leitura dos arquivos ---
-        template = pd.read_excel('Template.xlsx', dtype={'COD FORNECEDOR': int, 'DESENHO': str})
+        if template is None:
+            template = pd.read_excel(ARQUIVO_TEMPLATE, dtype={'COD FORNECEDOR': int, 'DESENHO': str})
+        else:
+            template = normalizar_template(template)
 
         # Ensure 'Mês' column exists, add default if not
         if 'Mês' not in template.columns:
@@ -362,198 +513,49 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
         template = template[template['QTDE'] > 0]
         
         
-        BD_PN = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_PN.xlsx")
-        BD_MDR = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR.xlsx")
-        VEÍCULOS = os.path.join(caminho_base,caminho_BD,"VEÍCULOS.xlsx")
-        db_empilhamento = os.path.join(caminho_base,caminho_BD,"BD_EMPILHAMENTO_EMBALAGENS.xlsx")
-        db_efi = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx")
-        db_efi = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx")
-       
-        # ------------------Working in the DB structrue------------------
-        db_PN = pd.read_excel(BD_PN, sheet_name='BD', dtype={'CÓD. FORNECEDOR': int, 'DESENHO': str})
-        db_PN = db_PN.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
-
-        db_MDR = pd.read_excel(BD_MDR, sheet_name='BD')
-        db_MDR = db_MDR.rename(columns={'DESCRIÇÃO2': 'DESCRIÇÃO'})
-
-        db_veiculos = pd.read_excel(VEÍCULOS, sheet_name='VEÍCULOS')
-
-        db_empilhamento = pd.read_excel(db_empilhamento, sheet_name='BD')
-        db_empilhamento = db_empilhamento.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
-
-        db_efi = pd.read_excel(db_efi,sheet_name='BD')
-
-        # --- Normalização de tipos ---
-        db_PN['DESENHO ATUALIZAÇÃO'] = pd.to_datetime(db_PN['DESENHO ATUALIZAÇÃO'], errors='coerce')
-        db_MDR['VOLUME'] = pd.to_numeric(db_MDR['VOLUME'], errors='coerce')
-        db_MDR['MDR PESO'] = pd.to_numeric(db_MDR['MDR PESO'], errors='coerce')
-        db_PN['PESO (Kg) MATERIAL'] = pd.to_numeric(db_PN['PESO (Kg) MATERIAL'], errors='coerce')
+        # ------------------Cadastros da pasta BD (carregados uma vez por processo)------------------
+        cadastros = obter_cadastros(os.path.join(caminho_base, caminho_BD))
+        cadastros.exigir('PN', 'MDR', 'VEICULOS', 'EMPILHAMENTO', 'PERDA_COMPRIMENTO')
 
-        db_PN = db_PN.sort_values('DESENHO ATUALIZAÇÃO', ascending=False)
-
-        # Criar chave composta DESENHO+MDR em db_PN
-        db_PN['KEY'] = db_PN['DESENHO'].astype(str) + '_' + db_PN['MDR'].astype(str)
-
-        # --- Mapeamentos únicos para .map() seguros ---
-        mapa_fornecedores = db_PN.drop_duplicates('COD FORNECEDOR').set_index('COD FORNECEDOR')['FORNECEDOR']
-
-        # Mapas baseados na chave composta
-        mapa_pn = db_PN.drop_duplicates('KEY').set_index('KEY')['DESCRIÇÃO']
-        mapa_mdr = db_PN.drop_duplicates('KEY').set_index('KEY')['MDR']
-        mapa_qme = db_PN.drop_duplicates('KEY').set_index('KEY')['QME']
-        mapa_peso_pn = db_PN.drop_duplicates('KEY').set_index('KEY')['PESO (Kg) MATERIAL']
-
-        # Mapas vindos do db_MDR
-        mapa_descricao_mdr = db_MDR.drop_duplicates('MDR').set_index('MDR')['DESCRIÇÃO']
-        mapa_volume = db_MDR.drop_duplicates('MDR').set_index('MDR')['VOLUME']
-        mapa_peso_mdr = db_MDR.drop_duplicates('MDR').set_index('MDR')['MDR PESO']
-        mapa_peso_max = db_veiculos.set_index('COD VEICULO')['PESO MAXIMO']
+        db_veiculos = cadastros.db_veiculos
+        db_empilhamento = cadastros.db_empilhamento
 
         # --- Enriquecimento do template ---
-
-        # Passo 1: primeiro trazer MDR pelo DESENHO, para podermos montar a KEY
-        template['MDR'] = template['DESENHO'].map(
-            db_PN.drop_duplicates('DESENHO').set_index('DESENHO')['MDR']
-        )
-
-
-        # Passo 2: agora que já temos MDR no template, podemos montar a KEY
-        template['KEY'] = template['DESENHO'].astype(str) + '_' + template['MDR'].astype(str)
-        
-
-        # Passo 3: enriquecer com os mapas
-        template['PESO_MAXIMO'] = template['VEICULO'].map(mapa_peso_max)
-        template['MAP_KEY'] = (template['COD IMS'].fillna(template['COD FORNECEDOR']).astype(str).str.split('/').str[0] )
-
-       
-        template['MAP_KEY'] = pd.to_numeric(template['MAP_KEY'], errors='coerce')
-        template['FORNECEDOR'] =template['MAP_KEY'].map(mapa_fornecedores)
-       
-        template = template.drop(columns=['MAP_KEY'])
-       
-        template['DESCRIÇÃO MATERIAL'] = template['KEY'].map(mapa_pn)
-        template['MDR'] = template['KEY'].map(mapa_mdr)  # reforça MDR correto do KEY
-        template['DESCRIÇÃO DA EMBALAGEM'] = template['MDR'].map(mapa_descricao_mdr)
-        template['QME'] = template['KEY'].map(mapa_qme)
-
-        template['QTD EMBALAGENS'] = np.ceil(template['QTDE'] / template['QME'])
-
-        template['M³'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_volume), 1)
-        template['PESO MAT'] = round(template['QTDE'] * template['KEY'].map(mapa_peso_pn), 1)
-        template['PESO MDR'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_peso_mdr), 1)
-        template['PESO TOTAL'] = template['PESO MAT'] + template['PESO MDR']
-
+        inicio = time.perf_counter()
+        template = enriquecer_template(template, cadastros)
 
         if usar_manual:
             if veiculo in db_veiculos['COD VEICULO'].values:
                 template['VEICULO'] = veiculo
 
-        template = template[['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO', 'QTDE', 'DESCRIÇÃO MATERIAL',
-                             'MDR', 'DESCRIÇÃO DA EMBALAGEM', 'QME', 'QTD EMBALAGENS', 'TIPO SATURACAO',
-                             'VEICULO', 'M³', 'PESO MAT', 'PESO MDR', 'PESO TOTAL', 'PESO_MAXIMO', 'Mês']]
+        template = template[COLUNAS_TEMPLATE]
 
         # --- Construção da aba Saturação ---
-        df_saturacao = (
-            template.groupby(['COD FORNECEDOR', 'FORNECEDOR', 'MDR'], as_index=False)['QTD EMBALAGENS']
-            .sum()
-            .rename(columns={'MDR': 'EMBALAGEM', 'QTD EMBALAGENS': 'TOTAL DE CXS'})
-        )
-
-        # Recupera a coluna VEICULO para cada fornecedor + embalagem
-        col_veiculo = template[['COD FORNECEDOR', 'MDR', 'VEICULO']].drop_duplicates()
-        col_veiculo = col_veiculo.rename(columns={'MDR': 'EMBALAGEM'})
-
-        df_saturacao = df_saturacao.merge(col_veiculo, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')
-
-        mapa_paletizavel = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXA PLÁSTICA']
-        mapa_cxs_por_pallet = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXAS POR PALLET']
-
-        df_saturacao['CX_PALETIZÁVEL'] = df_saturacao['EMBALAGEM'].map(mapa_paletizavel).fillna(0).astype(int)
-        df_saturacao['CXS_POR_PALLET'] = df_saturacao.apply(
-            lambda row: 1 if row['CX_PALETIZÁVEL'] != 1 else (
-                mapa_cxs_por_pallet.get(row['EMBALAGEM'], 1) or 1), axis=1
-        )
-        df_saturacao['CXS/PALLETS_TOTAL'] = df_saturacao['TOTAL DE CXS'] / df_saturacao['CXS_POR_PALLET']
+        inicio = marcar_tempo(tempos, 'enriquecimento', inicio)
+        df_saturacao = agrupar_saturacao(template, cadastros)
 
         valor_veiculo = db_veiculos.loc[db_veiculos['COD VEICULO'] == veiculo, 'VEICULOS'].iloc[0]
-        # Mapeia de código do veículo (ex: 4) → coluna de capacidade no db_MDR (ex: "14 x 2,4 x 2,78")
-        mapa_coluna_capacidade = db_veiculos.set_index('COD VEICULO')['VEICULOS'].to_dict()
-        
-
-        # Garante que os MDRs na base estejam em caixa alta
-        db_MDR['MDR'] = db_MDR['MDR'].astype(str).str.upper()
-
         
         def obter_veiculo_anterior(cod_veic):
-            if cod_veic in [4, 5, 6, 7, 8, 9, 14,19]:
-                return 3
-            elif cod_veic in [2, 3, 12, 13, 15, 16, 17, 18,20]:
-                return 1
-            elif cod_veic == 1:
-                return 10
-            elif cod_veic == 10:
-                return 11
-            elif cod_veic == 11:
-                return 11
-            else:
-                print(f"[WARNING] Veículo código {cod_veic} não tem mapeamento para veículo anterior")
-            return None
-
-        def obter_capacidade_por_linha(row):
-            mdr = str(row['EMBALAGEM']).upper()  # Converte para string e caixa alta
-            cod_veic = row['VEICULO']
-            coluna = mapa_coluna_capacidade.get(cod_veic)
-
-            if not coluna:
-                print(f"[ERRO] Código de veículo {cod_veic} não mapeado (falta em VEÍCULOS.xlsx)")
-                return None
-            if coluna not in db_MDR.columns:
-                print(f"[ERRO] Coluna '{coluna}' não encontrada no db_MDR para veículo {cod_veic}")
-                return None
-
-            filtro = db_MDR['MDR'] == mdr
-            capacidade_series = db_MDR.loc[filtro, coluna].dropna()
-
-            if capacidade_series.empty:
-                print(f"[AVISO] Capacidade não encontrada para MDR {mdr} na coluna '{coluna}' (cod veic {cod_veic})")
-                return None
-
-            return capacidade_series.values[0]
-
-        def obter_capacidade_por_linha_veic_anterior(row):
-
-            mdr = str(row['EMBALAGEM']).upper()
-            cod_veic = int(row['VEICULO'])
-            veic_anterior = obter_veiculo_anterior(cod_veic)
-           
-            if veic_anterior is None :
-                print(f"[INFO] Veículo anterior não definido para código {cod_veic}")
-                return None
-
-            coluna = mapa_coluna_capacidade.get(veic_anterior)
-
-            if not coluna:
-                print(f"[ERRO] Código de veículo anterior {veic_anterior} não mapeado.")
-                return None
-            
-            if coluna not in db_MDR.columns:
-                print(f"[ERRO] Coluna '{coluna}' não encontrada no db_MDR para veículo anterior {veic_anterior}")
-                return None
-
-            filtro = db_MDR['MDR'].str.contains(mdr)
-            capacidade_series = db_MDR.loc[filtro, coluna].dropna()
-
-            if capacidade_series.empty:
-                print(
-                    f"[AVISO] Capacidade não encontrada para MDR {mdr} na coluna '{coluna}' (veic anterior {veic_anterior})")
-                return None
-
-            return capacidade_series.values[0]
+            veic_anterior = cadastros.veiculos.previous_code(cod_veic)
+            if veic_anterior is None:
+                logger.warning('Veículo código %s não tem mapeamento para veículo anterior', cod_veic)
+            return veic_anterior
 
-        df_saturacao['CAPACIDADE'] = df_saturacao.apply(obter_capacidade_por_linha, axis=1)
+        # --- Capacidade por join com a tabela (MDR, coluna do veículo) -> CAPACIDADE dos cadastros ---
+        df_saturacao['CAPACIDADE'] = resolver_capacidade(df_saturacao['EMBALAGEM'], df_saturacao['VEICULO'], cadastros)
         df_saturacao['VEICULO'] = df_saturacao['VEICULO'].fillna(0)
-        df_saturacao['VEICULO'] = df_saturacao['VEICULO'].astype(int)         
-        df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] = df_saturacao.apply(obter_capacidade_por_linha_veic_anterior, axis=1)
+        df_saturacao['VEICULO'] = df_saturacao['VEICULO'].astype(int)
+
+        veiculos_anteriores = {}
+        for cod_veic in df_saturacao['VEICULO'].unique():
+            veiculos_anteriores[cod_veic] = obter_veiculo_anterior(cod_veic)
+            if veiculos_anteriores[cod_veic] is None:
+                logger.debug('Veículo anterior não definido para código %s', cod_veic)
+        df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] = resolver_capacidade(
+            df_saturacao['EMBALAGEM'], df_saturacao['VEICULO'].map(veiculos_anteriores), cadastros,
+            rotulo='veic anterior'
+        )
 
         # Convert capacity columns to numeric (handle None values)
         df_saturacao['CAPACIDADE'] = pd.to_numeric(df_saturacao['CAPACIDADE'], errors='coerce')
@@ -564,48 +566,53 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
             df_saturacao['CXS/PALLETS_TOTAL'] / df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] * 100, 2
         )
 
-        bases = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR BASE']))
-        sobrepostas = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR SOBREPOSTA']))
-        df_saturacao['EMBALAGEM_BASE'] = df_saturacao.apply(
-            lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in bases else 0, axis=1)
-        df_saturacao['EMBALAGEM_SOBREPOSTA'] = df_saturacao.apply(
-            lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in sobrepostas else 0, axis=1)
+        # Flags por pertinência de (FORNECEDOR, EMBALAGEM) aos pares base/sobreposta do cadastro
+        df_saturacao['EMBALAGEM_BASE'] = pertence_aos_pares(
+            df_saturacao['FORNECEDOR'], df_saturacao['EMBALAGEM'], cadastros.bases)
+        df_saturacao['EMBALAGEM_SOBREPOSTA'] = pertence_aos_pares(
+            df_saturacao['FORNECEDOR'], df_saturacao['EMBALAGEM'], cadastros.sobrepostas)
 
         df_saturacao['CHAVE'] = df_saturacao['COD FORNECEDOR'].astype(str) + '-' + df_saturacao['EMBALAGEM'].astype(str)
         
 
         # --- Eficiência de empilhamento por embalagem (evita .map com índice duplicado) ---
-        mapa_efi = db_efi.drop_duplicates('CHAVE FORNE + MDR').set_index('CHAVE FORNE + MDR')[valor_veiculo]
+        mapa_efi = cadastros.mapa_efi(valor_veiculo)
         df_saturacao['EFICIÊNCIA_COMPRIMENTO'] = df_saturacao['CHAVE'].map(mapa_efi).fillna(1)
 
-        mapa_volume_efi = db_MDR.drop_duplicates('CHAVE EMBALAGENS').set_index('CHAVE EMBALAGENS')['VOLUME']
+        mapa_volume_efi = cadastros.mapa_volume_efi
         df_saturacao['M³ POR EMBALAGEM'] = df_saturacao['CHAVE'].map(mapa_volume_efi) * \
                                             df_saturacao['CXS_POR_PALLET'] * df_saturacao['CXS/PALLETS_TOTAL']
 
         # --- Cálculo de empilhamento ---
+        inicio = marcar_tempo(tempos, 'saturacao', inicio)
         df_calculo_empilhamento = calcular_empilhamento(df_saturacao, db_empilhamento)
 
         # --- Saturação final por embalagem ---
         def integrar_saturacao_total(df_sat, df_emp):
-            def calcular(row):
-                filtro = (df_emp['FORNECEDOR'] == row['COD FORNECEDOR']) & \
-                         (df_emp['EMBALAGEM_BASE'] == row['EMBALAGEM'])
-                soma_saturacoes = df_emp[filtro]['SATURAÇÃO'].sum()
-                proporcao = row['CXS/PALLETS_TOTAL'] / row['CAPACIDADE']
-                return (proporcao + soma_saturacoes) * row['EFICIÊNCIA_COMPRIMENTO']
-
-            df_sat['SATURAÇÃO_TOTAL'] = df_sat.apply(calcular, axis=1)
+            # Soma das saturações empilhadas por (fornecedor, embalagem base), uma única vez
+            soma_saturacoes = (
+                df_emp.astype({'FORNECEDOR': object, 'EMBALAGEM_BASE': object})
+                .groupby(['FORNECEDOR', 'EMBALAGEM_BASE'], sort=False)['SATURAÇÃO'].sum()
+                .rename('SOMA_SATURAÇÕES')
+                .reset_index()
+                .rename(columns={'FORNECEDOR': 'COD FORNECEDOR', 'EMBALAGEM_BASE': 'EMBALAGEM'})
+            )
+            chaves = df_sat[['COD FORNECEDOR', 'EMBALAGEM']].astype(object)
+            soma = chaves.merge(soma_saturacoes, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')['SOMA_SATURAÇÕES']
+
+            proporcao = df_sat['CXS/PALLETS_TOTAL'] / df_sat['CAPACIDADE']
+            df_sat['SATURAÇÃO_TOTAL'] = (proporcao + soma.fillna(0).values) * df_sat['EFICIÊNCIA_COMPRIMENTO']
             df_sat['SATURAÇÃO_POR_MDR'] = df_sat['SATURAÇÃO_TOTAL'] / df_sat['TOTAL DE CXS']
             return df_sat
 
         if not df_calculo_empilhamento.empty:
             df_saturacao = integrar_saturacao_total(df_saturacao, df_calculo_empilhamento)
         else:
-            df_saturacao['SATURAÇÃO_TOTAL'] = df_saturacao.apply(
-                lambda row: row['CXS/PALLETS_TOTAL'] / row['CAPACIDADE'], axis=1)
+            df_saturacao['SATURAÇÃO_TOTAL'] = df_saturacao['CXS/PALLETS_TOTAL'] / df_saturacao['CAPACIDADE']
             df_saturacao['SATURAÇÃO_POR_MDR'] = df_saturacao['SATURAÇÃO_TOTAL'] / df_saturacao['TOTAL DE CXS']
 
         # --- Cálculo da SAT por linha ---
+        inicio = marcar_tempo(tempos, 'empilhamento', inicio)
         template.loc[:, 'CHAVE'] = template['COD FORNECEDOR'].astype(str) + '-' + template['MDR'].astype(str)
         template = template.merge(df_saturacao[['CHAVE', 'SATURAÇÃO_POR_MDR']], on='CHAVE', how='left')
         template['SAT VOLUME (%)'] = round(template['QTD EMBALAGENS'] * template['SATURAÇÃO_POR_MDR'] * 100, 2)
@@ -617,6 +624,7 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
         
         template.drop(columns=['CHAVE', 'SATURAÇÃO_POR_MDR'], inplace=True)
         df_saturacao.drop(columns=['CHAVE'], inplace=True)
+        marcar_tempo(tempos, 'sat_por_linha', inicio)
 
         # --- Criação das variáveis para a tabela final ---
 
@@ -632,13 +640,10 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
         if not template.empty and 'PESO_MAXIMO' in template.columns:
             capacidade_veiculo_kg = template['PESO_MAXIMO'].iloc[0] if template['PESO_MAXIMO'].notna().any() else None
         
-        # Get volume capacity from db_veiculos
-        try:
-            veiculo_info = db_veiculos[db_veiculos['COD VEICULO'] == veiculo]
-            if not veiculo_info.empty and 'CAPACIDADE M³' in veiculo_info.columns:
-                capacidade_veiculo_m3 = veiculo_info['CAPACIDADE M³'].iloc[0]
-        except:
-            pass
+        # Get volume capacity from the vehicle registry
+        veiculo_info = cadastros.veiculos.get(veiculo)
+        if veiculo_info is not None:
+            capacidade_veiculo_m3 = veiculo_info['capacidade_m3']
         
         # --- Capacidade Útil Calculations for Summary ---
         # A) Volume-based capacity per vehicle
@@ -678,7 +683,7 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
         if tree_resumo is not None:
             tree_resumo.delete(*tree_resumo.get_children())
             for item in resumo_dados:
-                tree_resumo.insert("", END, values=item)
+                tree_resumo.insert("", "end", values=item)
 
 
         # --- Atualiza TreeView (Tkinter) - skip in headless mode ---
@@ -719,58 +724,110 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
                 tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
             
             for _, row in template.iterrows():
-                tree.insert("", END, values=list(row))
+                tree.insert("", "end", values=list(row))
 
         # Draw trucks visualization (only if canvas is provided - GUI mode)
         if canvas_caminhoes is not None:
             desenhar_caminhoes(canvas_caminhoes, ocupacao, caminhao_img)
 
         # --- Exporta para Excel formatado ---
-        with pd.ExcelWriter('VIAJANTE.xlsx', engine='openpyxl') as writer:
-            template.to_excel(writer, sheet_name='Template Completo', index=False)
-            df_saturacao.to_excel(writer, sheet_name='Saturação', index=False)
-            df_calculo_empilhamento.to_excel(writer, sheet_name='Calculo Empilhamento', index=False)
-
-            header_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-            header_font = Font(bold=True, color='000000')
-            header_align = Alignment(horizontal='center', vertical='center')
-
-            for sheet_name in ['Template Completo', 'Saturação', 'Calculo Empilhamento']:
-                ws = writer.sheets[sheet_name]
-                for col_num, col in enumerate(ws.iter_cols(min_row=1, max_row=1), 1):
-                    largura = max(len(str(cell.value) or '') for cell in col) + 2
-                    ws.column_dimensions[get_column_letter(col_num)].width = largura
-                for cell in ws[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = header_align
-
-            if 'MDR' in template.columns:
-                pn_nao_cadastrados = template[
-                    template['MDR'].isna() | (template['MDR'].astype(str).str.strip() == '')
-                ].copy()
-
-                # select only the requested columns if they exist in the dataframe
-                cols_to_keep = ['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO']
-                existing_cols = [c for c in cols_to_keep if c in pn_nao_cadastrados.columns]
-
-                if not pn_nao_cadastrados.empty and existing_cols:
-                    pn_nao_cadastrados = pn_nao_cadastrados[existing_cols]
-                    pn_nao_cadastrados.drop_duplicates(subset=["DESENHO"], inplace=True)
-                    pn_nao_cadastrados.to_excel(writer, sheet_name='PN Não Cadastrados', index=False)
+        if exportar_excel:
+            exportar_viajante_excel(template, df_saturacao, df_calculo_empilhamento)
+
+        return {
+            'template': template,
+            'saturacao': df_saturacao,
+            'empilhamento': df_calculo_empilhamento
+        }
 
     except Exception as e:
+        logger.exception('Erro: %s', e)
+        return None
+
+
+def exportar_viajante_excel(template, df_saturacao, df_calculo_empilhamento, caminho_arquivo=ARQUIVO_VIAJANTE):
+    """Grava o VIAJANTE.xlsx formatado (Template Completo, Saturação, Calculo Empilhamento, PN Não Cadastrados)"""
+    from openpyxl.utils import get_column_letter
+    from openpyxl.styles import PatternFill, Font, Alignment
+
+    with pd.ExcelWriter(caminho_arquivo, engine='openpyxl') as writer:
+        template.to_excel(writer, sheet_name='Template Completo', index=False)
+        df_saturacao.to_excel(writer, sheet_name='Saturação', index=False)
+        df_calculo_empilhamento.to_excel(writer, sheet_name='Calculo Empilhamento', index=False)
+
+        header_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
+        header_font = Font(bold=True, color='000000')
+        header_align = Alignment(horizontal='center', vertical='center')
+
+        for sheet_name in ['Template Completo', 'Saturação', 'Calculo Empilhamento']:
+            ws = writer.sheets[sheet_name]
+            for col_num, col in enumerate(ws.iter_cols(min_row=1, max_row=1), 1):
+                largura = max(len(str(cell.value) or '') for cell in col) + 2
+                ws.column_dimensions[get_column_letter(col_num)].width = largura
+            for cell in ws[1]:
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.alignment = header_align
+
+        if 'MDR' in template.columns:
+            pn_nao_cadastrados = template[
+                template['MDR'].isna() | (template['MDR'].astype(str).str.strip() == '')
+            ].copy()
+
+            # select only the requested columns if they exist in the dataframe
+            cols_to_keep = ['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO']
+            existing_cols = [c for c in cols_to_keep if c in pn_nao_cadastrados.columns]
+
+            if not pn_nao_cadastrados.empty and existing_cols:
+                pn_nao_cadastrados = pn_nao_cadastrados[existing_cols]
+                pn_nao_cadastrados.drop_duplicates(subset=["DESENHO"], inplace=True)
+                pn_nao_cadastrados.to_excel(writer, sheet_name='PN Não Cadastrados', index=False)
+
+
+def nome_veiculo_rota(veiculo_template, rota_veic, veic_map):
+    """Nome do veículo da rota: override do template ou VEICULO PRINCIPAL, traduzido pelo cadastro"""
+    veiculo = veiculo_template if pd.notna(veiculo_template) else rota_veic
+    # Map vehicle code to human-readable name when possible
+    if veiculo in veic_map:
+        veic_display = veic_map[veiculo]
+    else:
+        try:
+            veic_display = veic_map.get(int(veiculo)) if veiculo is not None else None
+        except Exception:
+            veic_display = None
+
+    # If still not found, try to use the rota's principal (likely a name)
+    if not veic_display or pd.isna(veic_display):
+        veic_display = rota_veic if pd.notna(rota_veic) else (str(veiculo) if veiculo is not None else '')
+    return veic_display
+
+
+def arredondar(serie, casas):
+    """
+    round() do Python valor a valor. Series.round (NumPy) arredonda os meios de outro jeito depois da
+    escala binária (73.7/2 -> 36.8 em vez de 36.9); o Volume por rota sempre usou round() por valor
+    """
+    return serie.map(lambda valor: round(valor, casas)).astype(float)
 
-        print(f"Erro: {e}")
 
-        traceback.print_exc()
+def consolidar_dados(template=None, exportar_excel=True, caminho_BD='BD', por_veiculo=False):
+    """
+    Consolida o template completo por rota/mês (Volume por rota).
 
+    template: 'Template Completo' em memória (retorno de completar_informacoes). Se None, lê VIAJANTE.xlsx.
+    exportar_excel: grava Volume_por_rota.xlsx.
+    por_veiculo: agrupa também por VEICULO (varredura de veículos) e devolve a coluna COD VEICULO.
 
-def consolidar_dados():
+    Returns:
+        DataFrame com o volume por rota
+    """
     # Carrega os dados
-    fluxos_path = os.path.join(caminho_base, "BD", "FLUXO.xlsx")
-    fluxos = pd.read_excel(fluxos_path, sheet_name='FLUXOS')
-    template = pd.read_excel('VIAJANTE.xlsx', sheet_name='Template Completo')
+    cadastros = obter_cadastros(os.path.join(caminho_base, caminho_BD))
+    cadastros.exigir('FLUXO')
+    if template is None:
+        template = pd.read_excel(ARQUIVO_VIAJANTE, sheet_name='Template Completo')
+    else:
+        template = tipar_como_excel(template)
 
     # Filtra linhas com quantidade válida e prepara as colunas
     template = template[template['QTDE'] > 0].copy() # Use .copy() to avoid SettingWithCopyWarning
@@ -781,62 +838,12 @@ def consolidar_dados():
     template['FORNECEDOR'] = template['FORNECEDOR'].fillna('').astype(str)
 
 
-    def normalizar_codigos(campo):
-        if pd.isna(campo):
-            return []
-        return re.split(r'\s*/\s*', str(campo).strip())
-
-    dados_volume = []
-
-    # --- Build vehicle code -> name mapping (try multiple filename variants) ---
-    veic_files = [
-        os.path.join(caminho_base, "BD", "VEÍCULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "VEICULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "Veiculos.xlsx")
-    ]
-    veic_map = {}
-    for vf in veic_files:
-        if os.path.exists(vf):
-            try:
-                dfv = pd.read_excel(vf, sheet_name=0)
-                # detect code and description columns (prefer descriptive name columns)
-                cols_upper = {c.strip().upper(): c for c in dfv.columns}
-                cod_col = None
-                desc_col = None
-                for key_upper, orig in cols_upper.items():
-                    if 'COD' in key_upper and 'VEIC' in key_upper:
-                        cod_col = orig
-                    if 'DESCR' in key_upper or 'DESC' in key_upper:
-                        desc_col = orig
-
-                # fallback heuristics
-                if cod_col is None and len(dfv.columns) >= 1:
-                    cod_col = dfv.columns[0]
-                if desc_col is None and len(dfv.columns) >= 2:
-                    desc_col = dfv.columns[1]
-
-                if desc_col is None:
-                    continue
+    # --- Vehicle code -> name mapping (cadastro de VEÍCULOS) ---
+    veic_map = cadastros.mapa_nome_veiculo
 
-                for _, r in dfv.iterrows():
-                    code = r.get(cod_col)
-                    name = r.get(desc_col)
-                    if pd.isna(code) or pd.isna(name):
-                        continue
-                    try:
-                        code_int = int(code)
-                    except Exception:
-                        code_int = None
-
-                    veic_map[str(code)] = str(name)
-                    if code_int is not None:
-                        veic_map[code_int] = str(name)
-                break
-            except Exception:
-                continue
-
-    # Group by COD FORNECEDOR, Mês, COD DESTINO and aggregate
-    grouped = template.groupby(['COD FORNECEDOR', 'Mês', 'COD DESTINO']).agg({
+    # Group by COD FORNECEDOR, Mês, COD DESTINO (and VEICULO in the sweep) and aggregate
+    chaves_grupo = (['VEICULO'] if por_veiculo else []) + ['COD FORNECEDOR', 'Mês', 'COD DESTINO']
+    grouped = template.groupby(chaves_grupo).agg({
         'M³': 'sum',
         'PESO TOTAL': 'sum',
         'QTD EMBALAGENS': 'sum',
@@ -845,116 +852,148 @@ def consolidar_dados():
         'DESENHO': 'nunique'
     }).reset_index()
 
-    for _, group in grouped.iterrows():
-        cod_fornecedor = group['COD FORNECEDOR']
-        mes = group['Mês']
-        cod_dest = group['COD DESTINO']
-        volume_total = group['M³']
-        peso_total = group['PESO TOTAL']
-        embalagens_total = group['QTD EMBALAGENS']
-        # Prefer vehicle selected in the Template (manual override) if present
-        temp_rows = template[
-            (template['COD FORNECEDOR'] == cod_fornecedor) &
-            (template['Mês'] == mes) &
-            (template['COD DESTINO'] == cod_dest)
+    # Prefer vehicle selected in the Template (manual override) if present: first non-null per group
+    grouped['VEICULO_TEMPLATE'] = template.groupby(chaves_grupo)['VEICULO'].first().values
+    # Fornecedor name: first row of the supplier in the template
+    nomes_fornecedor = template.groupby('COD FORNECEDOR', sort=False)['FORNECEDOR'].first()
+    grouped['FORNECEDORES NA ROTA'] = grouped['COD FORNECEDOR'].map(nomes_fornecedor).fillna('')
+
+    # --- Rotas do FLUXO por (COD FORNECEDOR, COD DESTINO), numa única junção ---
+    grouped['ORDEM_GRUPO'] = np.arange(len(grouped))
+    grouped['CHAVE_FORNECEDOR'] = grouped['COD FORNECEDOR'].map(str)
+    grouped['CHAVE_DESTINO'] = grouped['COD DESTINO'].map(str)
+    rotas = grouped.merge(cadastros.rotas.tabela, on=['CHAVE_FORNECEDOR', 'CHAVE_DESTINO'])
+    rotas = rotas.drop_duplicates(['ORDEM_GRUPO', 'ORDEM_ROTA'])
+    rotas = rotas.sort_values(['ORDEM_GRUPO', 'ORDEM_ROTA'], kind='mergesort').reset_index(drop=True)
+    if rotas.empty:
+        dados_volume = []
+    else:
+        # Use template vehicle override when available, otherwise use route's principal vehicle
+        veic_display = [
+            nome_veiculo_rota(veic_template, rota_veic, veic_map)
+            for veic_template, rota_veic in zip(rotas['VEICULO_TEMPLATE'], rotas['VEICULO PRINCIPAL'])
         ]
-        
-        
-        veiculo_template_vals = temp_rows['VEICULO'].dropna().unique() if not temp_rows.empty else []
-        veiculo_template = veiculo_template_vals[0] if len(veiculo_template_vals) > 0 else None
-        
-        # Get fornecedor name
-        fornecedor_name = template[template['COD FORNECEDOR'] == cod_fornecedor]['FORNECEDOR'].iloc[0] if not template[template['COD FORNECEDOR'] == cod_fornecedor].empty else ''
 
-        rotas_destino = fluxos[fluxos['COD DESTINO'].astype(str).str.contains(str(cod_dest))]
-    
-        
-        for _, rota in rotas_destino.iterrows():
-            cod_fluxo = rota['COD FLUXO']
-            destino = rota['NOME DESTINO']
-            # Use template vehicle override when available, otherwise use route's principal vehicle
-            veiculo = veiculo_template if veiculo_template is not None else rota['VEICULO PRINCIPAL']
-            # Map vehicle code to human-readable name when possible
-            veic_display = None
-            # if veiculo matches a mapping key directly
-            if veiculo in veic_map:
-                veic_display = veic_map[veiculo]
-            else:
-                try:
-                    veic_display = veic_map.get(int(veiculo)) if veiculo is not None else None
-                except Exception:
-                    veic_display = None
-
-            # If still not found, try to use the rota's principal (likely a name)
-            if not veic_display or pd.isna(veic_display):
-                rota_veic = rota.get('VEICULO PRINCIPAL')
-                veic_display = rota_veic if pd.notna(rota_veic) else (str(veiculo) if veiculo is not None else '')
-
-            tipo_saturacao = rota['TIPO SATURACAO']
-            transportadora = rota['TRANSPORTADORA']
-            fornecedores_rota = normalizar_codigos(rota['COD FORNECEDOR'])
-
-            if str(cod_fornecedor) in fornecedores_rota:
-                if tipo_saturacao.upper() == 'VOLUME':
-                    saturacao_total = group['SAT VOLUME (%)']
-                else:
-                    saturacao_total = group['SAT PESO (%)']
-
-                cargas = ceil(saturacao_total / 100) if saturacao_total > 0 else 0
-
-                # --- Coluna de Sugestão ---
-                saturacao_residual = saturacao_total % 100
-                if cargas > 0 and saturacao_residual <= 2:
-                    sugestao = "Cortar coleta do último veículo"
-                elif cargas > 0 and saturacao_residual <= 50:
-                    sugestao = "Alterar último veículo para menor porte"
-                else:
-                    sugestao = "Manter coleta"
-
-                # --- Apuração de MDR ---
-                perc_mdr = 100.0 if saturacao_total > 0 else 0.0
-
-                # --- Capacidade Útil per route ---
-                cap_util_volume_rota_m3 = (volume_total / cargas) if cargas > 0 else 0
-                cap_util_volume_rota_percent = (saturacao_total / cargas) if cargas > 0 else 0
-
-                dados_volume.append({
-                    'COD FLUXO': cod_fluxo,
-                    'COD DESTINO': cod_dest,
-                    'DESTINO': destino,
-                    'Mês': mes,
-                    'CÓDIGOS FORNECEDORES': cod_fornecedor,
-                    'FORNECEDORES NA ROTA': fornecedor_name,
-                    'VEÍCULO': veic_display,
-                    'TECNOLOGIA': rota['TECNOLOGIA'],
-                    'MOT': rota['MOT'],
-                    'TRANSPORTADORA': transportadora,
-                    'TIPO DE SATURAÇÃO': tipo_saturacao,
-                    'VOLUME TOTAL (m³)': round(volume_total, 1),
-                    'PESO TOTAL (kg)': round(peso_total, 1),
-                    'EMBALAGENS TOTAL': int(embalagens_total),
-                    'SATURAÇÃO TOTAL (%)': round(saturacao_total, 2),
-                    'CARGAS': cargas,
-                    'CAP. ÚTIL (m³)': round(cap_util_volume_rota_m3, 1),
-                    'CAP. ÚTIL (%)': round(cap_util_volume_rota_percent, 2),
-                    'SUGESTÃO': sugestao,
-                    '% MDRs APURADOS': perc_mdr
-                })
+        por_volume = rotas['TIPO SATURACAO'].str.upper() == 'VOLUME'
+        saturacao_total = rotas['SAT VOLUME (%)'].where(por_volume, rotas['SAT PESO (%)'])
+        com_saturacao = saturacao_total > 0
+        cargas = pd.Series(np.where(com_saturacao, np.ceil(saturacao_total / 100), 0), index=rotas.index).astype(int)
+
+        # --- Coluna de Sugestão ---
+        saturacao_residual = saturacao_total % 100
+        sugestao = np.select(
+            [(cargas > 0) & (saturacao_residual <= 2), (cargas > 0) & (saturacao_residual <= 50)],
+            ["Cortar coleta do último veículo", "Alterar último veículo para menor porte"],
+            default="Manter coleta"
+        )
+
+        # --- Capacidade Útil per route ---
+        cargas_validas = cargas.where(cargas > 0)
+        cap_util_volume_rota_m3 = (rotas['M³'] / cargas_validas).fillna(0).where(cargas > 0, 0)
+        cap_util_volume_rota_percent = (saturacao_total / cargas_validas).fillna(0).where(cargas > 0, 0)
+
+        dados_volume = pd.DataFrame({
+            'COD FLUXO': rotas['COD FLUXO'],
+            'COD DESTINO': rotas['COD DESTINO'],
+            'DESTINO': rotas['NOME DESTINO'],
+            'Mês': rotas['Mês'],
+            'CÓDIGOS FORNECEDORES': rotas['COD FORNECEDOR'],
+            'FORNECEDORES NA ROTA': rotas['FORNECEDORES NA ROTA'],
+            'VEÍCULO': veic_display,
+            'TECNOLOGIA': rotas['TECNOLOGIA'],
+            'MOT': rotas['MOT'],
+            'TRANSPORTADORA': rotas['TRANSPORTADORA'],
+            'TIPO DE SATURAÇÃO': rotas['TIPO SATURACAO'],
+            'VOLUME TOTAL (m³)': arredondar(rotas['M³'], 1),
+            'PESO TOTAL (kg)': arredondar(rotas['PESO TOTAL'], 1),
+            'EMBALAGENS TOTAL': rotas['QTD EMBALAGENS'].astype(int),
+            'SATURAÇÃO TOTAL (%)': arredondar(saturacao_total, 2),
+            'CARGAS': cargas,
+            'CAP. ÚTIL (m³)': arredondar(cap_util_volume_rota_m3, 1),
+            'CAP. ÚTIL (%)': arredondar(cap_util_volume_rota_percent, 2),
+            'SUGESTÃO': sugestao,
+            # --- Apuração de MDR ---
+            '% MDRs APURADOS': np.where(com_saturacao, 100.0, 0.0)
+        }).infer_objects()
+        if por_veiculo:
+            dados_volume.insert(0, 'COD VEICULO', rotas['VEICULO'].values)
 
     df_volume = pd.DataFrame(dados_volume)
+    if exportar_excel:
+        exportar_volume_excel(df_volume)
+    return df_volume
+
+
+def exportar_volume_excel(df_volume, caminho_arquivo=ARQUIVO_VOLUME):
+    """Grava o Volume por rota; se o arquivo estiver aberto, usa um nome com timestamp"""
     # Attempt to write to the default filename; if file is locked, fall back to a timestamped file
     try:
-        df_volume.to_excel('Volume_por_rota.xlsx', index=False)
+        df_volume.to_excel(caminho_arquivo, index=False)
+        return caminho_arquivo
     except PermissionError:
         import datetime
-        fallback = f"Volume_por_rota_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        print(f"Warning: could not write 'Volume_por_rota.xlsx' (file may be open). Writing to {fallback} instead.")
+        base, ext = os.path.splitext(caminho_arquivo)
+        fallback = f"{base}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
+        logger.warning("could not write '%s' (file may be open). Writing to %s instead.", caminho_arquivo, fallback)
         df_volume.to_excel(fallback, index=False)
+        return fallback
+
+
+def montar_template_demanda(demanda_df, cod_destino, veiculo_code, rotas):
+    """
+    Template do Viajante a partir da demanda [Mês, COD FORNECEDOR, DESENHO, QTDE]:
+    completa COD FORNECEDOR / COD IMS pelo FLUXO e fixa VEICULO e COD DESTINO.
+    """
+    template_df = demanda_df.copy()
+
+    # Initialize columns
+    template_df['COD IMS'] = None
+    template_df['TIPO SATURACAO'] = None
+
+    # Classify each entered code and cross-fill COD FORNECEDOR / COD IMS from FLUXO (índice exato)
+    # Rule: length < 8 → COD IMS; length >= 8 → COD FORNECEDOR
+    updated_cod_fornecedor = []
+    updated_cod_ims = []
+
+    for cod in template_df['COD FORNECEDOR']:
+        cod = str(cod).strip()
+
+        if len(cod) < 8:
+            # Entered code is COD IMS — look up COD FORNECEDOR in FLUXO
+            updated_cod_ims.append(cod)
+            cod_forn_found = None
+            rota = rotas.rota_ims(cod)
+            if rota is not None and pd.notna(rota.get('COD FORNECEDOR')):
+                cod_forn_found = str(rota['COD FORNECEDOR']).strip()
+            updated_cod_fornecedor.append(cod_forn_found if cod_forn_found else cod)
+        else:
+            # Entered code is COD FORNECEDOR — look up COD IMS in FLUXO
+            updated_cod_fornecedor.append(cod)
+            cod_ims_found = None
+            rota = rotas.rota_fornecedor(cod)
+            if rota is not None and pd.notna(rota.get('COD IMS')):
+                cod_ims_found = str(rota['COD IMS']).strip()
+            updated_cod_ims.append(cod_ims_found)
+
+    # Update columns with classified codes
+    template_df['COD FORNECEDOR'] = updated_cod_fornecedor
+    template_df['COD IMS'] = updated_cod_ims
+    
+    # Add VEICULO and COD DESTINO columns (use numeric code for VEICULO)
+    template_df['VEICULO'] = veiculo_code
+    template_df['COD DESTINO'] = cod_destino
+    
+    # Ensure correct column order for Viajante processing
+    template_df = template_df[['COD FORNECEDOR', 'COD IMS', 'COD DESTINO', 'DESENHO', 'QTDE', 'VEICULO', 'TIPO SATURACAO', 'Mês']]
+    return template_df
 
 
-def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD='BD'):
+def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD='BD', exportar_excel=False,
+                          pasta_saida=None):
     """
     Executa o processamento Viajante sem interface gráfica (headless mode).
+    Os estágios trocam DataFrames em memória; nenhum Excel é gravado a não ser com exportar_excel.
+    Não depende do cwd nem de estado global, então várias execuções podem rodar em paralelo.
     
     Args:
         demanda_df: DataFrame com colunas [Mês, COD FORNECEDOR, DESENHO, QTDE]
@@ -962,19 +1001,16 @@ def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD=
         cod_destino: Código IMS Destino (ex: '1080')
         veiculo: Nome do veículo (ex: 'VAN', 'CARRETA') ou código numérico (ex: 10, 4)
         caminho_BD: Caminho para pasta BD com os cadastros
+        exportar_excel: Grava VIAJANTE.xlsx e Volume_por_rota.xlsx ao final
+        pasta_saida: Pasta do export (padrão: pasta do Viajante); use uma por execução em paralelo
         
     Returns:
-        Dict com status e resultados extraídos do Volume_por_rota.xlsx
+        Dict com status, resultados do volume por rota e 'tempos' (segundos por etapa)
     """
+    tempos = {}
     try:
-        print(f"\n{'='*60}")
-        print(f"VIAJANTE HEADLESS MODE")
-        print(f"{'='*60}")
-        print(f"  COD SAP: {cod_sap}")
-        print(f"  COD DESTINO: {cod_destino}")
-        print(f"  VEICULO: {veiculo}")
-        print(f"  Demand rows: {len(demanda_df)}")
-        print(f"{'='*60}\n")
+        logger.debug('VIAJANTE HEADLESS MODE: COD SAP %s | COD DESTINO %s | VEICULO %s | %s demand rows',
+                     cod_sap, cod_destino, veiculo, len(demanda_df))
         
         # Validate demanda_df has required columns
         required_cols = ['Mês', 'COD FORNECEDOR', 'DESENHO', 'QTDE']
@@ -984,70 +1020,27 @@ def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD=
                 "message": f"DataFrame de demanda deve conter colunas: {required_cols}"
             }
         
-        # Load vehicle mapping dynamically from VEÍCULOS.xlsx file
-        veic_files = [
-            os.path.join(caminho_base, caminho_BD, "VEÍCULOS.xlsx"),
-            os.path.join(caminho_base, caminho_BD, "VEICULOS.xlsx"),
-            os.path.join(caminho_base, caminho_BD, "Veiculos.xlsx")
-        ]
-        veiculo_mapping = {}  # name (uppercase) -> code
-        
-        for vf in veic_files:
-            if os.path.exists(vf):
-                try:
-                    dfv = pd.read_excel(vf, sheet_name=0)
-                    # Detect code and description columns
-                    cols_upper = {c.strip().upper(): c for c in dfv.columns}
-                    cod_col = None
-                    desc_col = None
-                    for key_upper, orig in cols_upper.items():
-                        if 'COD' in key_upper and 'VEIC' in key_upper:
-                            cod_col = orig
-                        if 'DESCR' in key_upper or 'DESC' in key_upper:
-                            desc_col = orig
-                    
-                    # Fallback heuristics
-                    if cod_col is None and len(dfv.columns) >= 1:
-                        cod_col = dfv.columns[0]
-                    if desc_col is None and len(dfv.columns) >= 2:
-                        desc_col = dfv.columns[1]
-                    
-                    if desc_col is None:
-                        print(f"Warning: Could not detect vehicle description column in {vf}")
-                        continue
-                    
-                    # Build name -> code mapping
-                    for _, r in dfv.iterrows():
-                        code = r.get(cod_col)
-                        name = r.get(desc_col)
-                        if pd.isna(code) or pd.isna(name):
-                            continue
-                        try:
-                            code_int = int(code)
-                            # Store with uppercase name for case-insensitive matching
-                            veiculo_mapping[str(name).upper().strip()] = code_int
-                        except Exception:
-                            continue
-                    
-                    break
-                except Exception as e:
-                    print(f"Warning: Could not read {vf}: {e}")
-                    continue
+        inicio = time.perf_counter()
+        cadastros = obter_cadastros(os.path.join(caminho_base, caminho_BD))
+        inicio = marcar_tempo(tempos, 'cadastros', inicio)
+
+        # name (uppercase) -> code, do cadastro de VEÍCULOS
+        veiculo_mapping = cadastros.mapa_codigo_veiculo
         
         if not veiculo_mapping:
-            print("Warning: Could not load vehicle mapping from file, will only accept numeric codes")
+            logger.warning('Could not load vehicle mapping from file, will only accept numeric codes')
         
         # Convert vehicle to integer code
         if isinstance(veiculo, str):
             veiculo_upper = veiculo.upper().strip()
             if veiculo_upper in veiculo_mapping:
                 veiculo_code = veiculo_mapping[veiculo_upper]
-                print(f"  Mapped vehicle '{veiculo}' -> code {veiculo_code}")
+                logger.debug("Mapped vehicle '%s' -> code %s", veiculo, veiculo_code)
             else:
                 # Try to parse as integer
                 try:
                     veiculo_code = int(veiculo)
-                    print(f"  Using numeric vehicle code: {veiculo_code}")
+                    logger.debug('Using numeric vehicle code: %s', veiculo_code)
                 except ValueError:
                     available_vehicles = ', '.join(sorted(veiculo_mapping.keys()))
                     return {
@@ -1057,104 +1050,48 @@ def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD=
         else:
             veiculo_code = int(veiculo)
         
-        # Prepare Template.xlsx from demanda_df
-        template_df = demanda_df.copy()
-        
-        # Load FLUXO to get COD FORNECEDOR mapping for COD IMS codes
-        fluxos_path = os.path.join(caminho_base, caminho_BD, "FLUXO.xlsx")
-        fluxos = pd.DataFrame()
-        if os.path.exists(fluxos_path):
-            try:
-                fluxos = pd.read_excel(fluxos_path, sheet_name='FLUXOS')
-            except Exception as e:
-                print(f"Warning: Could not load FLUXO.xlsx: {e}")
-        
-        # Initialize columns
-        template_df['COD IMS'] = None
-        template_df['TIPO SATURACAO'] = None
-
-        # Classify each entered code and cross-fill COD FORNECEDOR / COD IMS from FLUXO
-        # Rule: length < 8 → COD IMS; length >= 8 → COD FORNECEDOR
-        updated_cod_fornecedor = []
-        updated_cod_ims = []
-
-        for idx, row in template_df.iterrows():
-            cod = str(row['COD FORNECEDOR']).strip()
-
-            if len(cod) < 8:
-                # Entered code is COD IMS — look up COD FORNECEDOR in FLUXO
-                updated_cod_ims.append(cod)
-                cod_forn_found = None
-                if not fluxos.empty and 'COD IMS' in fluxos.columns and 'COD FORNECEDOR' in fluxos.columns:
-                    match = fluxos[fluxos['COD IMS'].astype(str).str.contains(cod, na=False)]
-                    if not match.empty:
-                        val = match.iloc[0]['COD FORNECEDOR']
-                        if pd.notna(val):
-                            cod_forn_found = str(val).strip()
-                updated_cod_fornecedor.append(cod_forn_found if cod_forn_found else cod)
-            else:
-                # Entered code is COD FORNECEDOR — look up COD IMS in FLUXO
-                updated_cod_fornecedor.append(cod)
-                cod_ims_found = None
-                if not fluxos.empty and 'COD FORNECEDOR' in fluxos.columns and 'COD IMS' in fluxos.columns:
-                    match = fluxos[fluxos['COD FORNECEDOR'].astype(str).str.contains(cod, na=False)]
-                    if not match.empty:
-                        val = match.iloc[0]['COD IMS']
-                        if pd.notna(val):
-                            cod_ims_found = str(val).strip()
-                updated_cod_ims.append(cod_ims_found)
-
-        # Update columns with classified codes
-        template_df['COD FORNECEDOR'] = updated_cod_fornecedor
-        template_df['COD IMS'] = updated_cod_ims
-        
-        # Add VEICULO and COD DESTINO columns (use numeric code for VEICULO)
-        template_df['VEICULO'] = veiculo_code
-        template_df['COD DESTINO'] = cod_destino
-        
-        # Ensure correct column order for Viajante processing
-        template_df = template_df[['COD FORNECEDOR', 'COD IMS', 'COD DESTINO', 'DESENHO', 'QTDE', 'VEICULO', 'TIPO SATURACAO', 'Mês']]
+        # Prepare template from demanda_df
+        template_df = montar_template_demanda(demanda_df, cod_destino, veiculo_code, cadastros.rotas)
+        inicio = marcar_tempo(tempos, 'template', inicio)
         
-        # Save Template.xlsx for Viajante processing
-        template_df.to_excel('Template.xlsx', index=False)
-        print(f"✓ Template.xlsx created: {len(template_df)} rows")
+        logger.info('✓ Template prepared in memory: %s rows', len(template_df))
         
-        # Create dummy tree and canvas objects (Viajante functions expect them but we don't use them)
-        # These are used only for Tkinter display which we skip
-        dummy_tree = None
-        dummy_tree_resumo = None
-        dummy_canvas = None
-        dummy_img = None
-        
-        # Run completar_informacoes to enrich data and create VIAJANTE.xlsx
-        print(f"\nRunning completar_informacoes()...")
-        completar_informacoes(
-            tree=dummy_tree,
+        # Run completar_informacoes to enrich data (no GUI widgets in headless mode)
+        logger.debug('Running completar_informacoes()...')
+        viajante = completar_informacoes(
+            tree=None,
             veiculo=veiculo_code,
-            tree_resumo=dummy_tree_resumo,
-            canvas_caminhoes=dummy_canvas,
-            caminhao_img=dummy_img,
+            tree_resumo=None,
+            canvas_caminhoes=None,
+            caminhao_img=None,
             usar_manual=True,  # Use selected vehicle for all rows
-            caminho_BD=caminho_BD
+            caminho_BD=caminho_BD,
+            template=template_df,
+            exportar_excel=False,
+            tempos=tempos
         )
-        print(f"✓ VIAJANTE.xlsx created")
-        
-        # Run consolidar_dados to generate Volume_por_rota.xlsx
-        print(f"\nRunning consolidar_dados()...")
-        consolidar_dados()
-        print(f"✓ Volume_por_rota.xlsx created")
+        inicio = time.perf_counter()
+        if viajante is None:
+            return {
+                "status": "error",
+                "message": "Erro ao processar Viajante: falha em completar_informacoes"
+            }
         
-        # Read Volume_por_rota.xlsx and extract required columns
-        volume_file = 'Volume_por_rota.xlsx'
-        if not os.path.exists(volume_file):
-            # Try timestamped fallback
-            import glob
-            fallback_files = glob.glob('Volume_por_rota_*.xlsx')
-            if fallback_files:
-                volume_file = sorted(fallback_files)[-1]  # Get most recent
-                print(f"Using fallback file: {volume_file}")
+        # Run consolidar_dados on the in-memory 'Template Completo'
+        logger.debug('Running consolidar_dados()...')
+        df_volume = consolidar_dados(template=viajante['template'], exportar_excel=False, caminho_BD=caminho_BD)
+        inicio = marcar_tempo(tempos, 'consolidacao', inicio)
         
-        df_volume = pd.read_excel(volume_file)
+        # Optional final export step
+        volume_file = None
+        if exportar_excel:
+            pasta_saida = pasta_saida or caminho_base
+            os.makedirs(pasta_saida, exist_ok=True)
+            exportar_viajante_excel(viajante['template'], viajante['saturacao'], viajante['empilhamento'],
+                                    os.path.join(pasta_saida, 'VIAJANTE.xlsx'))
+            volume_file = exportar_volume_excel(df_volume, os.path.join(pasta_saida, 'Volume_por_rota.xlsx'))
+            logger.info('✓ VIAJANTE.xlsx / %s exported', volume_file)
+            inicio = marcar_tempo(tempos, 'exportacao', inicio)
         
         # Extract required columns
         columns_to_return = [
@@ -1175,7 +1112,7 @@ def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD=
         
         # Filter to only requested columns that exist
         available_cols = [col for col in columns_to_return if col in df_volume.columns]
-        df_results = df_volume[available_cols]
+        df_results = tipar_como_excel(df_volume[available_cols])
         
         
         # Convert to list of dicts for JSON serialization
@@ -1186,32 +1123,212 @@ def run_viajante_headless(demanda_df, cod_sap, cod_destino, veiculo, caminho_BD=
             for key, value in row.items():
                 if pd.isna(value):
                     row[key] = None
+        marcar_tempo(tempos, 'resultado', inicio)
         
-        print(f"\n{'='*60}")
-        print(f"VIAJANTE PROCESSING COMPLETE")
-        print(f"{'='*60}")
-        # print(f"  Results: {len(results)} rows")
-        # print(f"  Columns: {available_cols}")
-        # print(f"{'='*60}\n")
+        logger.debug('VIAJANTE PROCESSING COMPLETE')
         
         return {
             "status": "success",
             "message": f"Viajante processado com sucesso: {len(results)} rotas/meses",
             "results": results,
             "file_path": volume_file,
-            "total_rows": len(results)
+            "total_rows": len(results),
+            "tempos": {etapa: round(segundos, 4) for etapa, segundos in tempos.items()}
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR in run_viajante_headless: {e}")
-        traceback.print_exc()
+        logger.exception('❌ ERROR in run_viajante_headless: %s', e)
         return {
             "status": "error",
-            "message": f"Erro ao processar Viajante: {str(e)}"
+            "message": f"Erro ao processar Viajante: {str(e)}",
+            "tempos": {etapa: round(segundos, 4) for etapa, segundos in tempos.items()}
+        }
+
+
+def varrer_veiculos(template, caminho_BD='BD', veiculos=None):
+    """
+    Varredura de veículos: enriquece o template e empilha as embalagens uma única vez e avalia
+    saturação, CARGAS e capacidade útil de todos os veículos numa só passada (embalagens x veículos).
+
+    O empilhamento (quantas caixas combinam) não depende do veículo; a capacidade só divide as
+    caixas empilhadas, então SATURAÇÃO_TOTAL = (pallets + empilhadas) / capacidade x eficiência,
+    o mesmo que completar_informacoes calcula para um veículo.
+
+    veiculos: códigos a avaliar (padrão: todos do cadastro de VEÍCULOS)
+
+    Returns:
+        (ranking, df_volume): uma linha por veículo, da melhor opção para a pior, e o volume
+        por rota/mês de cada veículo (coluna COD VEICULO)
+    """
+    cadastros = obter_cadastros(os.path.join(caminho_base, caminho_BD))
+    cadastros.exigir('PN', 'MDR', 'VEICULOS', 'EMPILHAMENTO', 'PERDA_COMPRIMENTO', 'FLUXO')
+
+    # Só entram veículos com coluna de capacidade no db_MDR e na tabela de eficiência
+    colunas_validas = set(cadastros.db_MDR_capacidade.columns) & set(cadastros.db_efi_por_chave.columns)
+    coluna_por_veiculo = {}
+    for cod in (sorted(cadastros.veiculos.vehicles) if veiculos is None else veiculos):
+        coluna = cadastros.mapa_coluna_capacidade.get(cod)
+        if coluna in colunas_validas:
+            coluna_por_veiculo[cod] = coluna
+        else:
+            logger.warning("Veículo %s fora da varredura: coluna '%s' sem capacidade/eficiência cadastrada", cod, coluna)
+    if not coluna_por_veiculo:
+        return pd.DataFrame(), pd.DataFrame()
+    df_veiculos = pd.DataFrame({'VEICULO': list(coluna_por_veiculo)})
+
+    # --- Enriquecimento e saturação base, uma vez para todos os veículos ---
+    template = normalizar_template(template)
+    if 'Mês' not in template.columns:
+        template['Mês'] = 'N/A'
+    template = template[template['QTDE'] > 0].copy()
+    template['VEICULO'] = np.nan
+    template = enriquecer_template(template, cadastros)[COLUNAS_TEMPLATE]
+
+    df_saturacao = agrupar_saturacao(template, cadastros).drop(columns=['VEICULO'])
+    df_saturacao['EMBALAGEM_BASE'] = pertence_aos_pares(
+        df_saturacao['FORNECEDOR'], df_saturacao['EMBALAGEM'], cadastros.bases)
+    df_saturacao['EMBALAGEM_SOBREPOSTA'] = pertence_aos_pares(
+        df_saturacao['FORNECEDOR'], df_saturacao['EMBALAGEM'], cadastros.sobrepostas)
+    df_saturacao['CHAVE'] = df_saturacao['COD FORNECEDOR'].astype(str) + '-' + df_saturacao['EMBALAGEM'].astype(str)
+
+    # Empilhamento com capacidade unitária: SATURAÇÃO = caixas empilhadas
+    df_empilhamento = calcular_empilhamento(df_saturacao.assign(CAPACIDADE=1.0), cadastros.db_empilhamento)
+    com_empilhamento = not df_empilhamento.empty
+    if com_empilhamento:
+        empilhadas = (
+            df_empilhamento.astype({'FORNECEDOR': object, 'EMBALAGEM_BASE': object})
+            .groupby(['FORNECEDOR', 'EMBALAGEM_BASE'], sort=False)['TOTAL_EMBALAGENS_EMPILHADAS'].sum()
+            .rename('EMPILHADAS')
+            .reset_index()
+            .rename(columns={'FORNECEDOR': 'COD FORNECEDOR', 'EMBALAGEM_BASE': 'EMBALAGEM'})
+        )
+        chaves = df_saturacao[['COD FORNECEDOR', 'EMBALAGEM']].astype(object)
+        df_saturacao['EMPILHADAS'] = chaves.merge(
+            empilhadas, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')['EMPILHADAS'].fillna(0).values
+    else:
+        df_saturacao['EMPILHADAS'] = 0
+
+    # --- Produto embalagens x veículos: capacidade e eficiência por merge ---
+    cruzado = df_saturacao.merge(df_veiculos, how='cross')
+    cruzado['CAPACIDADE'] = pd.to_numeric(
+        resolver_capacidade(cruzado['EMBALAGEM'], cruzado['VEICULO'], cadastros, rotulo='varredura'), errors='coerce')
+
+    eficiencias = (
+        cadastros.db_efi_por_chave[sorted(set(coluna_por_veiculo.values()))]
+        .rename_axis('CHAVE').reset_index()
+        .melt(id_vars='CHAVE', var_name='COLUNA', value_name='EFICIÊNCIA_COMPRIMENTO')
+        .astype({'CHAVE': object})
+    )
+    cruzado['COLUNA'] = cruzado['VEICULO'].map(coluna_por_veiculo)
+    cruzado['EFICIÊNCIA_COMPRIMENTO'] = cruzado[['CHAVE', 'COLUNA']].astype(object).merge(
+        eficiencias, on=['CHAVE', 'COLUNA'], how='left')['EFICIÊNCIA_COMPRIMENTO'].fillna(1).values
+
+    proporcao = cruzado['CXS/PALLETS_TOTAL'] / cruzado['CAPACIDADE']
+    if com_empilhamento:
+        cruzado['SATURAÇÃO_TOTAL'] = (proporcao + cruzado['EMPILHADAS'] / cruzado['CAPACIDADE']) * \
+                                     cruzado['EFICIÊNCIA_COMPRIMENTO']
+    else:
+        cruzado['SATURAÇÃO_TOTAL'] = proporcao
+    cruzado['SATURAÇÃO_POR_MDR'] = cruzado['SATURAÇÃO_TOTAL'] / cruzado['TOTAL DE CXS']
+
+    # --- SAT por linha do template, para cada veículo ---
+    template['CHAVE'] = template['COD FORNECEDOR'].astype(str) + '-' + template['MDR'].astype(str)
+    linhas = template.drop(columns=['VEICULO', 'PESO_MAXIMO']).merge(df_veiculos, how='cross')
+    linhas['PESO_MAXIMO'] = linhas['VEICULO'].map(cadastros.mapa_peso_max)
+    linhas = linhas.merge(cruzado[['CHAVE', 'VEICULO', 'SATURAÇÃO_POR_MDR']], on=['CHAVE', 'VEICULO'], how='left')
+    linhas['SAT VOLUME (%)'] = round(linhas['QTD EMBALAGENS'] * linhas['SATURAÇÃO_POR_MDR'] * 100, 2)
+    linhas['SAT PESO (%)'] = round(linhas['PESO TOTAL'] / linhas['PESO_MAXIMO'] * 100, 2)
+    linhas['CAPACIDADE ÚTIL (%)'] = linhas[['SAT VOLUME (%)', 'SAT PESO (%)']].max(axis=1)
+    linhas = linhas[COLUNAS_TEMPLATE + ['SAT VOLUME (%)', 'SAT PESO (%)', 'CAPACIDADE ÚTIL (%)']]
+
+    # --- CARGAS / capacidade útil por rota e mês, todos os veículos num único consolidar ---
+    df_volume = consolidar_dados(template=linhas, exportar_excel=False, caminho_BD=caminho_BD, por_veiculo=True)
+
+    # --- Ranking: uma linha por veículo ---
+    ranking = pd.DataFrame(index=pd.Index(list(coluna_por_veiculo), name='COD VEICULO'))
+    ranking['VEÍCULO'] = [cadastros.veiculos.name_for(cod) for cod in ranking.index]
+    ranking['CAPACIDADE (m³)'] = [cadastros.veiculos.get(cod)['capacidade_m3'] for cod in ranking.index]
+    totais = ['CARGAS', 'SATURAÇÃO TOTAL (%)', 'VOLUME TOTAL (m³)', 'PESO TOTAL (kg)']
+    if df_volume.empty:
+        ranking[totais] = 0
+    else:
+        ranking = ranking.join(df_volume.groupby('COD VEICULO')[totais].sum()).fillna({c: 0 for c in totais})
+    ranking['CARGAS'] = ranking['CARGAS'].astype(int)
+    cargas_validas = ranking['CARGAS'].where(ranking['CARGAS'] > 0)
+    ranking['CAP. ÚTIL (m³)'] = arredondar((ranking['VOLUME TOTAL (m³)'] / cargas_validas).fillna(0), 1)
+    ranking['CAP. ÚTIL (%)'] = arredondar((ranking['SATURAÇÃO TOTAL (%)'] / cargas_validas).fillna(0), 2)
+    # MDRs sem capacidade para o veículo deixam a saturação incompleta: esses veículos vão para o fim
+    ranking['MDRs SEM CAPACIDADE'] = cruzado.groupby('VEICULO')['CAPACIDADE'].apply(lambda c: int(c.isna().sum()))
+    ranking['SATURAÇÃO TOTAL (%)'] = arredondar(ranking['SATURAÇÃO TOTAL (%)'], 2)
+
+    ranking = ranking.reset_index().sort_values(
+        ['MDRs SEM CAPACIDADE', 'CARGAS', 'CAP. ÚTIL (%)'], ascending=[True, True, False], kind='mergesort')
+    ranking.insert(0, 'RANKING', np.arange(1, len(ranking) + 1))
+    return ranking.reset_index(drop=True), df_volume
+
+
+def run_viajante_sweep(demanda_df, cod_sap, cod_destino, caminho_BD='BD', veiculos=None):
+    """
+    Varredura headless: avalia todos os veículos (ou a lista veiculos, por nome ou código)
+    para a demanda do fornecedor e devolve o ranking e o volume por rota/mês de cada um
+    (e 'tempos', segundos por etapa).
+    """
+    tempos = {}
+    try:
+        logger.debug('VIAJANTE VEHICLE SWEEP: COD SAP %s | COD DESTINO %s | %s demand rows',
+                     cod_sap, cod_destino, len(demanda_df))
+
+        required_cols = ['Mês', 'COD FORNECEDOR', 'DESENHO', 'QTDE']
+        if not all(col in demanda_df.columns for col in required_cols):
+            return {
+                "status": "error",
+                "message": f"DataFrame de demanda deve conter colunas: {required_cols}"
+            }
+
+        inicio = time.perf_counter()
+        cadastros = obter_cadastros(os.path.join(caminho_base, caminho_BD))
+        inicio = marcar_tempo(tempos, 'cadastros', inicio)
+        codigos = None
+        if veiculos is not None:
+            codigos = [cadastros.veiculos.code_for(v) for v in veiculos]
+            desconhecidos = [v for v, cod in zip(veiculos, codigos) if cod is None]
+            if desconhecidos:
+                return {
+                    "status": "error",
+                    "message": f"Veículos não encontrados no cadastro: {desconhecidos}"
+                }
+
+        template_df = montar_template_demanda(demanda_df, cod_destino, None, cadastros.rotas)
+        inicio = marcar_tempo(tempos, 'template', inicio)
+        ranking, df_volume = varrer_veiculos(template_df, caminho_BD=caminho_BD, veiculos=codigos)
+        inicio = marcar_tempo(tempos, 'varredura', inicio)
+        if ranking.empty:
+            return {"status": "error", "message": "Nenhum veículo com capacidade cadastrada para a varredura"}
+
+        colunas_volume = ['COD VEICULO', 'VEÍCULO', 'COD DESTINO', 'DESTINO', 'Mês', 'CARGAS', 'CAP. ÚTIL (m³)',
+                          'CAP. ÚTIL (%)', 'SATURAÇÃO TOTAL (%)', 'VOLUME TOTAL (m³)', 'PESO TOTAL (kg)', 'SUGESTÃO']
+        df_volume = df_volume[[c for c in colunas_volume if c in df_volume.columns]]
+
+        logger.info('✓ %s veículos avaliados; melhor opção: %s', len(ranking), ranking['VEÍCULO'].iloc[0])
+        ranking_registros = tipar_como_excel(ranking).astype(object).where(ranking.notna(), None).to_dict('records')
+        volume_registros = tipar_como_excel(df_volume).astype(object).where(df_volume.notna(), None).to_dict('records')
+        marcar_tempo(tempos, 'resultado', inicio)
+        return {
+            "status": "success",
+            "message": f"Varredura concluída: {len(ranking)} veículos avaliados",
+            "ranking": ranking_registros,
+            "results": volume_registros,
+            "tempos": {etapa: round(segundos, 4) for etapa, segundos in tempos.items()},
+        }
+
+    except Exception as e:
+        logger.exception('❌ ERROR in run_viajante_sweep: %s', e)
+        return {
+            "status": "error",
+            "message": f"Erro na varredura de veículos: {str(e)}"
         }
 
 
 #tree = ttk.Treeview()
 #tree_resumo = ttk.Treeview()
 #completar_informacoes(tree,3, tree_resumo)
-
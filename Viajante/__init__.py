@@ -0,0 +1,9 @@
+"""
+Viajante - Saturação e volume por rota
+Importável como pacote (from Viajante import run_viajante_headless); a interface continua em main.py
+"""
+
+from .DB import run_viajante_headless, run_viajante_sweep, varrer_veiculos, completar_informacoes, consolidar_dados
+from .cadastros import obter_cadastros, limpar_cadastros
+
+__all__ = ['run_viajante_headless', 'run_viajante_sweep', 'varrer_veiculos', 'completar_informacoes', 'consolidar_dados', 'obter_cadastros', 'limpar_cadastros']
@@ -0,0 +1,375 @@
+"""
+Cadastros do Viajante (pasta BD) carregados uma única vez por processo.
+
+Os arquivos de referência (PN, MDR, VEÍCULOS, EMPILHAMENTO, PERDA_COMPRIMENTO, FLUXO)
+são lidos do Excel apenas quando mudam: cada planilha ganha um cache Parquet ao lado
+do arquivo original (arquivo.parquet), reconstruído quando o Excel é mais novo.
+Os mapas usados por completar_informacoes, consolidar_dados e run_viajante_headless
+são montados uma vez e compartilhados - nenhum chamador deve alterar esses objetos.
+"""
+import logging
+import os
+import re
+import threading
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from modules.vehicle_registry import get_vehicle_registry, VEHICLE_FILES
+
+logger = logging.getLogger(__name__)
+
+# nome lógico -> (arquivo, aba, dtype)
+ARQUIVOS_CADASTRO = {
+    'PN': ("BD_CADASTRO_PN.xlsx", 'BD', {'CÓD. FORNECEDOR': int, 'DESENHO': str}),
+    'MDR': ("BD_CADASTRO_MDR.xlsx", 'BD', None),
+    'EMPILHAMENTO': ("BD_EMPILHAMENTO_EMBALAGENS.xlsx", 'BD', None),
+    'PERDA_COMPRIMENTO': ("BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx", 'BD', None),
+    'FLUXO': ("FLUXO.xlsx", 'FLUXOS', None),
+}
+
+# Colunas object com tipos mistos (ex.: MDR int/str) são gravadas como texto + etiqueta de tipo
+_SUFIXO_TIPO = '__tipo'
+_CODIFICADORES = {
+    bool: 'bool',
+    int: 'int',
+    float: 'float',
+    str: 'str',
+    datetime.datetime: 'datetime',
+    pd.Timestamp: 'datetime',
+}
+_DECODIFICADORES = {
+    'bool': lambda v: v == 'True',
+    'int': int,
+    'float': float,
+    'str': lambda v: v,
+    'datetime': pd.Timestamp,
+}
+
+_CADASTROS = {}
+_CADASTROS_LOCK = threading.Lock()
+
+
+def _codificar_coluna(serie):
+    """Texto + etiqueta de tipo por valor; None se houver um tipo que não sabemos restaurar"""
+    valores, tipos = [], []
+    for v in serie.tolist():
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            valores.append(None)
+            tipos.append('float' if v is not None else None)
+            continue
+        tipo = _CODIFICADORES.get(type(v))
+        if tipo is None:
+            return None
+        valores.append(v.isoformat() if tipo == 'datetime' else repr(v) if tipo == 'float' else str(v))
+        tipos.append(tipo)
+    return valores, tipos
+
+
+def _gravar_parquet(df, parquet_path):
+    """Grava o DataFrame preservando colunas object de tipos mistos; False se não for possível"""
+    if not all(isinstance(c, str) for c in df.columns) or df.columns.duplicated().any():
+        return False
+    saida = {}
+    for col in df.columns:
+        if df[col].dtype == object:
+            codificada = _codificar_coluna(df[col])
+            if codificada is None:
+                return False
+            saida[col] = pd.Series(codificada[0], dtype=object)
+            saida[col + _SUFIXO_TIPO] = pd.Series(codificada[1], dtype=object)
+        else:
+            saida[col] = df[col].reset_index(drop=True)
+    pd.DataFrame(saida).to_parquet(parquet_path, engine='pyarrow', compression='snappy')
+    return True
+
+
+def _ler_parquet(parquet_path):
+    df = pd.read_parquet(parquet_path, engine='pyarrow')
+    colunas_tipo = [c for c in df.columns if c.endswith(_SUFIXO_TIPO)]
+    for col_tipo in colunas_tipo:
+        col = col_tipo[:-len(_SUFIXO_TIPO)]
+        restaurados = []
+        for v, tipo in zip(df[col].tolist(), df[col_tipo].tolist()):
+            if tipo is None or v is None:
+                restaurados.append(np.nan if tipo == 'float' else None)
+            else:
+                restaurados.append(_DECODIFICADORES[tipo](v))
+        df[col] = pd.Series(restaurados, index=df.index, dtype=object)
+    return df.drop(columns=colunas_tipo)
+
+
+def _carregar_planilha(excel_path, sheet_name, dtype=None):
+    """Lê a planilha via cache Parquet (arquivo.parquet), reconvertendo quando o Excel é mais novo"""
+    excel_path = Path(excel_path)
+    parquet_path = excel_path.with_suffix('.parquet')
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= excel_path.stat().st_mtime:
+        try:
+            return _ler_parquet(parquet_path)
+        except Exception as e:
+            logger.warning('Parquet cache inválido para %s (%s), relendo Excel', excel_path.name, e)
+
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype=dtype)
+    try:
+        if not _gravar_parquet(df, parquet_path):
+            logger.warning('%s sem cache Parquet (tipos não suportados)', excel_path.name)
+    except Exception as e:
+        logger.warning('Parquet conversion failed para %s (%s)', excel_path.name, e)
+    return df
+
+
+def normalizar_codigos(campo):
+    if pd.isna(campo):
+        return []
+    return re.split(r'\s*/\s*', str(campo).strip())
+
+
+def explodir_rotas(fluxos):
+    """
+    Rotas do FLUXO com uma linha por (COD FORNECEDOR, COD DESTINO): campos com vários códigos
+    ('800002635/800004902', '1080/1046') são explodidos. O COD DESTINO completo também vira chave,
+    para templates que já trazem o destino do fluxo inteiro (ex: '1080/1046').
+    ORDEM_ROTA guarda a posição original da rota no FLUXO.
+    """
+    rotas = fluxos.reset_index(drop=True)
+    rotas = rotas.assign(
+        ORDEM_ROTA=np.arange(len(rotas)),
+        CHAVE_FORNECEDOR=rotas['COD FORNECEDOR'].map(normalizar_codigos),
+        CHAVE_DESTINO=rotas['COD DESTINO'].map(
+            lambda v: list(dict.fromkeys(normalizar_codigos(v) + ([str(v)] if pd.notna(v) else [])))
+        ),
+    )
+    rotas = rotas.drop(columns=['COD FORNECEDOR', 'COD DESTINO', 'FORNECEDOR'], errors='ignore')
+    rotas = rotas.explode('CHAVE_FORNECEDOR').explode('CHAVE_DESTINO')
+    return rotas.dropna(subset=['CHAVE_FORNECEDOR', 'CHAVE_DESTINO'])
+
+
+class IndiceRotas:
+    """
+    Rotas do FLUXO indexadas por código: cada COD FORNECEDOR, COD IMS e COD DESTINO
+    ('800002635/800004902', '1080/1046' são separados) aponta para as posições das rotas
+    que o contêm, na ordem do FLUXO.xlsx. Busca exata, sem str.contains.
+    """
+
+    def __init__(self, fluxos):
+        self.fluxos = fluxos.reset_index(drop=True) if fluxos is not None else pd.DataFrame()
+        self.por_fornecedor = {}
+        self.por_ims = {}
+        self.por_destino = {}
+        self.por_fornecedor_destino = {}
+
+        colunas = [self._coluna(c) for c in ('COD FORNECEDOR', 'COD IMS', 'COD DESTINO')]
+        for ordem, (forn, ims, dest) in enumerate(zip(*colunas)):
+            fornecedores = normalizar_codigos(forn)
+            destinos = normalizar_codigos(dest)
+            self._indexar(self.por_fornecedor, fornecedores, ordem)
+            self._indexar(self.por_ims, normalizar_codigos(ims), ordem)
+            self._indexar(self.por_destino, destinos, ordem)
+            self._indexar(self.por_fornecedor_destino, [(f, d) for f in fornecedores for d in destinos], ordem)
+
+        self.tabela = explodir_rotas(self.fluxos) if not self.fluxos.empty else pd.DataFrame(
+            columns=['CHAVE_FORNECEDOR', 'CHAVE_DESTINO', 'ORDEM_ROTA'])
+
+    def _coluna(self, nome):
+        if nome in self.fluxos.columns:
+            return self.fluxos[nome].tolist()
+        return [None] * len(self.fluxos)
+
+    @staticmethod
+    def _indexar(indice, chaves, ordem):
+        for chave in chaves:
+            rotas = indice.setdefault(chave, [])
+            if not rotas or rotas[-1] != ordem:
+                rotas.append(ordem)
+
+    def primeira_rota(self, indice, chave):
+        """Primeira linha do FLUXO com a chave (código ou par de códigos), ou None"""
+        if isinstance(chave, tuple):
+            chave = tuple(str(c).strip() for c in chave)
+        else:
+            chave = str(chave).strip()
+        rotas = indice.get(chave)
+        return self.fluxos.iloc[rotas[0]] if rotas else None
+
+    def rota_fornecedor(self, cod_fornecedor):
+        return self.primeira_rota(self.por_fornecedor, cod_fornecedor)
+
+    def rota_ims(self, cod_ims):
+        return self.primeira_rota(self.por_ims, cod_ims)
+
+    def rota_fornecedor_destino(self, cod_fornecedor, cod_destino):
+        return self.primeira_rota(self.por_fornecedor_destino, (cod_fornecedor, cod_destino))
+
+
+class Cadastros:
+    """Tabelas e mapas de referência de uma pasta BD (somente leitura)"""
+
+    def __init__(self, caminho_bd):
+        self.caminho_bd = caminho_bd
+        self.arquivos = {}
+        for nome, (arquivo, _, _) in ARQUIVOS_CADASTRO.items():
+            self.arquivos[nome] = os.path.join(caminho_bd, arquivo)
+        # Cadastro de veículos compartilhado com o app principal (modules.vehicle_registry)
+        self.veiculos = get_vehicle_registry(caminho_bd)
+        self.arquivos['VEICULOS'] = str(self.veiculos.file_path or os.path.join(caminho_bd, VEHICLE_FILES[0]))
+        self.assinatura = assinatura_arquivos(self.arquivos)
+
+        tabelas = {}
+        for nome, (_, aba, dtype) in ARQUIVOS_CADASTRO.items():
+            caminho = self.arquivos[nome]
+            tabelas[nome] = _carregar_planilha(caminho, aba, dtype) if os.path.exists(caminho) else None
+
+        self.db_PN = self._preparar_pn(tabelas['PN'])
+        self.db_MDR = self._preparar_mdr(tabelas['MDR'])
+        self.db_veiculos = self.veiculos.df if self.veiculos.file_path else None
+        self.db_empilhamento = tabelas['EMPILHAMENTO']
+        if self.db_empilhamento is not None:
+            self.db_empilhamento = self.db_empilhamento.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
+        self.db_efi = tabelas['PERDA_COMPRIMENTO']
+        self.fluxos = tabelas['FLUXO']
+
+        self._montar_mapas_pn()
+        self._montar_mapas_mdr()
+        self._montar_mapas_veiculos()
+        self._montar_mapas_empilhamento()
+        self._montar_tabela_capacidade()
+        self.rotas = IndiceRotas(self.fluxos)
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _preparar_pn(db_PN):
+        if db_PN is None:
+            return None
+        db_PN = db_PN.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
+        db_PN['DESENHO ATUALIZAÇÃO'] = pd.to_datetime(db_PN['DESENHO ATUALIZAÇÃO'], errors='coerce')
+        db_PN['PESO (Kg) MATERIAL'] = pd.to_numeric(db_PN['PESO (Kg) MATERIAL'], errors='coerce')
+        db_PN = db_PN.sort_values('DESENHO ATUALIZAÇÃO', ascending=False)
+        # Chave composta DESENHO+MDR
+        db_PN['KEY'] = db_PN['DESENHO'].astype(str) + '_' + db_PN['MDR'].astype(str)
+        return db_PN
+
+    @staticmethod
+    def _preparar_mdr(db_MDR):
+        if db_MDR is None:
+            return None
+        db_MDR = db_MDR.rename(columns={'DESCRIÇÃO2': 'DESCRIÇÃO'})
+        db_MDR['VOLUME'] = pd.to_numeric(db_MDR['VOLUME'], errors='coerce')
+        db_MDR['MDR PESO'] = pd.to_numeric(db_MDR['MDR PESO'], errors='coerce')
+        return db_MDR
+
+    def _montar_mapas_pn(self):
+        self.mapa_fornecedores = self.mapa_pn = self.mapa_mdr = None
+        self.mapa_qme = self.mapa_peso_pn = self.mapa_mdr_por_desenho = None
+        if self.db_PN is None:
+            return
+        db_PN = self.db_PN
+        self.mapa_fornecedores = db_PN.drop_duplicates('COD FORNECEDOR').set_index('COD FORNECEDOR')['FORNECEDOR']
+
+        por_key = db_PN.drop_duplicates('KEY').set_index('KEY')
+        self.mapa_pn = por_key['DESCRIÇÃO']
+        self.mapa_mdr = por_key['MDR']
+        self.mapa_qme = por_key['QME']
+        self.mapa_peso_pn = por_key['PESO (Kg) MATERIAL']
+
+        self.mapa_mdr_por_desenho = db_PN.drop_duplicates('DESENHO').set_index('DESENHO')['MDR']
+
+    def _montar_mapas_mdr(self):
+        self.mapa_descricao_mdr = self.mapa_volume = self.mapa_peso_mdr = None
+        self.mapa_paletizavel = self.mapa_cxs_por_pallet = self.mapa_volume_efi = None
+        self.db_MDR_capacidade = None
+        if self.db_MDR is None:
+            return
+        por_mdr = self.db_MDR.drop_duplicates('MDR').set_index('MDR')
+        self.mapa_descricao_mdr = por_mdr['DESCRIÇÃO']
+        self.mapa_volume = por_mdr['VOLUME']
+        self.mapa_peso_mdr = por_mdr['MDR PESO']
+        self.mapa_paletizavel = por_mdr['CAIXA PLÁSTICA']
+        self.mapa_cxs_por_pallet = por_mdr['CAIXAS POR PALLET']
+        self.mapa_volume_efi = self.db_MDR.drop_duplicates('CHAVE EMBALAGENS').set_index('CHAVE EMBALAGENS')['VOLUME']
+
+        # Cópia com MDR em caixa alta para a busca de capacidade por veículo
+        self.db_MDR_capacidade = self.db_MDR.copy()
+        self.db_MDR_capacidade['MDR'] = self.db_MDR_capacidade['MDR'].astype(str).str.upper()
+
+    def _montar_mapas_veiculos(self):
+        self.mapa_peso_max = None
+        dfv = self.db_veiculos
+        if dfv is not None and {'COD VEICULO', 'PESO MAXIMO'} <= set(dfv.columns):
+            self.mapa_peso_max = dfv.set_index('COD VEICULO')['PESO MAXIMO']
+        # código do veículo (ex: 4) -> coluna de capacidade no db_MDR (ex: "14 x 2,4 x 2,78")
+        self.mapa_coluna_capacidade = self.veiculos.capacity_columns()
+        self.mapa_nome_veiculo = self.veiculos.code_to_name    # código (int e str) -> descrição
+        self.mapa_codigo_veiculo = self.veiculos.names_upper()  # DESCRIÇÃO (caixa alta) -> código int
+
+    def _montar_mapas_empilhamento(self):
+        self.bases = set()
+        self.sobrepostas = set()
+        self.db_efi_por_chave = None
+        if self.db_empilhamento is not None:
+            self.bases = set(zip(self.db_empilhamento['FORNECEDOR'], self.db_empilhamento['MDR BASE']))
+            self.sobrepostas = set(zip(self.db_empilhamento['FORNECEDOR'], self.db_empilhamento['MDR SOBREPOSTA']))
+        if self.db_efi is not None:
+            self.db_efi_por_chave = self.db_efi.drop_duplicates('CHAVE FORNE + MDR').set_index('CHAVE FORNE + MDR')
+
+    def _montar_tabela_capacidade(self):
+        """
+        Colunas de capacidade por veículo do db_MDR (uma por dimensão de veículo, ex: "14 x 2,4 x 2,78")
+        derretidas em (MDR, VEICULOS) -> CAPACIDADE, com o primeiro valor preenchido de cada MDR.
+        """
+        self.capacidade_por_mdr = pd.DataFrame(columns=['MDR', 'VEICULOS', 'CAPACIDADE'])
+        if self.db_MDR_capacidade is None or not self.mapa_coluna_capacidade:
+            return
+        colunas = [c for c in dict.fromkeys(self.mapa_coluna_capacidade.values())
+                   if c in self.db_MDR_capacidade.columns]
+        if not colunas:
+            return
+        tabela = self.db_MDR_capacidade[['MDR'] + colunas].melt(
+            id_vars='MDR', var_name='VEICULOS', value_name='CAPACIDADE'
+        )
+        tabela = tabela.dropna(subset=['CAPACIDADE']).drop_duplicates(['MDR', 'VEICULOS'])
+        self.capacidade_por_mdr = tabela.reset_index(drop=True)
+
+    # ------------------------------------------------------------------
+    def exigir(self, *nomes):
+        """Levanta FileNotFoundError se algum cadastro necessário não existe na pasta BD"""
+        for nome in nomes:
+            if not os.path.exists(self.arquivos[nome]):
+                raise FileNotFoundError(f"Cadastro não encontrado: {self.arquivos[nome]}")
+
+    def mapa_efi(self, valor_veiculo):
+        """Eficiência de comprimento por CHAVE (fornecedor-MDR) para a coluna do veículo"""
+        return self.db_efi_por_chave[valor_veiculo]
+
+
+def assinatura_arquivos(arquivos):
+    """(arquivo, mtime) de cada cadastro; muda quando algum Excel é alterado"""
+    assinatura = []
+    for nome in sorted(arquivos):
+        caminho = arquivos[nome]
+        assinatura.append((caminho, os.path.getmtime(caminho) if os.path.exists(caminho) else None))
+    return tuple(assinatura)
+
+
+def obter_cadastros(caminho_bd):
+    """
+    Retorna os cadastros da pasta BD, carregando-os apenas na primeira chamada
+    ou quando algum arquivo foi alterado desde a última carga.
+    """
+    chave = os.path.abspath(caminho_bd)
+    with _CADASTROS_LOCK:
+        cadastros = _CADASTROS.get(chave)
+        if cadastros is not None and assinatura_arquivos(cadastros.arquivos) == cadastros.assinatura:
+            return cadastros
+        # a lista de variantes de VEÍCULOS pode ter mudado: reconstrói tudo
+        logger.debug('Carregando cadastros do Viajante: %s', chave)
+        cadastros = Cadastros(chave)
+        _CADASTROS[chave] = cadastros
+        return cadastros
+
+
+def limpar_cadastros():
+    """Descarta os cadastros em memória (os caches Parquet permanecem)"""
+    with _CADASTROS_LOCK:
+        _CADASTROS.clear()
@@ -2,13 +2,20 @@ from tkinter import *
 from tkinter import ttk
 from tkinter import Canvas
 from PIL import Image, ImageTk
+import os
+import sys
+# Executado de dentro da própria pasta (python main.py): o registry de veículos fica em ../modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Assuming DB.py contains the functions as used in your original code
-from DB import completar_informacoes, consolidar_dados, Processar_Demandas
+from DB import completar_informacoes, consolidar_dados, Processar_Demandas, ARQUIVO_TEMPLATE
+from cadastros import obter_cadastros, get_vehicle_registry
 import pandas as pd
 import re
-import os
-import sys
 import threading
+import logging
+
+# Mensagens do DB/cadastros no console, como os antigos prints (DEBUG mostra os diagnósticos)
+logging.basicConfig(level=os.environ.get('BC_TURBO_LOG_LEVEL', 'INFO').upper(), format='%(message)s')
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -37,7 +44,7 @@ warnings.filterwarnings(
     message="^WARNING .*" # Hides the file size warnings which don't have a category
 )
 
-caminho_base = os.getcwd()
+caminho_base = os.path.dirname(os.path.abspath(__file__))
 # --- START: Global variables for filtering ---
 # Stores the complete, unfiltered data from the Treeview
 original_tree_data = []
@@ -54,54 +61,8 @@ def load_veiculos(caminho_base):
     If the file or expected columns are not found, returns None.
     Only returns the display mapping (original descriptions -> code).
     """
-    possible_files = [
-        os.path.join(caminho_base, "BD", "VEÍCULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "VEICULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "Veiculos.xlsx"),
-        os.path.join(caminho_base, "BD", "VEICULOS.xls")
-    ]
-    for fpath in possible_files:
-        if os.path.exists(fpath):
-            try:
-                df_veh = pd.read_excel(fpath, sheet_name=0, dtype=str)  # read as str to be safe
-                # normalize column names (case-insensitive)
-                cols = {c.strip().upper(): c for c in df_veh.columns}
-                # find code column (prefer "COD VEICULO" or similar)
-                code_col = None
-                desc_col = None
-                for key_upper, orig in cols.items():
-                    if "COD" in key_upper and "VEIC" in key_upper:
-                        code_col = orig
-                    if "DESCR" in key_upper or "DESC" in key_upper:
-                        desc_col = orig
-                # fallback: use first column as code and second (or next) as desc
-                if code_col is None and len(df_veh.columns) >= 1:
-                    code_col = df_veh.columns[0]
-                if desc_col is None and len(df_veh.columns) >= 2:
-                    # try second column
-                    desc_col = df_veh.columns[1]
-                if code_col is None or desc_col is None:
-                    # can't map properly from this file
-                    continue
-                veic_map = {}
-                for _, r in df_veh.iterrows():
-                    desc = str(r.get(desc_col, "")).strip()
-                    code_raw = r.get(code_col, "")
-                    # try to convert code to int if possible, else keep as string
-                    try:
-                        code = int(float(str(code_raw).strip()))
-                    except Exception:
-                        code = str(code_raw).strip()
-                    if desc:
-                        # store only the original description as display key
-                        if desc not in veic_map:
-                            veic_map[desc] = code
-                if veic_map:
-                    return veic_map
-            except Exception as e:
-                print(f"[WARN] Could not read vehicles file {fpath}: {e}")
-    # If we get here, no good file found
-    return None
+    veic_map = get_vehicle_registry(os.path.join(caminho_base, "BD")).display_map()
+    return veic_map or None
 
 # Keep your original static mapping as a fallback so behavior remains unchanged if file is missing.
 _FALLBACK_VEICULOS_DISPLAY = {
@@ -138,19 +99,14 @@ def get_vehicle_code(nome_veiculo):
     return None
 
 
-def normalizar_codigos(campo):
-    if pd.isna(campo):
-        return []
-    return re.split(r'\s*/\s*', str(campo).strip())
-
-
 def input_demanda(cod_destinos):
     """
     cod_destinos: list of codes entered by the user, e.g. [1080, 1046]
     Returns a DataFrame with all matched rows, saving full COD DESTINO values.
     """
-    fluxos = os.path.join(caminho_base, "BD", "FLUXO.xlsx")
-    db_fluxos = pd.read_excel(fluxos, sheet_name='FLUXOS')
+    cadastros = obter_cadastros(os.path.join(caminho_base, "BD"))
+    cadastros.exigir('FLUXO')
+    rotas = cadastros.rotas
     
     all_rows = []  # collect all rows here
 
@@ -166,18 +122,14 @@ def input_demanda(cod_destinos):
             cod_ims = None
             cod_dest_full = cod_dest  # default
 
-            for _, linha_fluxo in db_fluxos.iterrows():
-                cods_sap = normalizar_codigos(linha_fluxo["COD FORNECEDOR"])
-                cods_dest_raw = str(linha_fluxo["COD DESTINO"]).strip()
-                cods_dest_split = re.split(r'\s*/\s*', cods_dest_raw)
-
-                if cod_forn in cods_sap and cod_dest in cods_dest_split:
-                    nome_veiculo = linha_fluxo["VEICULO PRINCIPAL"]
-                    codigo = get_vehicle_code(nome_veiculo)
-                    tipo = linha_fluxo.get("TIPO SATURACAO", None)
-                    cod_ims = linha_fluxo.get("COD IMS", None)
-                    cod_dest_full = cods_dest_raw
-                    break
+            # first FLUXO route with this supplier and destination (routing index)
+            linha_fluxo = rotas.rota_fornecedor_destino(cod_forn, cod_dest)
+            if linha_fluxo is not None:
+                nome_veiculo = linha_fluxo["VEICULO PRINCIPAL"]
+                codigo = get_vehicle_code(nome_veiculo)
+                tipo = linha_fluxo.get("TIPO SATURACAO", None)
+                cod_ims = linha_fluxo.get("COD IMS", None)
+                cod_dest_full = str(linha_fluxo["COD DESTINO"]).strip()
 
             # append full row data
             all_rows.append({
@@ -192,7 +144,7 @@ def input_demanda(cod_destinos):
             })
 
     df_final = pd.DataFrame(all_rows)
-    df_final.to_excel("Template.xlsx", index=False)
+    df_final.to_excel(ARQUIVO_TEMPLATE, index=False)
     return df_final  # optionally return for further processing
 
 
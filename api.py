@@ -1,12 +1,19 @@
 import webview
+import logging
 import os
-import pandas as pd
+import threading
+import time
 import math
-from modules import SAPLookup, QMECalculator, FileManager, ExportManager
+import importlib
+# Só módulos leves aqui: pandas/pyarrow/openpyxl chegam com os componentes (ver Api.__getattr__ / warm_up)
+from modules import QMECalculator, JobManager, SessionManager
+from modules import profiling, logging_config, startup
+
+logger = logging.getLogger(__name__)
 
 
 def clean_nan_values(obj):
-    """Recursively replace NaN values with None for JSON serialization"""
+    """Recursively replace NaN values with None for JSON serialization (respostas pequenas de status)"""
     if isinstance(obj, dict):
         return {k: clean_nan_values(v) for k, v in obj.items()}
     elif isinstance(obj, list):
@@ -18,70 +25,385 @@ def clean_nan_values(obj):
 
 
 class Api:
+    # Componentes que importam pandas/pyarrow/openpyxl: criados no primeiro acesso ou pelo
+    # warm_up em segundo plano, para a janela abrir antes. Fora do __dict__ até existirem, então
+    # a introspecção do js_api pelo pywebview não os cria.
+    _LAZY_COMPONENTS = {
+        'sap_lookup': ('modules.sap_lookup', 'SAPLookup'),
+        'file_manager': ('modules.file_manager', 'FileManager'),
+        'export_manager': ('modules.export_manager', 'ExportManager'),
+    }
+    
     def __init__(self):
+        self._components_lock = threading.Lock()
         self.db_folder = ""
         self.result_folder = ""
         self.loading_status = ""
         self.is_loading = False
-        self.viajante_results = None  # Store Viajante processing results
         
-        # Inicializa os módulos de processamento
-        self.sap_lookup = SAPLookup()
+        # Inicializa os módulos de processamento (SAPLookup, FileManager e ExportManager: ver _LAZY_COMPONENTS)
         self.qme_calculator = QMECalculator()
-        self.file_manager = FileManager()
-        self.export_manager = ExportManager()
+        
+        # Jobs em segundo plano (carga do database, simulações) - a ponte JS não fica bloqueada
+        self.job_manager = JobManager(max_workers=4, on_event=self._push_job_event)
+        self.db_load_job_id = None
+        self._db_load_lock = threading.Lock()  # uma carga por vez sobre o mesmo SAPLookup
+        
+        # Entradas e resultados de cada simulação ficam na sua sessão (a interface usa a 'default');
+        # SAPLookup e QMECalculator guardam só dados de referência, lidos em paralelo
+        self.sessions = SessionManager()
+        self._session_jobs_lock = threading.Lock()  # troca do job corrente de uma sessão
+        
+        # Tamanho/tempo da última serialização de cada resposta grande {método: {...}}
+        self.payload_stats = {}
+        
+        # Perfil por execução (etapas e contadores) em logs/profiles.jsonl; ver get_run_profiles
+        self.profiler = profiling.Profiler()
+    
+    def __getattr__(self, name):
+        # Só chamado quando o atributo não existe: cria o componente pesado no primeiro uso
+        spec = Api._LAZY_COMPONENTS.get(name)
+        if spec is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        with self._components_lock:
+            if name not in self.__dict__:
+                module_name, class_name = spec
+                self.__dict__[name] = getattr(importlib.import_module(module_name), class_name)()
+        return self.__dict__[name]
+    
+    def warm_up(self):
+        """
+        Aquecimento depois que a janela abriu (main.py passa para webview.start, que roda numa thread):
+        importa pandas/numpy/pyarrow/openpyxl e o Viajante, cria os componentes pesados e grava o
+        perfil 'startup' (etapas da abertura + warm_up) comparando a abertura com o orçamento
+        """
+        startup.mark('gui')
+        try:
+            with self.profiler.run('startup') as profile:
+                for etapa, segundos in startup.stages().items():
+                    profile.add_stage(f"startup.{etapa}", segundos)
+                with profiling.stage('warm_up'):
+                    for name in Api._LAZY_COMPONENTS:
+                        getattr(self, name)
+                    # Serialização (numpy/pandas/orjson) e o motor do Viajante: primeira simulação sem imports
+                    from modules import serialization
+                    import Viajante
+            startup.mark('warm')
+        except Exception as e:
+            # O componente que falhou é criado de novo no primeiro uso (e o erro aparece lá)
+            logger.exception('Warm-up failed: %s', e)
+        return self.get_startup_profile()
+    
+    def get_startup_profile(self):
+        """Tempos da abertura (segundos desde o início do processo) e o orçamento da janela"""
+        return startup.report()
+    
+    def _serialize(self, name, obj):
+        """
+        JSON (string) de uma resposta grande, numa passada direto dos dados NumPy/pandas
+        O front end faz JSON.parse (ver parseApiPayload em script.js); registra o tamanho em payload_stats
+        """
+        from modules import serialization
+        
+        start = time.perf_counter()
+        with profiling.stage('serialize'):
+            payload = serialization.dumps(obj)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        size = len(payload.encode('utf-8'))
+        profiling.count('payload_bytes', size)
+        self.payload_stats[name] = {
+            "bytes": size,
+            "ms": round(elapsed_ms, 2),
+            "encoder": serialization.ENCODER,
+        }
+        logger.info('📦 %s: %.1f KB serializados em %.1f ms (%s)', name, size / 1024, elapsed_ms, serialization.ENCODER)
+        return payload
+    
+    def get_run_profiles(self, limit=20, kind=None):
+        """
+        Últimos perfis de execução (mais recente primeiro): tempo total, segundos/chamadas por etapa
+        (load.*, index, lookup, demanda, viajante.*, qme, trips, tdc_activations, tariff, serialize,
+        export) e contadores. kind filtra o tipo ('db_load', 'lookup', 'simulation', 'export', ...)
+        """
+        return self.profiler.recent(limit, kind)
     
-    def _update_loading_status(self, message):
+    def set_log_level(self, level):
+        """Muda o nível do log em tempo de execução ('DEBUG' liga os diagnósticos, 'INFO' volta ao padrão)"""
+        try:
+            return {"status": "success", "level": logging_config.set_level(level)}
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+    
+    def get_payload_stats(self):
+        """Tamanho (bytes), tempo (ms) e encoder da última resposta serializada de cada método"""
+        return dict(self.payload_stats)
+    
+    def _get_session(self, session_id=None):
+        """Sessão pelo id (sem id: a da interface); ValueError se o id não existir"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Sessão não encontrada: {session_id}")
+        return session
+    
+    def create_session(self, from_session_id=None):
+        """
+        Cria uma sessão de simulação independente
+        
+        Args:
+            from_session_id: se informado, a nova sessão começa com as entradas desta
+                (lookup, AS IS/TO BE, demanda); senão começa vazia
+        """
+        parent = self.sessions.get(from_session_id) if from_session_id else None
+        if from_session_id and parent is None:
+            return {"status": "error", "message": f"Sessão não encontrada: {from_session_id}"}
+        session = self.sessions.create(parent)
+        return {"status": "success", "session_id": session.id}
+    
+    def close_session(self, session_id):
+        """Descarta uma sessão (a da interface não pode ser descartada)"""
+        session = self.sessions.get(session_id)
+        if session is not None and session.job_id:
+            self.job_manager.cancel(session.job_id)
+        if self.sessions.close(session_id):
+            return {"status": "success", "message": "Sessão encerrada"}
+        return {"status": "error", "message": f"Sessão não encontrada ou protegida: {session_id}"}
+    
+    def list_sessions(self):
+        """Resumo das sessões abertas (entradas presentes, job em andamento)"""
+        return clean_nan_values(self.sessions.list_sessions())
+    
+    def _update_loading_status(self, message, percent=None):
         """Atualiza o status de carregamento"""
         self.loading_status = message
-        print(f"Status: {message}")
+        logger.info('Status: %s', message)
 
     def select_folder(self, folder_type):
-        """Usa o diálogo nativo do pywebview para selecionar pastas"""
+        """
+        Usa o diálogo nativo do pywebview para selecionar pastas
+        Para 'db' a carga roda em segundo plano (ver start_db_load / get_job_status)
+        """
         folder_path, folder_name = self.file_manager.select_folder(folder_type)
         
         if folder_path:
             if folder_type == 'db':
-                self.db_folder = folder_path
-                self.is_loading = True
-                print(f"Database set to: {self.db_folder}")
-                
-                # Carrega dados com callback de progresso
-                self.sap_lookup.update_db_folder(folder_path, progress_callback=self._update_loading_status)
-                
-                self.is_loading = False
-                self.loading_status = "Ready"
+                self._start_db_load_job(folder_path)
                 
             elif folder_type == 'result':
                 self.result_folder = folder_path
                 self.export_manager.set_result_folder(folder_path)
-                print(f"Result folder set to: {self.result_folder}")
+                logger.debug('Result folder set to: %s', self.result_folder)
             
             return folder_name
         
         return folder_name
     
+    def start_db_load(self, folder_path=None):
+        """
+        Seleciona (ou recebe) a pasta do database e inicia a carga em segundo plano
+        
+        Returns:
+            Dict com folder_name e job_id (consultar com get_job_status)
+        """
+        if not folder_path:
+            folder_path, folder_name = self.file_manager.select_folder('db')
+        else:
+            folder_name = os.path.basename(os.path.normpath(folder_path))
+        
+        if not folder_path:
+            return {"status": "cancelled", "folder_name": folder_name, "job_id": None}
+        
+        job = self._start_db_load_job(folder_path)
+        return {"status": "success", "folder_name": folder_name, "job_id": job.id}
+    
+    def _start_db_load_job(self, folder_path):
+        """Cancela a carga anterior (se houver) e agenda a nova"""
+        if self.db_load_job_id:
+            self.job_manager.cancel(self.db_load_job_id)
+        self.db_folder = folder_path
+        self.is_loading = True
+        logger.debug('Database set to: %s', self.db_folder)
+        job = self.job_manager.submit('db_load', self._load_db_job, folder_path, description=folder_path)
+        self.db_load_job_id = job.id
+        return job
+    
+    def _load_db_job(self, job, folder_path):
+        """Carga do database (executa no JobManager)"""
+        def report(message, percent=None):
+            self._update_loading_status(message, percent)
+            job.report(message, percent)
+            for source, seconds in self.sap_lookup.load_timings.items():
+                job.record_timing(source, seconds)
+        
+        # A carga anterior (já cancelada) termina na próxima etapa antes desta começar
+        with self._db_load_lock, self.profiler.run('db_load', job_id=job.id, folder=folder_path):
+            try:
+                job.check_cancelled()
+                timings = self.sap_lookup.update_db_folder(folder_path, progress_callback=report)
+                for source, seconds in timings.items():
+                    job.record_timing(source, seconds)
+                self.loading_status = "Ready"
+                return {"db_folder": folder_path, "timings": timings}
+            except Exception:
+                self.loading_status = "Cancelled" if job.cancel_requested else "Error"
+                raise
+            finally:
+                if self.db_load_job_id == job.id:
+                    self.is_loading = False
+    
+    def _push_job_event(self, event):
+        """Entrega o evento do job ao front end (window.onJobEvent) via evaluate_js"""
+        if not webview.windows:
+            return
+        payload = self._serialize(f"job:{event.get('kind')}:{event.get('event')}", event)
+        webview.windows[0].evaluate_js(f"window.onJobEvent && window.onJobEvent({payload})")
+    
+    def start_simulation(self, data, session_id=None):
+        """
+        Agenda a simulação (demanda -> Viajante -> QME) como job cancelável e retorna na hora
+        Uma simulação nova cancela a anterior da mesma sessão; o resultado chega por window.onJobEvent
+        Simulações de sessões diferentes rodam em paralelo
+        
+        Args:
+            data: Dados do formulário (os mesmos de calculate_qme)
+            session_id: Sessão da simulação (padrão: a da interface)
+            
+        Returns:
+            Dict com job_id e session_id
+        """
+        try:
+            session = self._get_session(session_id)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        if session.job_id:
+            self.job_manager.cancel(session.job_id)
+        
+        # O job trabalha num fork da sessão: o formulário pode mudar a sessão enquanto ele roda
+        run_session = self.sessions.create(session)
+        with self._session_jobs_lock:
+            job = self.job_manager.submit('simulation', self._simulation_job, data, session, run_session,
+                                          description=str(data.get('cod_sap', '')))
+            session.job_id = job.id
+            run_session.job_id = job.id
+        return {"status": "success", "job_id": job.id, "session_id": session.id}
+    
+    def _simulation_job(self, job, data, session, run_session):
+        """Simulação completa (executa no JobManager) sobre run_session; cancelável entre as etapas"""
+        cod_sap = data.get('cod_sap', '')
+        try:
+            with self.profiler.run('simulation', job_id=job.id, session_id=session.id, cod_sap=cod_sap,
+                                   fluxo=data.get('fluxo', ''), veiculo=data.get('veiculo', '')) as profile:
+                result = self._run_simulation_stages(job, data, run_session)
+                profile.status = result.get('status')
+                
+                # Só a simulação mais recente da sessão publica os resultados (exportação etc.)
+                job.check_cancelled()
+                if result.get('status') == 'success':
+                    with self._session_jobs_lock:
+                        if session.job_id == job.id:
+                            session.adopt_results(run_session)
+                return result
+        finally:
+            with self._session_jobs_lock:
+                if session.job_id == job.id:
+                    session.job_id = None
+            self.sessions.close(run_session.id)
+    
+    def _run_simulation_stages(self, job, data, run_session):
+        """Etapas da simulação: demanda -> Viajante -> QME (cada uma medida no perfil da execução)"""
+        job.check_cancelled()
+        cod_sap = data.get('cod_sap', '')
+        fluxo = str(data.get('fluxo') or '').lower()
+        viajante_response = None
+        
+        # Milk Run / Line Haul não usam o Viajante
+        if 'milk run' not in fluxo and 'line haul' not in fluxo:
+            job.report("Preparando dados de demanda...", 5)
+            with profiling.stage('demanda'):
+                prepare_response = self.prepare_viajante_data(cod_sap, data.get('destino'), data.get('veiculo') or '',
+                                                              session_id=run_session.id)
+            if prepare_response.get('status') == 'error':
+                return {"status": "error", "stage": "demanda", "message": prepare_response.get('message')}
+            
+            job.report("Processando Viajante...", 20)
+            viajante_response = self._run_viajante(cod_sap, session_id=run_session.id)
+            if viajante_response.get('status') != 'success':
+                return {"status": "error", "stage": "viajante", "message": viajante_response.get('message')}
+        
+        job.report("Processando simulação QME...", 70)
+        qme_response = self._calculate_qme(data, session_id=run_session.id)
+        if qme_response.get('status') == 'error':
+            return {"status": "error", "stage": "qme", "message": qme_response.get('message')}
+        
+        return {"status": "success", "qme": qme_response, "viajante": viajante_response}
+    
+    def cancel_simulation(self, session_id=None):
+        """Cancela a simulação em andamento da sessão (ex: o usuário alterou o formulário)"""
+        session = self.sessions.get(session_id)
+        if session is not None and session.job_id:
+            return self.cancel_job(session.job_id)
+        return {"status": "error", "message": "Nenhuma simulação em andamento"}
+    
+    def get_job_status(self, job_id):
+        """Status, progresso (%), mensagem, tempos por fonte e erro de um job"""
+        status = self.job_manager.status(job_id)
+        if status is None:
+            return {"status": "error", "message": f"Job não encontrado: {job_id}"}
+        return clean_nan_values(status)
+    
+    def cancel_job(self, job_id):
+        """Pede o cancelamento de um job (para na próxima etapa)"""
+        if self.job_manager.cancel(job_id):
+            return {"status": "success", "message": "Cancelamento solicitado"}
+        return {"status": "error", "message": "Job não encontrado ou já finalizado"}
+    
+    def list_jobs(self, kind=None):
+        """Lista os jobs conhecidos (opcionalmente de um tipo, ex: 'db_load')"""
+        return self.job_manager.list_jobs(kind)
+    
     def get_loading_status(self):
         """Retorna o status atual de carregamento"""
-        return {
+        status = {
             "is_loading": self.is_loading,
             "status": self.loading_status
         }
+        if self.db_load_job_id:
+            status["job"] = self.job_manager.status(self.db_load_job_id)
+        return status
 
-    def import_asis_file(self):
-        """Importa o arquivo com AS IS e TO BE scenarios"""
+    def import_asis_file(self, session_id=None):
+        """Importa o arquivo com AS IS e TO BE scenarios para a sessão"""
+        try:
+            session = self._get_session(session_id)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        
         status, data = self.file_manager.import_asis_file()
         
         if data is not None:
-            self.qme_calculator.set_asis_data(data)
+            session.asis_data = data
+            session.clear_results()
         
         return status
 
-    def lookup_sap_data(self, cod_sap, planta, cidade_origem, cidade_destino):
-        """Busca dados complementares baseado no SAP e outros inputs"""
-        return clean_nan_values(self.sap_lookup.lookup_data(cod_sap, planta, cidade_origem, cidade_destino))
+    def lookup_sap_data(self, cod_sap, planta, cidade_origem, cidade_destino, session_id=None):
+        """Busca dados complementares baseado no SAP e outros inputs (guardados na sessão); retorna JSON"""
+        try:
+            session = self._get_session(session_id)
+        except ValueError as e:
+            return self._serialize('lookup_sap_data', {"status": "error", "message": str(e)})
+        
+        with self.profiler.run('lookup', cod_sap=str(cod_sap), session_id=session.id) as profile:
+            with profiling.stage('lookup'):
+                result = self.sap_lookup.lookup_data(cod_sap, planta, cidade_origem, cidade_destino)
+            profile.status = result.get('status')
+            all_rows = result.get('tdc_options', {}).get('all_rows')
+            if all_rows is not None:
+                profiling.count('tdc_rows', len(all_rows))
+            if result.get('status') == 'success':
+                session.lookup_result = result.get('data')
+            return self._serialize('lookup_sap_data', result)
     
-    def prepare_viajante_data(self, cod_sap, cidade_destino=None, veiculo=None):
+    def prepare_viajante_data(self, cod_sap, cidade_destino=None, veiculo=None, session_id=None):
         """
         Prepara dados para integração com Viajante
         Cria arquivo no formato: Mês, COD FORNECEDOR, DESENHO, QTDE
@@ -90,36 +412,49 @@ class Api:
             cod_sap: Código SAP do fornecedor
             cidade_destino: Código IMS Destino (opcional)
             veiculo: Tipo de veículo selecionado (opcional)
+            session_id: Sessão que guarda a demanda (padrão: a da interface)
             
         Returns:
             Status dict com informações sobre o arquivo gerado
         """
-        status, dataframe = self.sap_lookup.prepare_viajante_data(cod_sap, cidade_destino, veiculo)
-        
-        
+        try:
+            session = self._get_session(session_id)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
         
+        status, dataframe = self.sap_lookup.prepare_viajante_data(cod_sap, cidade_destino, veiculo)
+        if dataframe is not None:
+            session.demanda_data = dataframe
+            session.cidade_destino = cidade_destino
+            session.veiculo = veiculo
         
         # Clean NaN values before returning (NaN is not valid JSON)
         return clean_nan_values(status)
     
-    def run_viajante(self, cod_sap):
+    def run_viajante(self, cod_sap, session_id=None):
         """
         Executa o processamento Viajante em modo headless (sem GUI)
-        Usa os dados e parâmetros preparados por prepare_viajante_data()
+        Usa os dados e parâmetros preparados por prepare_viajante_data() na mesma sessão
         
         Args:
             cod_sap: Código SAP do fornecedor
+            session_id: Sessão da simulação (padrão: a da interface)
             
         Returns:
-            Dict com resultados do Viajante (Volume_por_rota.xlsx)
+            JSON com resultados do Viajante (Volume_por_rota.xlsx)
         """
+        with self.profiler.run('viajante', cod_sap=str(cod_sap)) as profile:
+            result = self._run_viajante(cod_sap, session_id)
+            profile.status = result.get('status')
+            return self._serialize('run_viajante', result)
+    
+    def _run_viajante(self, cod_sap, session_id=None):
+        """run_viajante sem serializar: dict com os resultados (usado pela simulação em job)"""
         try:
-            # Get stored parameters and demanda DataFrame
-            params = self.sap_lookup.get_viajante_parameters()
-            
-            demanda_df = params.get('demanda_data')
-            cidade_destino = params.get('cidade_destino')
-            veiculo = params.get('veiculo')
+            session = self._get_session(session_id)
+            demanda_df = session.demanda_data
+            cidade_destino = session.cidade_destino
+            veiculo = session.veiculo
             
             # Validate parameters
             if demanda_df is None or demanda_df.empty:
@@ -140,70 +475,147 @@ class Api:
                     "message": "Veículo não informado."
                 }
             
-            # Import Viajante headless function
-            import sys
+            # Viajante importado como pacote: caminhos explícitos, sem chdir nem sys.path
+            from Viajante import run_viajante_headless
             from pathlib import Path
             
-            # Get Viajante folder path
-            current_path = Path(__file__).parent
-            viajante_path = current_path / "Viajante"
-            
-            if not viajante_path.exists():
+            bd_path = Path(__file__).parent / "Viajante" / "BD"
+            if not bd_path.exists():
                 return {
                     "status": "error",
-                    "message": f"Pasta Viajante não encontrada: {viajante_path}"
+                    "message": f"Pasta BD do Viajante não encontrada: {bd_path}"
                 }
             
-            # Add to path if not already there
-            viajante_str = str(viajante_path)
-            if viajante_str not in sys.path:
-                sys.path.insert(0, viajante_str)
-            
-            # Change to Viajante directory (needed for relative file paths in DB.py)
-            original_cwd = os.getcwd()
-            os.chdir(viajante_path)
-            
-            try:
-                # Import and run headless function
-                from DB import run_viajante_headless  # type: ignore
-                
+            with profiling.stage('viajante'):
                 results = run_viajante_headless(
                     demanda_df=demanda_df,
                     cod_sap=cod_sap,
                     cod_destino=cidade_destino,
                     veiculo=veiculo,
-                    caminho_BD='BD'
+                    caminho_BD=str(bd_path)
                 )
-                
-                # Store Viajante results for trip calculation
-                if results.get('status') == 'success':
-                    self.viajante_results = results
-                    print(f"\n{'='*60}")
-                    print("✅ VIAJANTE RESULTS STORED IN self.viajante_results")
-                    print(f"{'='*60}")
-                    print(f"  Results count: {len(results.get('results', []))} rows")
-                    print(f"  Status: {results.get('status')}")
-                    print(f"  self.viajante_results is now: {'SET' if self.viajante_results else 'None'}")
-                    print(f"{'='*60}\n")
-                else:
-                    print(f"\n⚠️ Viajante status was NOT success: {results.get('status')}")
-                
-                # Clean NaN values for JSON
-                return clean_nan_values(results)
-                
-            finally:
-                # Restore original working directory
-                os.chdir(original_cwd)
+            for etapa, segundos in (results.get('tempos') or {}).items():
+                profiling.add_stage(f"viajante.{etapa}", segundos)
+            profiling.count('viajante_rows', len(results.get('results', [])))
+            
+            # Store Viajante results for trip calculation
+            if results.get('status') == 'success':
+                session.viajante_results = results
+                logger.info('✅ Viajante results stored in session %s (%s rows)', session.id, len(results.get('results', [])))
+            else:
+                logger.warning('⚠️ Viajante status was NOT success: %s', results.get('status'))
+            
+            return results
                 
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Error in run_viajante:\n{error_details}")
+            logger.exception('Error in run_viajante')
             return {
                 "status": "error",
                 "message": f"Erro ao executar Viajante: {str(e)}"
             }
     
+    def run_viajante_sweep(self, cod_sap, fluxo='', origem='', destino='', km=None, rt_percent=100, trip='', session_id=None):
+        """
+        Varredura de veículos do Viajante: enriquece a demanda uma vez e compara todos os
+        veículos do cadastro (CARGAS, capacidade útil e frete da Tarifa), do melhor para o pior
+        
+        Args:
+            cod_sap: Código SAP do fornecedor
+            fluxo/origem/destino/km/trip/rt_percent: mesmos parâmetros do frete em calculate_qme
+            session_id: Sessão com a demanda preparada (padrão: a da interface)
+            
+        Returns:
+            JSON com 'ranking' (um veículo por linha) e 'results' (volume por rota/mês de cada veículo)
+        """
+        with self.profiler.run('viajante_sweep', cod_sap=str(cod_sap), fluxo=fluxo) as profile:
+            result = self._run_viajante_sweep(cod_sap, fluxo, origem, destino, km, rt_percent, trip, session_id)
+            profile.status = result.get('status')
+            return self._serialize('run_viajante_sweep', result)
+    
+    def _run_viajante_sweep(self, cod_sap, fluxo='', origem='', destino='', km=None, rt_percent=100, trip='', session_id=None):
+        """run_viajante_sweep sem serializar (dict)"""
+        try:
+            session = self._get_session(session_id)
+            demanda_df = session.demanda_data
+            cidade_destino = session.cidade_destino
+            
+            if demanda_df is None or demanda_df.empty:
+                return {
+                    "status": "error",
+                    "message": "Nenhum dado de demanda disponível. Execute prepare_viajante_data primeiro."
+                }
+            if not cidade_destino:
+                return {
+                    "status": "error",
+                    "message": "Cidade destino não informada."
+                }
+            
+            from Viajante import run_viajante_sweep
+            from pathlib import Path
+            
+            bd_path = Path(__file__).parent / "Viajante" / "BD"
+            with profiling.stage('viajante'):
+                results = run_viajante_sweep(demanda_df, cod_sap, cidade_destino, caminho_BD=str(bd_path))
+            for etapa, segundos in (results.get('tempos') or {}).items():
+                profiling.add_stage(f"viajante.{etapa}", segundos)
+            if results.get('status') != 'success':
+                return results
+            
+            # Frete por veículo: uma cotação por classe de tarifa (ex: CARRETA e CARRETA SIDER cotam juntas)
+            matched_fluxo = self.sap_lookup.resolve_tarifa_fluxo(fluxo) if fluxo else None
+            if matched_fluxo:
+                is_milk_run = 'milk run' in str(fluxo).lower()
+                is_ow_trip = str(trip).strip().upper() == 'OW'
+                ow_w = float(rt_percent) / 100.0 if is_ow_trip else 1.0 - float(rt_percent) / 100.0
+                rt_w = 1.0 - ow_w
+                try:
+                    km_value = float(km) if km not in (None, '') else None
+                except (TypeError, ValueError):
+                    km_value = None
+                
+                tarifas = {}
+                for row in results['ranking']:
+                    classe = self._normalize_veiculo(row['COD VEICULO'])
+                    if classe not in tarifas:
+                        quote = self.sap_lookup.quote_tariffs(
+                            fluxo_name=matched_fluxo,
+                            origem='' if is_milk_run else origem,
+                            destino='' if is_milk_run else destino,
+                            veiculo=classe,
+                            km_value=km_value,
+                            viagens=['RT', 'OW'] if ow_w > 0 else ['RT']
+                        )
+                        best = quote.get('best_by_viagem', {})
+                        t_rt = best.get('RT', {}).get('tarifa_real') if best.get('RT', {}).get('status') == 'success' else None
+                        t_ow = best.get('OW', {}).get('tarifa_real') if best.get('OW', {}).get('status') == 'success' else None
+                        # Mesma regra do frete principal: sem OW usa a tarifa RT; só OW → OW × peso OW
+                        if t_rt is not None:
+                            tarifas[classe] = t_rt * rt_w + (t_ow if t_ow is not None else t_rt) * ow_w
+                        elif t_ow is not None:
+                            tarifas[classe] = t_ow * ow_w
+                        else:
+                            tarifas[classe] = None
+                    tarifa = tarifas[classe]
+                    row['TARIFA (R$)'] = round(tarifa, 2) if tarifa is not None else None
+                    row['FRETE TOTAL (R$)'] = round(tarifa * row['CARGAS'], 2) if tarifa is not None else None
+                
+                # Com frete, o ranking passa a ser pelo menor frete total (sem tarifa vai para o fim).
+                # Veículos com MDRs sem capacidade continuam no fim, como em varrer_veiculos: a saturação
+                # incompleta subestima CARGAS e, com ela, o frete
+                results['ranking'].sort(key=lambda r: (r['MDRs SEM CAPACIDADE'] > 0, r['FRETE TOTAL (R$)'] is None,
+                                                       r['FRETE TOTAL (R$)'] or 0, r['RANKING']))
+                for posicao, row in enumerate(results['ranking'], start=1):
+                    row['RANKING'] = posicao
+            
+            return results
+            
+        except Exception as e:
+            logger.exception('Error in run_viajante_sweep')
+            return {
+                "status": "error",
+                "message": f"Erro na varredura de veículos: {str(e)}"
+            }
+
     def _count_tdc_activations(self, cod_sap, origem, destino, veiculo, fluxo, trip):
         """
         Conta ativações únicas por mês no TDC (para fluxos que não são Milk Run/Line Haul)
@@ -224,23 +636,14 @@ class Api:
             tdc_data = self.sap_lookup.tdc_data
             
             if tdc_data is None or tdc_data.empty:
-                print("Warning: No TDC data available for activation counting")
+                logger.warning('No TDC data available for activation counting')
                 return None
             
-            # print(f"\n{'='*60}")
-            # print("TDC ACTIVATION COUNTING (AS IS)")
-            # print(f"{'='*60}")
-            # print(f"Initial TDC rows: {len(tdc_data)}")
-            # print(f"\n🔍 Filter Parameters:")
-            # print(f"  cod_sap (input): '{cod_sap}'")
-            # print(f"  destino: '{destino}'")
-            # print(f"  veiculo: '{veiculo}'")
-            # print(f"  fluxo: '{fluxo}'")
-            # print(f"  trip: '{trip}'" + (" (empty - will skip)" if not trip else ""))
-            # print(f"\n📋 TDC Columns available: {list(tdc_data.columns)}")
-            
-            # Apply filters
-            filtered = tdc_data.copy()
+            
+            # Apply filters (boolean indexing already returns new frames; tdc_data is never changed)
+            filtered = tdc_data
+            # Amostras de valores das colunas só são calculadas com DEBUG ligado
+            debug = logger.isEnabledFor(logging.DEBUG)
             
             # Resolve SAP code → IMS code (TDC stores IMS codes, not SAP codes)
             cod_sap_str = str(cod_sap).strip().replace('.0', '')
@@ -253,52 +656,55 @@ class Api:
                     cached_ims = self.sap_lookup.sap_cache[cache_key].get('cod_ims_for_tdc')
                     if cached_ims:
                         ims_code = str(cached_ims).strip()
-                        print(f"  Resolved SAP {cod_sap_str} → IMS {ims_code} for TDC filter")
+                        logger.debug('Resolved SAP %s → IMS %s for TDC filter', cod_sap_str, ims_code)
                     else:
-                        print(f"  ⚠️ SAP {cod_sap_str} in cache but no IMS code — using SAP as fallback")
+                        logger.warning('⚠️ SAP %s in cache but no IMS code — using SAP as fallback', cod_sap_str)
                 else:
-                    print(f"  ⚠️ SAP {cod_sap_str} not in cache — using SAP code as fallback")
+                    logger.warning('⚠️ SAP %s not in cache — using SAP code as fallback', cod_sap_str)
             
-            print(f"\n🔍 Applying filters step by step...\n")
+            logger.debug('🔍 Applying filters step by step...')
             
             # Filter 1: Codigo IMS - Origem = IMS code
             if 'Codigo IMS - Origem' in filtered.columns:
-                print(f"Filter 1: Codigo IMS - Origem = '{ims_code}'")
-                print(f"  Sample values in column: {filtered['Codigo IMS - Origem'].head(10).tolist()}")
+                logger.debug("Filter 1: Codigo IMS - Origem = '%s'", ims_code)
+                if debug:
+                    logger.debug('Sample values in column: %s', filtered['Codigo IMS - Origem'].head(10).tolist())
                 
                 filtered = filtered[
                     filtered['Codigo IMS - Origem'].astype(str).str.strip() == ims_code
                 ]
-                print(f"  ✓ After filter: {len(filtered)} rows")
+                logger.debug('✓ After filter: %s rows', len(filtered))
             else:
-                print(f"  ⚠️ Column 'Codigo IMS - Origem' NOT found!")
+                logger.warning("⚠️ Column 'Codigo IMS - Origem' NOT found!")
             
             if filtered.empty:
-                print(f"\n❌ No data after Codigo IMS - Origem filter!")
+                logger.warning('No TDC data after Codigo IMS - Origem filter')
                 months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
                 return {month: 0 for month in months}
             
             # Filter 2: Codigo IMS Destino = destino  
             if destino and 'Codigo IMS Destino' in filtered.columns:
-                print(f"\nFilter 2: Codigo IMS Destino contains '{destino}'")
-                print(f"  Sample values in column: {filtered['Codigo IMS Destino'].unique()[:10].tolist()}")
+                logger.debug("Filter 2: Codigo IMS Destino contains '%s'", destino)
+                if debug:
+                    logger.debug('Sample values in column: %s', filtered['Codigo IMS Destino'].unique()[:10].tolist())
                 
                 filtered = filtered[
                     filtered['Codigo IMS Destino'].astype(str).str.contains(str(destino), case=False, na=False)
                 ]
-                print(f"  ✓ After filter: {len(filtered)} rows")
+                logger.debug('✓ After filter: %s rows', len(filtered))
             elif destino:
-                print(f"\n  ⚠️ Column 'Codigo IMS Destino' NOT found!")
+                logger.warning("⚠️ Column 'Codigo IMS Destino' NOT found!")
             
             if filtered.empty:
-                print(f"\n❌ No data after Codigo IMS Destino filter!")
+                logger.warning('No TDC data after Codigo IMS Destino filter')
                 months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
                 return {month: 0 for month in months}
             
             # Filter 3: Veiculo = veiculo (CHANGED FROM CrossDock!)
             if veiculo and 'Veiculo' in filtered.columns:
-                print(f"\nFilter 3: Veiculo = '{veiculo}'")
-                print(f"  Sample values in column: {filtered['Veiculo'].unique()[:20].tolist()}")
+                logger.debug("Filter 3: Veiculo = '%s'", veiculo)
+                if debug:
+                    logger.debug('Sample values in column: %s', filtered['Veiculo'].unique()[:20].tolist())
                 
                 # Try exact match
                 filtered_exact = filtered[
@@ -307,26 +713,27 @@ class Api:
                 
                 if len(filtered_exact) > 0:
                     filtered = filtered_exact
-                    print(f"  ✓ After exact match: {len(filtered)} rows")
+                    logger.debug('✓ After exact match: %s rows', len(filtered))
                 else:
                     # Try contains match
-                    print(f"  ⚠️ No exact matches, trying contains...")
+                    logger.info('No exact matches, trying contains...')
                     filtered = filtered[
                         filtered['Veiculo'].astype(str).str.contains(str(veiculo), case=False, na=False)
                     ]
-                    print(f"  ✓ After contains match: {len(filtered)} rows")
+                    logger.debug('✓ After contains match: %s rows', len(filtered))
             elif veiculo:
-                print(f"\n  ⚠️ Column 'Veiculo' NOT found!")
+                logger.warning("⚠️ Column 'Veiculo' NOT found!")
             
             if filtered.empty:
-                print(f"\n❌ No data after Veiculo filter!")
+                logger.warning('No TDC data after Veiculo filter')
                 months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
                 return {month: 0 for month in months}
             
             # Filter 4: Fluxo Viagem = fluxo
             if fluxo and 'Fluxo Viagem' in filtered.columns:
-                print(f"\nFilter 4: Fluxo Viagem = '{fluxo}'")
-                print(f"  Sample values in column: {filtered['Fluxo Viagem'].unique()[:10].tolist()}")
+                logger.debug("Filter 4: Fluxo Viagem = '%s'", fluxo)
+                if debug:
+                    logger.debug('Sample values in column: %s', filtered['Fluxo Viagem'].unique()[:10].tolist())
                 
                 # Try exact match
                 filtered_exact = filtered[
@@ -335,26 +742,27 @@ class Api:
                 
                 if len(filtered_exact) > 0:
                     filtered = filtered_exact
-                    print(f"  ✓ After exact match: {len(filtered)} rows")
+                    logger.debug('✓ After exact match: %s rows', len(filtered))
                 else:
                     # Try contains match
-                    print(f"  ⚠️ No exact matches, trying contains...")
+                    logger.info('No exact matches, trying contains...')
                     filtered = filtered[
                         filtered['Fluxo Viagem'].astype(str).str.contains(str(fluxo), case=False, na=False)
                     ]
-                    print(f"  ✓ After contains match: {len(filtered)} rows")
+                    logger.debug('✓ After contains match: %s rows', len(filtered))
             elif fluxo:
-                print(f"\n  ⚠️ Column 'Fluxo Viagem' NOT found!")
+                logger.warning("⚠️ Column 'Fluxo Viagem' NOT found!")
             
             if filtered.empty:
-                print(f"\n❌ No data after Fluxo Viagem filter!")
+                logger.warning('No TDC data after Fluxo Viagem filter')
                 months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
                 return {month: 0 for month in months}
             
             # Filter 5: Trip = trip (optional - skip if empty)
             if trip and trip.strip() and 'Trip' in filtered.columns:
-                print(f"\nFilter 5: Trip = '{trip}'")
-                print(f"  Sample values in column: {filtered['Trip'].unique()[:10].tolist()}")
+                logger.debug("Filter 5: Trip = '%s'", trip)
+                if debug:
+                    logger.debug('Sample values in column: %s', filtered['Trip'].unique()[:10].tolist())
                 
                 # Try exact match
                 filtered_exact = filtered[
@@ -363,38 +771,34 @@ class Api:
                 
                 if len(filtered_exact) > 0:
                     filtered = filtered_exact
-                    print(f"  ✓ After exact match: {len(filtered)} rows")
+                    logger.debug('✓ After exact match: %s rows', len(filtered))
                 else:
                     # Try contains match
-                    print(f"  ⚠️ No exact matches, trying contains...")
+                    logger.info('No exact matches, trying contains...')
                     filtered = filtered[
                         filtered['Trip'].astype(str).str.contains(str(trip), case=False, na=False)
                     ]
-                    print(f"  ✓ After contains match: {len(filtered)} rows")
+                    logger.debug('✓ After contains match: %s rows', len(filtered))
             elif trip and trip.strip():
-                print(f"\n  ⚠️ Column 'Trip' NOT found!")
+                logger.warning("⚠️ Column 'Trip' NOT found!")
             else:
-                print(f"\n  ℹ️ Trip filter skipped (empty value)")
+                logger.debug('ℹ️ Trip filter skipped (empty value)')
             
             if filtered.empty:
-                print(f"\n❌ WARNING: No TDC data matches ALL filters combined!")
-                print(f"   This could mean:")
-                print(f"   - Some filter values don't match TDC data")
-                print(f"   - Column names are different")
-                print(f"   - Data for this combination doesn't exist in TDC")
-                print(f"\n   Returning zero counts for all months")
+                logger.warning('No TDC data matches all filters combined (origem=%s, destino=%s, veiculo=%s, fluxo=%s, trip=%s); returning zero counts',
+                               ims_code, destino, veiculo, fluxo, trip)
                 
                 # Return zero counts instead of None
                 months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
                          'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
                 return {month: 0 for month in months}
             
-            print(f"\n✅ Final filtered data: {len(filtered)} rows")
+            logger.debug('✅ Final filtered data: %s rows', len(filtered))
             
             # Group by Mês, remove duplicate Ativacao, count per month
             if 'Mês' not in filtered.columns or 'Ativacao' not in filtered.columns:
-                print("Warning: Required columns (Mês, Ativacao) not found in TDC data")
-                print(f"Available columns: {list(filtered.columns)}")
+                logger.warning('Required columns (Mês, Ativacao) not found in TDC data')
+                logger.debug('Available columns: %s', list(filtered.columns))
                 return None
             
             # Map month names to Portuguese abbreviations
@@ -422,51 +826,37 @@ class Api:
                 monthly_counts[month] = 0
             
             # Group by month and count unique activations
-            # print(f"\nProcessing TDC data by month:")
             for month_name, group in filtered.groupby('Mês'):
                 # Normalize month name
                 month_upper = str(month_name).strip().upper()
                 month_abbr = month_mapping.get(month_upper, month_upper)
                 
-                # print(f"  Raw month name: '{month_name}' -> Upper: '{month_upper}' -> Abbr: '{month_abbr}'")
                 
                 # Count unique Ativacao values in this month
                 unique_activations = group['Ativacao'].nunique()
                 
                 if month_abbr in monthly_counts:
                     monthly_counts[month_abbr] = int(unique_activations)
-                    print(f"  ✓ Mapped {month_abbr}: {unique_activations} unique activations")
+                    logger.debug('✓ Mapped %s: %s unique activations', month_abbr, unique_activations)
                 else:
-                    print(f"  ⚠️ Month '{month_abbr}' not in expected months list!")
+                    logger.warning("⚠️ Month '%s' not in expected months list!", month_abbr)
             
-            # print(f"\n📊 FINAL TDC ACTIVATION COUNTS:")
-            for month in months:
-                print(f"  {month}: {monthly_counts[month]} activations")
+            logger.debug('TDC activations per month: %s', monthly_counts)
             
-            print(f"{'='*60}\n")
             
             return monthly_counts
             
         except Exception as e:
-            print(f"Error counting TDC activations: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('Error counting TDC activations: %s', e)
             return None
     
     def _normalize_veiculo(self, veiculo):
         """Normalizes vehicle names so TDC and Tarifa tables can be matched"""
         if not veiculo:
             return ''
-        v = str(veiculo).strip().upper()
-        if 'BITREM' in v:             return 'BITREM'
-        if 'VANDERLEIA' in v:         return 'VANDERLEIA'
-        if 'CARRETA' in v:            return 'CARRETA'
-        if 'VAN' in v or 'DUCATO' in v: return 'VAN'
-        if '3/4' in v or '0.75' in v: return '3/4'
-        if 'TOCO' in v:               return 'TOCO'
-        if 'TRUCK' in v:              return 'TRUCK'
-        if 'FIORINO' in v:            return 'FIORINO'
-        return v
+        # Aceita nome ou código do VEÍCULOS.xlsx (ex: 4 -> 'CARRETA')
+        from modules import get_vehicle_registry
+        return get_vehicle_registry().tariff_class(veiculo) or ''
 
     def _calculate_weekly_trips(self, qme_results, viajante_results, fluxo='', cod_sap='', origem='', destino='', veiculo='', trip='', km=None, rt_percent=100, pedagio=0):
         """
@@ -499,7 +889,7 @@ class Api:
             monthly_m3_asis = summary.get('monthly_m3_asis', {})
 
             if not monthly_m3_tobe:
-                print("Warning: No monthly TO BE data available for trip calculation")
+                logger.warning('No monthly TO BE data available for trip calculation')
                 return None
 
             months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
@@ -516,15 +906,13 @@ class Api:
             if is_ml_lh:
                 # Milk Run / Line Haul: constant 74 m³ — no Viajante needed
                 month_capacity = {month: 74.0 for month in months}
-                print(f"\n{'='*60}")
-                print(f"MILK RUN / LINE HAUL MODE — using constant 74 m³ capacity")
-                print(f"{'='*60}")
+                logger.debug('MILK RUN / LINE HAUL MODE — using constant 74 m³ capacity')
             else:
                 # Standard mode: derive capacity from Viajante output
                 viajante_data = viajante_results.get('results', []) if viajante_results else []
 
                 if not viajante_data:
-                    print("Warning: No Viajante results available for trip calculation")
+                    logger.warning('No Viajante results available for trip calculation')
                     return None
 
                 # Map English month abbreviations (from Viajante) to Portuguese (from QME)
@@ -555,9 +943,7 @@ class Api:
             monthly_trips_asis = {}
 
             if is_ml_lh:
-                print(f"\n{'='*60}")
-                print(f"AS IS TRIPS CALCULATION - MILK RUN/LINE HAUL")
-                print(f"{'='*60}")
+                logger.debug('AS IS TRIPS CALCULATION - MILK RUN/LINE HAUL')
                 for month in months:
                     volume_asis = monthly_m3_asis.get(month, 0)
                     capacity    = month_capacity.get(month, 0)
@@ -565,57 +951,33 @@ class Api:
                         monthly_trips_asis[month] = round(volume_asis / capacity, 2)
                     else:
                         monthly_trips_asis[month] = 0
-                    print(f"  {month}: {volume_asis:.2f} m³ / {capacity:.2f} m³ = {monthly_trips_asis[month]:.2f} viagens")
-                print(f"{'='*60}\n")
             else:
                 # Method 2: Count unique TDC activations and convert to weekly
-                print(f"\n{'='*60}")
-                print(f"AS IS TRIPS CALCULATION - TDC ACTIVATION COUNT")
-                print(f"{'='*60}")
+                logger.debug('AS IS TRIPS CALCULATION - TDC ACTIVATION COUNT')
                 
-                tdc_counts = self._count_tdc_activations(cod_sap, origem, destino, veiculo, fluxo, trip)
+                with profiling.stage('tdc_activations'):
+                    tdc_counts = self._count_tdc_activations(cod_sap, origem, destino, veiculo, fluxo, trip)
                 
                 if tdc_counts:
                     # Convert monthly activations to weekly quantities by dividing by 4.4
-                    print(f"\n📊 Converting monthly activations to weekly quantities (÷ 4.4):")
                     monthly_trips_asis = {}
                     for month in months:
                         monthly_count = tdc_counts.get(month, 0)
                         weekly_count = int(round(monthly_count / 4.4)) if monthly_count > 0 else 0
                         monthly_trips_asis[month] = weekly_count
-                        print(f"  {month}: {monthly_count} monthly activations → {weekly_count} weekly trips")
+                    logger.debug('📊 Monthly activations → weekly trips (÷ 4.4): %s', monthly_trips_asis)
                 else:
                     # Fallback to 0 if no TDC data
                     monthly_trips_asis = {month: 0 for month in months}
                 
-                print(f"{'='*60}\n")
             
-            # Print TO BE trips summary
-            print(f"\n{'='*60}")
-            print("TO BE TRIPS CALCULATION")
-            print(f"{'='*60}")
-            for month in months:
-                volume = monthly_m3_tobe.get(month, 0)
-                capacity = month_capacity.get(month, 0)
-                trips = monthly_trips_tobe.get(month, 0)
-                print(f"  {month}: {volume:.2f} m³ / {capacity:.2f} m³ = {trips} viagens")
-            print(f"{'='*60}\n")
-            
-            # Print final summary of what's being returned
-            print(f"\n{'='*60}")
-            print("📦 FINAL TRIP DATA BEING RETURNED TO FRONTEND")
-            print(f"{'='*60}")
-            print(f"FLUXO Type: '{fluxo}' (Milk Run/Line Haul: {('milk run' in fluxo_lower or 'line haul' in fluxo_lower)})")
-            print(f"\n📊 AS IS Trips by Month:")
-            for month in months:
-                print(f"  {month}: {monthly_trips_asis.get(month, 0)}")
-            print(f"\n📊 TO BE Trips by Month:")
-            for month in months:
-                print(f"  {month}: {monthly_trips_tobe.get(month, 0)}")
-            print(f"\n📊 Month Capacities (CAP. ÚTIL):")
-            for month in months:
-                print(f"  {month}: {month_capacity.get(month, 0):.2f} m³")
-            print(f"{'='*60}\n")
+            # Resumo por mês (só monta as linhas com DEBUG ligado)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📦 Trip data for fluxo '%s' (Milk Run/Line Haul: %s)", fluxo, is_ml_lh)
+                for month in months:
+                    logger.debug('%s: %.2f m³ / %.2f m³ = %s viagens TO BE | %s viagens AS IS',
+                                 month, monthly_m3_tobe.get(month, 0), month_capacity.get(month, 0),
+                                 monthly_trips_tobe.get(month, 0), monthly_trips_asis.get(month, 0))
             
             # =====================================================
             # FREIGHT (TARIFA) CALCULATION
@@ -629,30 +991,17 @@ class Api:
             tarifa_origem  = '' if is_milk_run else origem
             tarifa_destino = '' if is_milk_run else destino
 
-            print(f"\n{'='*60}")
-            print("FREIGHT CALCULATION (TARIFA)")
-            print(f"{'='*60}")
-            print(f"  Fluxo (from form):           '{fluxo}'")
-            print(f"  Veiculo (from form):          '{veiculo}'")
-            print(f"  Veiculo (normalized):         '{normalized_veiculo}'")
-            print(f"  Origem (tarifa):              '{tarifa_origem}'")
-            print(f"  Destino (tarifa):             '{tarifa_destino}'")
-            print(f"  KM:                           {km}")
-            print(f"  Trip (from form):             '{trip}'")
-            print(f"  Available fluxos in Tarifa:   {self.sap_lookup.get_available_fluxos()}")
+            logger.debug("FREIGHT CALCULATION (TARIFA): fluxo='%s' veiculo='%s' (normalized '%s') origem='%s' destino='%s' km=%s trip='%s'",
+                         fluxo, veiculo, normalized_veiculo, tarifa_origem, tarifa_destino, km, trip)
 
             # Always attempt tarifa lookup — KM is optional (Line Haul filters by Origem+Destino;
             # Milk Run filters by KM range; pass km=None when not available)
             available_fluxos = self.sap_lookup.get_available_fluxos()
-            matched_fluxo = None
 
-            # Try to match the TDC fluxo value against Tarifa folder names
-            for tf in available_fluxos:
-                if str(fluxo).lower() in tf.lower() or tf.lower() in str(fluxo).lower():
-                    matched_fluxo = tf
-                    break
+            # Resolve the TDC fluxo value to a Tarifa folder through the alias index
+            matched_fluxo = self.sap_lookup.resolve_tarifa_fluxo(fluxo)
 
-            print(f"  Matched Tarifa fluxo folder: '{matched_fluxo}'")
+            logger.debug("Matched Tarifa fluxo folder: '%s'", matched_fluxo)
 
             # RT / OW weights — computed once, used for both freight and pedagio
             # Logic depends on trip selection:
@@ -672,32 +1021,35 @@ class Api:
             
             rt_w = rt_pct / 100.0
             ow_w = ow_pct / 100.0
-            print(f"  Trip: '{trip}' (OW mode: {is_ow_trip})")
-            print(f"  RT%={rt_pct:.1f}  OW%={ow_pct:.1f}")
+            logger.debug("Trip: '%s' (OW mode: %s) RT%%=%.1f OW%%=%.1f", trip, is_ow_trip, rt_pct, ow_pct)
 
             if matched_fluxo:
-                print(f"  KM passed to Tarifa:         {km if km else 'None (optional)'}")
+                logger.debug('KM passed to Tarifa:         %s', km if km else 'None (optional)')
 
-                def _lookup(viagem_code):
-                    return self.sap_lookup.calculate_tariff(
-                        fluxo_name=matched_fluxo,
-                        origem=tarifa_origem,
-                        destino=tarifa_destino,
-                        veiculo=normalized_veiculo,
-                        km_value=km,
-                        viagem=viagem_code
-                    )
+                # Single quote pass: all carriers × RT/OW from one filter of the fluxo
+                quote = self.sap_lookup.quote_tariffs(
+                    fluxo_name=matched_fluxo,
+                    origem=tarifa_origem,
+                    destino=tarifa_destino,
+                    veiculo=normalized_veiculo,
+                    km_value=km,
+                    viagens=['RT', 'OW'] if ow_pct > 0 else ['RT']
+                )
+                quote_not_found = {'status': quote.get('status'), 'message': quote.get('message', 'N/A')}
+                best_by_viagem = quote.get('best_by_viagem', {})
 
                 # Always fetch RT tarifa
-                freight_rt = _lookup('RT')
+                freight_rt = best_by_viagem.get('RT', quote_not_found)
                 status_rt = freight_rt.get('status')
-                print(f"  Tarifa RT: {status_rt}" + (f"  → R$ {freight_rt.get('tarifa_real', 0):.2f}" if status_rt == 'success' else f"  → {freight_rt.get('message', 'N/A')}"))
+                logger.debug('Tarifa RT: %s → %s', status_rt,
+                             freight_rt.get('tarifa_real') if status_rt == 'success' else freight_rt.get('message', 'N/A'))
 
-                # Fetch OW tarifa when OW share > 0
-                freight_ow = _lookup('OW') if ow_pct > 0 else None
+                # OW tarifa when OW share > 0
+                freight_ow = best_by_viagem.get('OW', quote_not_found) if ow_pct > 0 else None
                 if freight_ow:
                     status_ow = freight_ow.get('status')
-                    print(f"  Tarifa OW: {status_ow}" + (f"  → R$ {freight_ow.get('tarifa_real', 0):.2f}" if status_ow == 'success' else f"  → {freight_ow.get('message', 'N/A')}"))
+                    logger.debug('Tarifa OW: %s → %s', status_ow,
+                                 freight_ow.get('tarifa_real') if status_ow == 'success' else freight_ow.get('message', 'N/A'))
 
                 # Merge into a single freight_result with weighted tarifa_real
                 if freight_rt.get('status') == 'success':
@@ -708,7 +1060,7 @@ class Api:
                         else tarifa_rt_real
                     )
                     weighted_tarifa = tarifa_rt_real * rt_w + tarifa_ow_real * ow_w
-                    print(f"  Weighted tarifa: {tarifa_rt_real:.2f}×{rt_w:.2f} + {tarifa_ow_real:.2f}×{ow_w:.2f} = R$ {weighted_tarifa:.2f}")
+                    logger.debug('Weighted tarifa: %.2f×%.2f + %.2f×%.2f = R$ %.2f', tarifa_rt_real, rt_w, tarifa_ow_real, ow_w, weighted_tarifa)
 
                     freight_result = dict(freight_rt)
                     freight_result['tarifa_real']    = weighted_tarifa
@@ -723,12 +1075,15 @@ class Api:
                     freight_result['tarifa_real'] = weighted_tarifa
                 else:
                     freight_result = freight_rt
+
+                if quote.get('status') == 'success':
+                    freight_result = dict(freight_result)
+                    freight_result['carrier_comparison'] = self._build_carrier_comparison(quote, rt_w, ow_w)
             else:
-                print(f"  ⚠️  No Tarifa fluxo matched for '{fluxo}'")
-                print(f"       Available: {available_fluxos}")
+                logger.warning("⚠️  No Tarifa fluxo matched for '%s'", fluxo)
+                logger.debug('Available: %s', available_fluxos)
                 freight_result = {'status': 'not_found', 'message': f"Fluxo '{fluxo}' not found in Tarifa data"}
 
-            print(f"{'='*60}\n")
 
             # Monthly freight costs — trips applied per leg before summing:
             #   cost = (trips × tarifa_RT × rt_w) + (trips × tarifa_OW × ow_w)
@@ -758,7 +1113,7 @@ class Api:
             # Pedagio — same per-leg pattern:
             #   pedagio = (trips × pedagio_val × rt_w) + (trips × pedagio_val × ow_w)
             pedagio_val = float(pedagio)
-            print(f"  Pedagio per trip: {pedagio_val:.2f} | RT×{rt_w:.2f} + OW×{ow_w:.2f}")
+            logger.debug('Pedagio per trip: %.2f | RT×%.2f + OW×%.2f', pedagio_val, rt_w, ow_w)
             monthly_pedagio_asis = {
                 m: round(
                     (monthly_trips_asis.get(m, 0) or 0) * pedagio_val * rt_w +
@@ -787,21 +1142,62 @@ class Api:
             }
             
         except Exception as e:
-            print(f"Error calculating weekly trips: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('Error calculating weekly trips: %s', e)
             return None
 
-    def calculate_qme(self, data):
-        """Calcula QME usando o módulo QMECalculator"""
+    def _build_carrier_comparison(self, quote, rt_w, ow_w):
+        """
+        Comparação por transportadora a partir da cotação única (quote_tariffs)
+        Mesma regra do frete principal: sem OW usa a tarifa RT; só OW → OW × peso OW
+        """
+        comparison = []
+        for carrier in quote.get('carriers', []):
+            t_rt = carrier.get('RT', carrier.get('Tarifa_Real'))  # fluxo sem coluna Viagem
+            t_ow = carrier.get('OW')
+            if t_rt is not None:
+                t_ow = t_ow if t_ow is not None else t_rt
+                weighted = t_rt * rt_w + t_ow * ow_w
+            elif t_ow is not None:
+                weighted = t_ow * ow_w
+            else:
+                continue
+            comparison.append({
+                'transportadora': carrier.get('transportadora'),
+                'tarifa_rt_real': t_rt,
+                'tarifa_ow_real': t_ow,
+                'tarifa_real': weighted
+            })
+        comparison.sort(key=lambda c: c['tarifa_real'])
+        return comparison
+
+    def get_best_carriers(self, fluxo, origem, destino, veiculo, viagem=None, km=None):
+        """Consulta a matriz de transportadoras (melhor / segunda melhor) de um fluxo de Tarifa"""
+        try:
+            km_value = float(km) if km not in (None, '') else None
+        except (TypeError, ValueError):
+            km_value = None
+        result = self.sap_lookup.get_best_carriers(
+            fluxo, origem, destino, self._normalize_veiculo(veiculo), viagem, km_value
+        )
+        return clean_nan_values(result)
+
+    def calculate_qme(self, data, session_id=None):
+        """Calcula QME usando o módulo QMECalculator com as entradas da sessão; retorna JSON"""
+        with self.profiler.run('qme', cod_sap=str(data.get('cod_sap', '')), session_id=session_id) as profile:
+            result = self._calculate_qme(data, session_id)
+            profile.status = result.get('status')
+            return self._serialize('calculate_qme', result)
+    
+    def _calculate_qme(self, data, session_id=None):
+        """calculate_qme sem serializar (dict, usado pela simulação em job)"""
+        try:
+            session = self._get_session(session_id)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        viajante_results = session.viajante_results
         
-        print(f"\n{'='*60}")
-        print("🔵 CALCULATE_QME CALLED")
-        print(f"{'='*60}")
-        print(f"  self.viajante_results is: {'SET' if self.viajante_results else 'None'}")
-        if self.viajante_results:
-            print(f"  Viajante results count: {len(self.viajante_results.get('results', []))} rows")
-        print(f"{'='*60}\n")
+        logger.debug('🔵 CALCULATE_QME CALLED (session %s, viajante rows: %s)', session.id,
+                     len(viajante_results.get('results', [])) if viajante_results else None)
         
         # Obtém o DataFrame completo de PFEP para filtrar por PNs do Astobe 
         pfep_data = self.sap_lookup.get_pfep_data()
@@ -816,15 +1212,17 @@ class Api:
         # Se não houver cache, usa o completo como fallback
         if nprc_data is None:
             nprc_data = self.sap_lookup.get_nprc_data()
-            print(f"WARNING: Using full NPRC database (no cached filter available for {cod_sap})")
+            logger.warning('Using full NPRC database (no cached filter available for %s)', cod_sap)
         else:
-            print(f"Using cached NPRC data for {cod_sap}: {len(nprc_data)} rows filtered by SAP lookup")
+            logger.debug('Using cached NPRC data for %s: %s rows filtered by SAP lookup', cod_sap, len(nprc_data))
         
         # Obtém o DataFrame completo de MDR para lookup de volumes
         mdr_data = self.sap_lookup.get_mdr_data()
         
         # Passa tanto os dados do formulário quanto os dados PFEP, NPRC e MDR completos para o calculador
-        result = self.qme_calculator.calculate(data, pfep_data, nprc_data, mdr_data)
+        with profiling.stage('qme'):
+            result = self.qme_calculator.calculate(data, pfep_data, nprc_data, mdr_data, asis_data=session.asis_data)
+        profiling.count('qme_pns', len(result.get('results', [])))
         
         # Detect mode early to decide if Viajante is required
         fluxo_qme  = data.get('fluxo', '')
@@ -834,7 +1232,7 @@ class Api:
         # Calculate weekly trips:
         #   - Standard mode: requires Viajante results
         #   - ML/LH mode:    runs without Viajante (uses 74 m³ constant)
-        if result.get('status') == 'success' and (self.viajante_results or is_ml_lh_mode):
+        if result.get('status') == 'success' and (viajante_results or is_ml_lh_mode):
             # Extract user input parameters for TDC filtering
             cod_sap = data.get('cod_sap', '')
             origem  = data.get('origem', '')
@@ -844,7 +1242,7 @@ class Api:
             trip    = data.get('trip', '')
 
             # KM: try TDC first, then fall back to manually entered km_manual
-            last_lookup = self.sap_lookup.get_last_lookup_result() or {}
+            last_lookup = session.lookup_result or {}
             km = last_lookup.get('KM', None)
             if km is not None:
                 try:
@@ -862,47 +1260,50 @@ class Api:
                 except (ValueError, TypeError):
                     pass
 
-            print(f"\n{'='*60}")
-            print("CALLING _calculate_weekly_trips WITH PARAMETERS:")
-            print(f"{'='*60}")
-            print(f"  cod_sap: '{cod_sap}'")
-            print(f"  origem: '{origem}'")
-            print(f"  destino: '{destino}'")
-            print(f"  veiculo: '{veiculo}'")
-            print(f"  fluxo: '{fluxo}'")
-            print(f"  trip: '{trip}'")
-            print(f"  km (resolved): '{km}'")
-            print(f"  is_ml_lh: {is_ml_lh_mode}")
-            print(f"{'='*60}\n")
+            logger.debug("_calculate_weekly_trips: cod_sap='%s' origem='%s' destino='%s' veiculo='%s' fluxo='%s' trip='%s' km=%s is_ml_lh=%s",
+                         cod_sap, origem, destino, veiculo, fluxo, trip, km, is_ml_lh_mode)
 
             rt_percent = float(data.get('rt_percent', 100))
             pedagio    = float(data.get('pedagio', 0))
 
-            trip_data = self._calculate_weekly_trips(
-                result,
-                self.viajante_results,  # may be None for ML/LH — handled inside
-                fluxo=fluxo,
-                cod_sap=cod_sap,
-                origem=origem,
-                destino=destino,
-                veiculo=veiculo,
-                trip=trip,
-                km=km,
-                rt_percent=rt_percent,
-                pedagio=pedagio
-            )
+            with profiling.stage('trips'):
+                trip_data = self._calculate_weekly_trips(
+                    result,
+                    viajante_results,  # may be None for ML/LH — handled inside
+                    fluxo=fluxo,
+                    cod_sap=cod_sap,
+                    origem=origem,
+                    destino=destino,
+                    veiculo=veiculo,
+                    trip=trip,
+                    km=km,
+                    rt_percent=rt_percent,
+                    pedagio=pedagio
+                )
             if trip_data:
                 result['weekly_trips'] = trip_data
-                print(f"\n✅ Trip data added to result: {list(trip_data.keys())}")
+                logger.debug('✅ Trip data added to result: %s', list(trip_data.keys()))
             else:
-                print(f"\n⚠️ No trip data returned from calculation")
+                logger.warning('⚠️ No trip data returned from calculation')
         
-        # Clean NaN values before returning (NaN is not valid JSON)
-        return clean_nan_values(result)
+        if result.get('status') == 'success':
+            session.qme_results = result
+        
+        return result
+    
+    def export_results(self, filename=None, session_id=None):
+        """Exporta a tabela de breakdown detalhado (últimos resultados da sessão) para Excel"""
+        with self.profiler.run('export', table='breakdown', session_id=session_id) as profile:
+            with profiling.stage('export'):
+                result = self._export_breakdown(filename, session_id)
+            profile.status = result.get('status')
+            return result
     
-    def export_results(self, filename=None):
-        """Exporta a tabela de breakdown detalhado para Excel"""
-        results = self.qme_calculator.get_last_results()
+    def _export_breakdown(self, filename=None, session_id=None):
+        import pandas as pd
+        
+        session = self.sessions.get(session_id)
+        results = session.qme_results if session else None
         
         if not results or 'summary' not in results:
             return {
@@ -1019,17 +1420,25 @@ class Api:
             }
             
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Export breakdown error details:\n{error_details}")
+            logger.exception('Export breakdown error')
             return {
                 "status": "error",
                 "message": f"Erro ao exportar: {str(e)}"
             }
     
-    def export_pn_table(self, filename=None):
-        """Exporta a tabela de PNs detalhada para Excel"""
-        results = self.qme_calculator.get_last_results()
+    def export_pn_table(self, filename=None, session_id=None):
+        """Exporta a tabela de PNs detalhada (últimos resultados da sessão) para Excel"""
+        with self.profiler.run('export', table='pn', session_id=session_id) as profile:
+            with profiling.stage('export'):
+                result = self._export_pn_table(filename, session_id)
+            profile.status = result.get('status')
+            return result
+    
+    def _export_pn_table(self, filename=None, session_id=None):
+        import pandas as pd
+        
+        session = self.sessions.get(session_id)
+        results = session.qme_results if session else None
         
         if not results or 'results' not in results:
             return {
@@ -1119,9 +1528,7 @@ class Api:
             }
             
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Export error details:\n{error_details}")
+            logger.exception('Export error')
             return {
                 "status": "error",
                 "message": f"Erro ao exportar: {str(e)}"
@@ -3,6 +3,11 @@
 // Global variable to store SAP lookup timeout
 let sapLookupTimeout = null;
 
+// Large API responses (lookup, QME, Viajante) arrive as JSON strings serialized in Python
+function parseApiPayload(response) {
+    return typeof response === 'string' ? JSON.parse(response) : response;
+}
+
 // TAB SWITCHING LOGIC
 function switchTab(tabName) {
     // Remove active class from buttons
@@ -59,27 +64,57 @@ function switchTab(tabName) {
 }
 
 // PYTHON INTERACTION (Calls the backend API)
+let dbLoadJobId = null;
+
 function selectDB() {
-    // Show loading overlay
-    showDatabaseLoadingOverlay();
-    
-    // Calls the python function 'select_folder'
-    window.pywebview.api.select_folder('db').then(path => {
+    // Starts the database load in the background and polls the job status
+    window.pywebview.api.start_db_load().then(response => {
+        // Dialog dismissed: keep the current database
+        if (!response.job_id) return;
+
         const label = document.getElementById('lbl-db');
-        label.innerText = path;
-        label.style.color = path !== "Not Selected" ? '#006400' : '#333';
-        
-        // Hide loading overlay
+        label.innerText = response.folder_name;
+        label.style.color = '#006400';
+
+        dbLoadJobId = response.job_id;
+        showDatabaseLoadingOverlay();
+        pollDBLoadJob(response.job_id);
+    }).catch(error => {
         hideDatabaseLoadingOverlay();
-        
-        // Enable inputs when database folder is selected
-        if (path !== "Not Selected") {
+        showToast('❌ Error loading database: ' + error, 'error');
+    });
+}
+
+function pollDBLoadJob(jobId) {
+    window.pywebview.api.get_job_status(jobId).then(job => {
+        // A newer load replaced this one
+        if (jobId !== dbLoadJobId) return;
+
+        updateDatabaseLoadingOverlay(job);
+
+        if (job.status === 'pending' || job.status === 'running') {
+            setTimeout(() => pollDBLoadJob(jobId), 300);
+            return;
+        }
+
+        hideDatabaseLoadingOverlay();
+        if (job.status !== 'done') {
+            const label = document.getElementById('lbl-db');
+            label.innerText = "Not Selected";
+            label.style.color = '#333';
+        }
+        if (job.status === 'done') {
             enableQMEInputs();
             hideDBWarning();
             showToast('✅ Database loaded and ready!', 'success');
+        } else if (job.status === 'cancelled') {
+            disableQMEInputs();
+            showDBWarning();
+            showToast('⚠️ Database loading cancelled', 'warning');
         } else {
             disableQMEInputs();
             showDBWarning();
+            showToast('❌ Error loading database: ' + (job.error || job.message), 'error');
         }
     }).catch(error => {
         hideDatabaseLoadingOverlay();
@@ -87,6 +122,12 @@ function selectDB() {
     });
 }
 
+function cancelDBLoad() {
+    if (dbLoadJobId) {
+        window.pywebview.api.cancel_job(dbLoadJobId);
+    }
+}
+
 function selectResult() {
     window.pywebview.api.select_folder('result').then(path => {
         const label = document.getElementById('lbl-res');
@@ -111,7 +152,7 @@ function lookupSAPData() {
     // Mostra indicador de carregamento nos campos auto
     showLoadingInFields();
     
-    window.pywebview.api.lookup_sap_data(codSap, planta, origem, destino).then(response => {
+    window.pywebview.api.lookup_sap_data(codSap, planta, origem, destino).then(parseApiPayload).then(response => {
         hideLoadingInFields();
         
         if (response.status === 'success') {
@@ -579,75 +620,111 @@ async function runSimulation() {
     const fluxoValue = data.fluxo ? data.fluxo.toLowerCase() : '';
     const isMilkRunOrLineHaul = fluxoValue.includes('milk run') || fluxoValue.includes('line haul');
 
-    try {
-        let viajanteResponse = null;
-
-        if (isMilkRunOrLineHaul) {
-            // ── ML/LH MODE: skip Viajante entirely ──
-            console.log(`\n🚛 ${data.fluxo} mode detected — skipping Viajante processing`);
-            showToast(`⏳ Modo ${data.fluxo}: calculando sem Viajante...`, 'info');
-        } else {
-            // ── STANDARD MODE: prepare demand + run Viajante ──
-            showToast('⏳ Preparando dados de demanda...', 'info');
+    if (isMilkRunOrLineHaul) {
+        console.log(`\n🚛 ${data.fluxo} mode detected — skipping Viajante processing`);
+        showToast(`⏳ Modo ${data.fluxo}: calculando sem Viajante...`, 'info');
+    } else {
+        showToast('⏳ Preparando dados de demanda...', 'info');
+    }
 
-            // Step 1: Prepare Viajante demand file
-            console.log('\n📊 Step 1: Preparing Viajante demand file...');
-            const prepareResponse = await prepareViajanteData(data.cod_sap, data.destino);
+    try {
+        // The simulation runs as a background job; results arrive through window.onJobEvent.
+        // Starting a new one cancels the previous job on the Python side.
+        const response = await window.pywebview.api.start_simulation(data);
+        simulationJobId = response.job_id;
+        console.log(`🧵 Simulation job started: ${simulationJobId}`);
+
+        // A job that ended before this reply arrived already pushed its final event: replay it
+        const earlyEvent = earlyJobEvents.get(simulationJobId);
+        earlyJobEvents.clear();
+        if (earlyEvent) window.onJobEvent(earlyEvent);
+    } catch (error) {
+        console.error('❌ Error in runSimulation:', error);
+        showToast('❌ Erro na simulação: ' + error.message, 'error');
+    }
+}
 
-            if (prepareResponse && prepareResponse.status === 'error') {
-                showToast('❌ Erro ao preparar demanda: ' + prepareResponse.message, 'error');
-                return;
-            }
+// Current simulation job: events from any other (stale) job are ignored
+let simulationJobId = null;
 
-            // Step 2: Run Viajante processing
-            console.log('\n🚚 Step 2: Running Viajante processing...');
-            showToast('⏳ Processando Viajante...', 'info');
+// Job events come through evaluate_js from the worker thread, with no ordering against the
+// start_simulation reply: final events of a job we don't know yet are kept until the reply arrives
+const earlyJobEvents = new Map();
+const FINAL_JOB_EVENTS = ['done', 'error', 'cancelled'];
+const MAX_EARLY_JOB_EVENTS = 10;
 
-            viajanteResponse = await window.pywebview.api.run_viajante(data.cod_sap);
+function cancelSimulation() {
+    if (!simulationJobId) return;
+    console.log(`🛑 Form changed — cancelling simulation job ${simulationJobId}`);
+    window.pywebview.api.cancel_job(simulationJobId);
+    simulationJobId = null;
+}
 
-            if (viajanteResponse.status !== 'success') {
-                console.error('❌ Error running Viajante:', viajanteResponse.message);
-                showToast('❌ Erro Viajante: ' + viajanteResponse.message, 'error');
-                return;
+// Called from Python (evaluate_js) whenever a background job changes
+window.onJobEvent = function(event) {
+    if (event.kind !== 'simulation') return;
+    if (event.job_id !== simulationJobId) {
+        if (FINAL_JOB_EVENTS.includes(event.event)) {
+            earlyJobEvents.set(event.job_id, event);
+            if (earlyJobEvents.size > MAX_EARLY_JOB_EVENTS) {
+                earlyJobEvents.delete(earlyJobEvents.keys().next().value);
             }
-
-            console.log('✅ Viajante processing completed successfully');
-            console.log(`   Results: ${viajanteResponse.total_rows} rows`);
-            showToast('✅ Viajante processado com sucesso!', 'success');
         }
+        return;
+    }
 
-        // Step 3: Calculate QME
-        console.log('\n📊 Step 3: Calculating QME...');
-        showToast('⏳ Processando simulação QME...', 'info');
+    if (event.event === 'progress') {
+        console.log(`⏳ ${Math.round(event.progress)}% — ${event.message}`);
+        showToast('⏳ ' + event.message, 'info');
+        return;
+    }
+    if (event.event === 'running') return;
 
-        const qmeResponse = await window.pywebview.api.calculate_qme(data);
+    simulationJobId = null;
+    if (event.event === 'cancelled') {
+        console.log('🛑 Simulation cancelled');
+        return;
+    }
+    if (event.event === 'error') {
+        showToast('❌ Erro na simulação: ' + event.error, 'error');
+        return;
+    }
 
-        if (qmeResponse.status === 'error') {
-            showToast('❌ Erro QME: ' + qmeResponse.message, 'error');
-            return;
-        }
+    handleSimulationResult(event.result);
+};
 
-        // Display QME results in dashboard
-        displayResults(qmeResponse);
-        showToast('✅ Cálculo QME concluído!', 'success');
+function handleSimulationResult(result) {
+    if (result.status !== 'success') {
+        const prefix = { demanda: 'Erro ao preparar demanda', viajante: 'Erro Viajante', qme: 'Erro QME' }[result.stage] || 'Erro';
+        console.error(`❌ ${prefix}:`, result.message);
+        showToast(`❌ ${prefix}: ` + result.message, 'error');
+        return;
+    }
 
-        // Display Viajante results (only in standard mode)
-        if (viajanteResponse) {
-            displayViajanteResults(viajanteResponse.results);
-        }
+    const qmeResponse = result.qme;
+    const viajanteResponse = result.viajante;
 
-        // Update weekly trips in breakdown table
-        console.log('\n📊 Step 4: Updating weekly trips in breakdown table...');
-        updateWeeklyTrips(qmeResponse, viajanteResponse);
+    if (viajanteResponse) {
+        console.log('✅ Viajante processing completed successfully');
+        console.log(`   Results: ${viajanteResponse.total_rows} rows`);
+    }
 
-        // Switch to dashboard
-        console.log('\n✅ All processing complete! Switching to dashboard...');
-        switchTab('dash');
-        
-    } catch (error) {
-        console.error('❌ Error in runSimulation:', error);
-        showToast('❌ Erro na simulação: ' + error.message, 'error');
+    // Display QME results in dashboard
+    displayResults(qmeResponse);
+    showToast('✅ Cálculo QME concluído!', 'success');
+
+    // Display Viajante results (only in standard mode)
+    if (viajanteResponse) {
+        displayViajanteResults(viajanteResponse.results);
     }
+
+    // Update weekly trips in breakdown table
+    console.log('\n📊 Updating weekly trips in breakdown table...');
+    updateWeeklyTrips(qmeResponse, viajanteResponse);
+
+    // Switch to dashboard
+    console.log('\n✅ All processing complete! Switching to dashboard...');
+    switchTab('dash');
 }
 
 function importASIS() {
@@ -1461,6 +1538,12 @@ window.addEventListener('pywebviewready', function() {
         console.log('Destino auto-fetch listener attached');
     }
     
+    // Alterar o formulário descarta a simulação em andamento (resultado ficaria obsoleto)
+    ['cod_sap', 'destino', 'fluxo', 'veiculo', 'trip', 'qme_tobe', 'rt_percent', 'pedagio', 'km_manual'].forEach(id => {
+        const input = document.getElementById(id);
+        if (input) input.addEventListener('change', cancelSimulation);
+    });
+    
     // Inicializa o estado dos inputs baseado na seleção do database
     initializeInputState();
 });
@@ -1498,14 +1581,30 @@ function showDatabaseLoadingOverlay() {
             <div class="db-loading-content">
                 <div class="spinner"></div>
                 <h3>📂 Loading Database Files...</h3>
+                <p id="db-loading-message"></p>
                 <small>This may take a few seconds on first load</small>
+                <div><button type="button" class="btn-cancel-load" onclick="cancelDBLoad()">Cancel</button></div>
             </div>
         `;
         document.body.appendChild(overlay);
     }
+    updateDatabaseLoadingOverlay(null);
     overlay.classList.add('active');
 }
 
+function updateDatabaseLoadingOverlay(job) {
+    const message = document.getElementById('db-loading-message');
+    if (!message) return;
+    if (!job) {
+        message.innerText = '';
+        return;
+    }
+    const timings = Object.entries(job.timings || {})
+        .map(([source, seconds]) => `${source} ${seconds.toFixed(1)}s`)
+        .join(' · ');
+    message.innerText = `${Math.round(job.progress)}% — ${job.message || ''}` + (timings ? `\n${timings}` : '');
+}
+
 function hideDatabaseLoadingOverlay() {
     const overlay = document.getElementById('db-loading-overlay');
     if (overlay) {
@@ -0,0 +1,3 @@
+"""
+Benchmarks de performance em bases sintéticas (ver benchmarks/run.py)
+"""
@@ -0,0 +1,316 @@
+"""
+Golden test: motor antigo x motor novo sobre a mesma base
+
+    python -m benchmarks.golden                          # árvore de trabalho x HEAD
+    python -m benchmarks.golden --old ed57754            # x versão base
+    python -m benchmarks.golden --old HEAD~2 --new HEAD --scale medium --tol CARGAS=0
+
+Cada motor é materializado numa pasta temporária (git archive da ref, ou cópia da árvore de
+trabalho), recebe uma cópia da base sintética (benchmarks.synthetic_data) e dos cadastros do
+Viajante e roda benchmarks/golden_capture.py num processo próprio com os mesmos casos:
+lookup_data, QMECalculator.calculate, run_viajante_headless e calculate_tariff.
+
+As saídas são comparadas campo a campo com tolerância (m³ mensal, QME/viagens, saturação,
+CARGAS, tarifa_real...) e o relatório mostra o ganho de tempo por etapa. Sai com código 1
+se houver diferença fora da tolerância - a otimização só entra com o golden verde.
+"""
+
+import argparse
+import io
+import json
+import os
+import pickle
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .synthetic_data import VIAJANTE_BD, SCALES, generate_db_folder, viajante_demand
+
+ROOT = Path(__file__).resolve().parent
+REPO = ROOT.parent
+CAPTURE_SCRIPT = ROOT / "golden_capture.py"
+DEFAULT_DATA_DIR = ROOT / "data"
+DEFAULT_RESULTS_DIR = ROOT / "results"
+
+WORKTREE = 'WORKTREE'
+SECTIONS = ['lookup', 'qme', 'viajante', 'tariff']
+
+# Campos acompanhados no resumo (diferença máxima por campo)
+WATCHED_FIELDS = [
+    'monthly_m3_asis', 'monthly_m3_tobe', 'monthly_qme_asis', 'monthly_qme_tobe', 'savings',
+    'CARGAS', 'SATURAÇÃO TOTAL (%)', 'CAP. ÚTIL (m³)', 'CAP. ÚTIL (%)', 'VOLUME TOTAL (m³)', 'tarifa_real',
+]
+# Textos e metadados que mudam sem mudar o resultado
+IGNORED_FIELDS = {'message', 'file_path', 'engine_dir'}
+DEFAULT_REL_TOL = 1e-6
+DEFAULT_ABS_TOL = 1e-9
+
+
+# ---------------------------------------------------------------------- motores
+def _copy_ignore(directory, names):
+    ignored = {'.git', '__pycache__', 'logs', 'results', 'data'} if Path(directory) == ROOT else {'.git', '__pycache__', 'logs'}
+    return [n for n in names if n in ignored or n.endswith(('.parquet', '.arrow', '.pyc'))]
+
+
+def materialize(ref, dest):
+    """Extrai a ref (git archive) ou copia a árvore de trabalho (WORKTREE) para dest"""
+    dest = Path(dest)
+    if ref == WORKTREE:
+        shutil.copytree(REPO, dest, ignore=_copy_ignore)
+        return dest
+    archive = subprocess.run(['git', 'archive', '--format=tar', ref], cwd=REPO, capture_output=True)
+    if archive.returncode != 0:
+        raise SystemExit(f"git archive {ref} falhou: {archive.stderr.decode(errors='replace').strip()}")
+    dest.mkdir(parents=True)
+    with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+        tar.extractall(dest, filter='data')
+    return dest
+
+
+def describe(ref):
+    if ref == WORKTREE:
+        return 'árvore de trabalho'
+    out = subprocess.run(['git', 'log', '-1', '--format=%h %s', ref], cwd=REPO, capture_output=True, text=True)
+    return out.stdout.strip() or ref
+
+
+def prepare_engine(name, ref, work_dir, db_folder, viajante_bd):
+    """Pasta do motor com a base e os cadastros do Viajante da fixture (sem caches Parquet/snapshot)"""
+    engine_dir = materialize(ref, Path(work_dir) / name)
+    engine_db = engine_dir / "_golden_db"
+    shutil.copytree(db_folder, engine_db, ignore=shutil.ignore_patterns('*.parquet', '*.arrow'))
+    bd = engine_dir / "Viajante" / "BD"
+    if bd.exists():
+        shutil.rmtree(bd)
+    shutil.copytree(viajante_bd, bd, ignore=shutil.ignore_patterns('*.parquet'))
+    return engine_dir, engine_db
+
+
+def run_capture(engine_dir, cases_path, output, repeat, timeout):
+    """Roda golden_capture.py para o motor; a saída do processo vai para capture.log"""
+    log_path = Path(engine_dir) / "capture.log"
+    env = dict(os.environ, BC_TURBO_LOG_LEVEL='ERROR', PYTHONIOENCODING='utf-8')
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.run([sys.executable, str(CAPTURE_SCRIPT), str(engine_dir), str(cases_path),
+                               str(output), '--repeat', str(repeat)],
+                              cwd=engine_dir, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+    if proc.returncode != 0:
+        tail = log_path.read_text(encoding='utf-8', errors='replace').splitlines()[-25:]
+        raise SystemExit(f"Captura falhou em {engine_dir} (código {proc.returncode}):\n" + "\n".join(tail))
+    return json.loads(Path(output).read_text(encoding='utf-8'))
+
+
+# ---------------------------------------------------------------------- comparação
+class Diff:
+    """Compara duas saídas JSON campo a campo; números com tolerância relativa/absoluta"""
+
+    def __init__(self, rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL, field_tols=None, limit=200):
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.field_tols = field_tols or {}
+        self.limit = limit
+        self.differences = []
+        self.total = 0
+        self.fields = {}  # campo -> {'compared', 'mismatches', 'max_abs', 'max_rel'}
+
+    def _record(self, path, kind, old, new):
+        self.total += 1
+        if len(self.differences) < self.limit:
+            self.differences.append({'path': path, 'kind': kind, 'old': old, 'new': new})
+
+    def _numbers(self, path, field, old, new):
+        rel_tol = self.field_tols.get(field, self.rel_tol)
+        delta = abs(old - new)
+        scale = max(abs(old), abs(new))
+        stats = self.fields.setdefault(field, {'compared': 0, 'mismatches': 0, 'max_abs': 0.0, 'max_rel': 0.0})
+        stats['compared'] += 1
+        stats['max_abs'] = max(stats['max_abs'], delta)
+        stats['max_rel'] = max(stats['max_rel'], delta / scale if scale else 0.0)
+        if delta > max(self.abs_tol, rel_tol * scale):
+            stats['mismatches'] += 1
+            self._record(path, 'value', old, new)
+
+    def compare(self, old, new, path='', field=None):
+        if isinstance(old, bool) or isinstance(new, bool):
+            if old != new:
+                self._record(path, 'value', old, new)
+        elif isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            self._numbers(path, field, old, new)
+        elif isinstance(old, dict) and isinstance(new, dict):
+            for key in list(old) + [k for k in new if k not in old]:
+                if key in IGNORED_FIELDS:
+                    continue
+                child = f"{path}.{key}" if path else key
+                if key not in new:
+                    self._record(child, 'missing', old[key], None)
+                elif key not in old:
+                    self._record(child, 'extra', None, new[key])
+                else:
+                    # Valores por mês/transportadora herdam o campo pai (monthly_m3_asis.Jan -> monthly_m3_asis)
+                    inherit = field in WATCHED_FIELDS or field in self.field_tols
+                    self.compare(old[key], new[key], child, field if inherit else key)
+        elif isinstance(old, list) and isinstance(new, list):
+            if len(old) != len(new):
+                self._record(path, 'length', len(old), len(new))
+            for i, (a, b) in enumerate(zip(old, new)):
+                self.compare(a, b, f"{path}[{i}]", field)
+        elif type(old) is not type(new) and old is not None and new is not None:
+            self._record(path, 'type', repr(old), repr(new))
+        elif old != new:
+            self._record(path, 'value', old, new)
+
+
+def coverage(outputs):
+    """Quantos casos de cada etapa terminaram com status success (resultado realmente comparado)"""
+    summary = {}
+    for section in SECTIONS:
+        cases = outputs.get(section) or {}
+        if section == 'viajante':
+            cases = {'viajante': cases}
+        elif section == 'tariff':
+            cases = {key: case.get('result') for key, case in cases.items()}
+        ok = sum(1 for r in cases.values() if isinstance(r, dict) and r.get('status') == 'success')
+        summary[section] = {'cases': len(cases), 'success': ok}
+    return summary
+
+
+def speedups(old_timings, new_timings):
+    """Mediana por etapa nos dois motores e o ganho (antigo / novo) nas etapas comuns"""
+    table = {}
+    for stage in old_timings.keys() & new_timings.keys():
+        old, new = statistics.median(old_timings[stage]), statistics.median(new_timings[stage])
+        table[stage] = {'old': round(old, 6), 'new': round(new, 6),
+                        'speedup': round(old / new, 3) if new else None}
+    return dict(sorted(table.items()))
+
+
+# ---------------------------------------------------------------------- casos
+def build_cases(base, seed, veiculo, lookups, qme_codes, tariff_queries, viajante_pns, viajante_bd):
+    demanda, cod_fornecedor, cod_destino = viajante_demand(viajante_pns, seed=seed, bd_folder=viajante_bd)
+    return {
+        'destino': base.destinos[0],
+        'veiculo': veiculo,
+        'lookup_codes': base.sample_sap_codes(lookups),
+        'qme': [(code, base.propose_file(code)) for code in base.sample_sap_codes(qme_codes)],
+        'tariff_queries': base.tariff_queries(tariff_queries),
+        'viajante': {'demanda': demanda, 'cod_fornecedor': cod_fornecedor, 'cod_destino': cod_destino},
+    }
+
+
+def print_report(report):
+    print(f"\nGolden - antigo: {report['old']['describe']} | novo: {report['new']['describe']}")
+    print(f"Escala {report['scale']} (seed {report['seed']}), tolerância rel {report['rel_tol']:g} / abs {report['abs_tol']:g}")
+
+    print(f"\n{'etapa':<12} {'casos':>6} {'ok antigo':>10} {'ok novo':>8}")
+    for section in SECTIONS:
+        old, new = report['old']['coverage'][section], report['new']['coverage'][section]
+        print(f"{section:<12} {old['cases']:>6} {old['success']:>10} {new['success']:>8}")
+
+    print(f"\n{'campo':<22} {'valores':>8} {'fora':>6} {'máx abs':>12} {'máx rel':>10}")
+    for field in WATCHED_FIELDS:
+        stats = report['fields'].get(field)
+        if stats:
+            print(f"{field:<22} {stats['compared']:>8} {stats['mismatches']:>6} "
+                  f"{stats['max_abs']:>12.3g} {stats['max_rel']:>10.2g}")
+
+    print(f"\n{'etapa (tempo)':<28} {'antigo (s)':>11} {'novo (s)':>10} {'ganho':>8}")
+    for stage, row in report['speedup'].items():
+        gain = f"{row['speedup']:.2f}x" if row['speedup'] else '-'
+        print(f"{stage:<28} {row['old']:>11.4f} {row['new']:>10.4f} {gain:>8}")
+
+    if report['differences_total']:
+        print(f"\n{report['differences_total']} diferença(s) fora da tolerância; primeiras:")
+        for diff in report['differences'][:20]:
+            print(f"  [{diff['kind']}] {diff['path']}: {diff['old']!r} -> {diff['new']!r}")
+    else:
+        print("\nSaídas equivalentes dentro da tolerância.")
+
+
+def parse_field_tols(values):
+    tols = {}
+    for value in values or []:
+        field, sep, tol = value.rpartition('=')
+        if not sep:
+            raise SystemExit(f"--tol espera CAMPO=TOLERÂNCIA_RELATIVA (recebido: {value})")
+        tols[field.strip()] = float(tol)
+    return tols
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Golden test: compara as saídas de dois motores do BC Turbo")
+    parser.add_argument('--old', default='HEAD', help="ref git do motor de referência (padrão: HEAD)")
+    parser.add_argument('--new', default=WORKTREE, help="ref git do motor novo (padrão: árvore de trabalho)")
+    parser.add_argument('--scale', default='small', choices=list(SCALES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="repetições por etapa para medir o tempo")
+    parser.add_argument('--veiculo', default='CARRETA')
+    parser.add_argument('--lookups', type=int, default=20)
+    parser.add_argument('--qme-codes', type=int, default=5)
+    parser.add_argument('--tariff-queries', type=int, default=60)
+    parser.add_argument('--data-dir', type=Path, help="pasta da base sintética (padrão: benchmarks/data/<escala>-<seed>)")
+    parser.add_argument('--viajante-bd', type=Path, default=VIAJANTE_BD, help="cadastros do Viajante usados pelos dois motores")
+    parser.add_argument('--rel-tol', type=float, default=DEFAULT_REL_TOL)
+    parser.add_argument('--abs-tol', type=float, default=DEFAULT_ABS_TOL)
+    parser.add_argument('--tol', action='append', metavar='CAMPO=REL', help="tolerância relativa de um campo (ex: CARGAS=0)")
+    parser.add_argument('--work-dir', type=Path, help="pasta de trabalho (padrão: temporária, apagada no fim)")
+    parser.add_argument('--keep', action='store_true', help="mantém a pasta de trabalho (logs e saídas de cada motor)")
+    parser.add_argument('--timeout', type=int, default=1800, help="limite em segundos da captura de cada motor")
+    parser.add_argument('--output', type=Path, help="relatório JSON (padrão: benchmarks/results/golden-<data>.json)")
+    args = parser.parse_args(argv)
+
+    field_tols = parse_field_tols(args.tol)
+    data_dir = args.data_dir or DEFAULT_DATA_DIR / f"{args.scale}-{args.seed}"
+    base, db_folder = generate_db_folder(data_dir, args.scale, seed=args.seed)
+    cases = build_cases(base, args.seed, args.veiculo, args.lookups, args.qme_codes,
+                        args.tariff_queries, base.params['viajante_pns'], args.viajante_bd)
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix='bc_turbo_golden_'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    report = {'scale': args.scale, 'seed': args.seed, 'rel_tol': args.rel_tol, 'abs_tol': args.abs_tol,
+              'field_tols': field_tols, 'created_at': datetime.now().isoformat(timespec='seconds')}
+    captured = {}
+    try:
+        for name, ref in (('old', args.old), ('new', args.new)):
+            start = time.perf_counter()
+            engine_dir, engine_db = prepare_engine(name, ref, work_dir, db_folder, args.viajante_bd)
+            cases_path = engine_dir / "_golden_cases.pkl"
+            with open(cases_path, 'wb') as f:
+                pickle.dump(dict(cases, db_folder=str(engine_db)), f)
+            print(f"  motor {name} ({describe(ref)})...", flush=True)
+            captured[name] = run_capture(engine_dir, cases_path, engine_dir / "_golden_output.json",
+                                         args.repeat, args.timeout)
+            report[name] = {'ref': ref, 'describe': describe(ref), 'seconds': round(time.perf_counter() - start, 2),
+                            'coverage': coverage(captured[name]['outputs'])}
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    diff = Diff(args.rel_tol, args.abs_tol, field_tols)
+    for section in SECTIONS:
+        diff.compare(captured['old']['outputs'].get(section), captured['new']['outputs'].get(section), section)
+    report.update({
+        'fields': diff.fields,
+        'differences_total': diff.total,
+        'differences': diff.differences,
+        'speedup': speedups(captured['old']['timings'], captured['new']['timings']),
+    })
+
+    output = args.output or DEFAULT_RESULTS_DIR / f"golden-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str), encoding='utf-8')
+
+    print_report(report)
+    if args.keep or args.work_dir:
+        print(f"\nPasta de trabalho: {work_dir}")
+    print(f"Relatório salvo em {output}")
+    return 1 if diff.total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Captura das saídas de um motor do BC Turbo para o golden test (benchmarks/golden.py)
+
+    python golden_capture.py <pasta do motor> <casos.pkl> <saida.json> [--repeat N]
+
+Roda num processo próprio com a árvore do motor na frente do sys.path e só usa APIs que
+existem desde a versão base (SAPLookup, QMECalculator, DB.run_viajante_headless), por isso
+não importa nada do pacote benchmarks: o mesmo script mede o motor antigo e o novo.
+
+A saída tem, por etapa (load, lookup, qme, viajante, tariff), os resultados em formato JSON
+já indexados por chave estável (PN, rota/mês, consulta) e os tempos de cada repetição.
+"""
+
+import argparse
+import inspect
+import json
+import math
+import os
+import pickle
+import sys
+import time
+from datetime import date, datetime
+
+
+def plain(value):
+    """Converte resultados (numpy, pandas, NaN) em tipos JSON comparáveis"""
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if hasattr(value, 'to_dict') and hasattr(value, 'columns'):
+        return [plain(row) for row in value.to_dict('records')]
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        try:
+            value = value.item()
+        except (ValueError, AttributeError):
+            return str(value)
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    try:
+        if value != value:  # NaT / pd.NA
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def timed(func, repeat):
+    """Executa func repeat vezes; retorna (resultado da primeira execução, segundos de cada uma)"""
+    result, seconds = None, []
+    for i in range(max(1, repeat)):
+        start = time.perf_counter()
+        value = func()
+        seconds.append(time.perf_counter() - start)
+        if i == 0:
+            result = value
+    return result, seconds
+
+
+def keyed(rows, key_fields):
+    """Lista de dicts -> dict por chave (repetições da mesma chave ganham sufixo #n)"""
+    out = {}
+    for row in rows or []:
+        key = '|'.join(str(row.get(field)) for field in key_fields)
+        unique, n = key, 1
+        while unique in out:
+            n += 1
+            unique = f"{key}#{n}"
+        out[unique] = row
+    return out
+
+
+def capture(engine_dir, cases, repeat):
+    from modules import SAPLookup, QMECalculator
+
+    outputs, timings = {}, {}
+    db_folder = cases['db_folder']
+
+    # --- Carga: a primeira é a frio (a cópia da base não tem Parquet), as seguintes a quente ---
+    lookup = SAPLookup()
+    start = time.perf_counter()
+    lookup.update_db_folder(db_folder)
+    timings['load_cold'] = [time.perf_counter() - start]
+    _, timings['load_warm'] = timed(lambda: SAPLookup().update_db_folder(db_folder), repeat)
+
+    # --- lookup_data ---
+    destino = cases['destino']
+
+    def run_lookups():
+        lookup.sap_cache.clear()
+        return {code: plain(lookup.lookup_data(code, '', '', destino)) for code in cases['lookup_codes']}
+
+    outputs['lookup'], timings['lookup'] = timed(run_lookups, repeat)
+
+    # --- QMECalculator.calculate (a versão base guardava o AS IS no calculador) ---
+    calculator = QMECalculator()
+    takes_asis = 'asis_data' in inspect.signature(calculator.calculate).parameters
+    pfep, mdr = lookup.get_pfep_data(), lookup.get_mdr_data()
+    qme_cases = []
+    for code, propose in cases['qme']:
+        lookup.lookup_data(code, '', '', destino)
+        qme_cases.append((code, lookup.get_cached_nprc_data(code), propose))
+
+    def run_qme():
+        results = {}
+        for code, nprc, propose in qme_cases:
+            data = {'cod_sap': code, 'veiculo': cases['veiculo']}
+            if takes_asis:
+                result = calculator.calculate(data, pfep, nprc, mdr, asis_data=propose.copy())
+            else:
+                calculator.set_asis_data(propose.copy())
+                result = calculator.calculate(data, pfep, nprc, mdr)
+            result = plain(result)
+            if isinstance(result.get('results'), list):
+                result['results'] = keyed(result['results'], ['pn'])
+            results[code] = result
+        return results
+
+    outputs['qme'], timings['qme'] = timed(run_qme, repeat)
+
+    # --- Viajante (DB.py importado como na versão base: cwd e sys.path na pasta do Viajante) ---
+    viajante_dir = os.path.join(engine_dir, 'Viajante')
+    sys.path.insert(0, viajante_dir)
+    os.chdir(viajante_dir)
+    import DB
+
+    viajante = cases['viajante']
+    tempos = {}
+
+    def run_viajante():
+        result = plain(DB.run_viajante_headless(viajante['demanda'].copy(), viajante['cod_fornecedor'],
+                                                viajante['cod_destino'], cases['veiculo'], caminho_BD='BD'))
+        for etapa, segundos in (result.pop('tempos', None) or {}).items():
+            tempos.setdefault(f"viajante.{etapa}", []).append(segundos)
+        if isinstance(result.get('results'), list):
+            result['results'] = keyed(result['results'], ['COD DESTINO', 'Mês', 'DESTINO', 'VEÍCULO', 'FORNECEDORES NA ROTA'])
+        return result
+
+    # A primeira execução lê os cadastros do BD (a frio); as repetições medem o app já aberto
+    outputs['viajante'], timings['viajante_cold'] = timed(run_viajante, 1)
+    tempos.clear()
+    _, timings['viajante'] = timed(run_viajante, repeat)
+    timings.update(tempos)
+
+    # --- calculate_tariff ---
+    def run_tariffs():
+        queries = [{'query': list(query), 'result': plain(lookup.calculate_tariff(*query))}
+                   for query in cases['tariff_queries']]
+        return keyed(queries, ['query'])
+
+    outputs['tariff'], timings['tariff'] = timed(run_tariffs, repeat)
+    return outputs, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Captura as saídas de um motor para o golden test")
+    parser.add_argument('engine_dir')
+    parser.add_argument('cases')
+    parser.add_argument('output')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    engine_dir = os.path.abspath(args.engine_dir)
+    sys.path.insert(0, engine_dir)
+    with open(args.cases, 'rb') as f:
+        cases = pickle.load(f)
+
+    outputs, timings = capture(engine_dir, cases, args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'engine_dir': engine_dir, 'outputs': outputs, 'timings': timings}, f, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
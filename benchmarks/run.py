@@ -0,0 +1,343 @@
+"""
+Benchmarks do BC Turbo sobre bases sintéticas
+
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale medium --only load_cold,lookup --repeat 5
+    python -m benchmarks.run --scale small --set tdc_rows=50000 --baseline benchmarks/results/small-....json
+
+Mede a abertura do app (processo novo até a Api pronta e o aquecimento, sem janela), a carga do database a frio (sem Parquet), a quente (Parquet) e pelo snapshot, lookup_data, QMECalculator.calculate,
+run_viajante_headless e calculate_tariff. Cada benchmark grava min/mediana/média, tempo por operação
+e as etapas do perfil (modules.profiling) num JSON em benchmarks/results/; com --baseline o resultado
+é comparado com uma execução anterior e regressões acima do limite são destacadas.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from modules import SAPLookup, QMECalculator, profiling, serialization
+from modules.logging_config import configure_logging
+from Viajante import run_viajante_headless
+
+from .synthetic_data import (VIAJANTE_BD, SCALES, clear_parquet_caches, generate_db_folder,
+                             viajante_demand)
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_DATA_DIR = ROOT / "data"
+DEFAULT_RESULTS_DIR = ROOT / "results"
+
+BENCHMARKS = ['startup', 'load_cold', 'load_warm', 'load_snapshot', 'lookup', 'qme', 'viajante', 'tariff']
+
+
+class BenchContext:
+    """Base sintética + pasta gerada + objetos já carregados, compartilhados entre os benchmarks"""
+
+    def __init__(self, base, folder, seed, lookups=20, qme_codes=5, tariff_queries=60):
+        self.base = base
+        self.folder = folder
+        self.seed = seed
+        self.lookup_codes = base.sample_sap_codes(lookups)
+        self.qme_codes = base.sample_sap_codes(qme_codes)
+        self.tariff_queries = base.tariff_queries(tariff_queries)
+        self._sap_lookup = None
+
+    @property
+    def sap_lookup(self):
+        """SAPLookup com a base carregada (a quente) - carregado na primeira vez que for usado"""
+        if self._sap_lookup is None:
+            self._sap_lookup = SAPLookup()
+            self._sap_lookup.update_db_folder(str(self.folder))
+        return self._sap_lookup
+
+
+# ---------------------------------------------------------------------- benchmarks
+# Cada função recebe o contexto e devolve (função medida, número de operações por chamada);
+# o preparo que não deve entrar na medição fica fora da função medida.
+
+# O que o main.py faz antes e depois de abrir a janela (sem a janela); imprime modules.startup.report()
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from modules import startup
+startup.begin(started)
+import webview
+from api import Api
+startup.mark('imports')
+api = Api()
+startup.mark('api')
+startup.mark('window')
+print(json.dumps(api.warm_up()))
+"""
+
+
+def bench_startup(ctx):
+    def run():
+        proc = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT.parent, capture_output=True,
+                              text=True, timeout=300, env={**os.environ, 'BC_TURBO_LOG_LEVEL': 'ERROR'})
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip()[-500:])
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        previous = 0.0
+        for etapa, segundos in sorted(report['marks'].items(), key=lambda item: item[1]):
+            profiling.add_stage(f"startup.{etapa}", segundos - previous)
+            previous = segundos
+        if report['within_budget'] is False:
+            print(f"  startup: janela em {report['window_seconds']:.2f}s, acima do orçamento de {report['budget']:.2f}s")
+    return run, 1
+
+
+def bench_load_cold(ctx):
+    def run():
+        clear_parquet_caches(ctx.folder)
+        SAPLookup().update_db_folder(str(ctx.folder))
+    return run, 1
+
+
+def bench_load_warm(ctx):
+    SAPLookup(use_snapshot=False).update_db_folder(str(ctx.folder))  # garante os Parquet
+
+    def run():
+        SAPLookup(use_snapshot=False).update_db_folder(str(ctx.folder))
+    return run, 1
+
+
+def bench_load_snapshot(ctx):
+    SAPLookup().update_db_folder(str(ctx.folder))  # garante o snapshot
+
+    def run():
+        SAPLookup().update_db_folder(str(ctx.folder))
+    return run, 1
+
+
+def bench_lookup(ctx):
+    lookup = ctx.sap_lookup
+    destino = ctx.base.destinos[0]
+
+    def run():
+        lookup.sap_cache.clear()
+        for code in ctx.lookup_codes:
+            lookup.lookup_data(code, '', '', destino)
+    return run, len(ctx.lookup_codes)
+
+
+def bench_qme(ctx):
+    lookup = ctx.sap_lookup
+    calculator = QMECalculator()
+    cases = []
+    for code in ctx.qme_codes:
+        lookup.lookup_data(code, '', '', ctx.base.destinos[0])
+        cases.append(({'cod_sap': code, 'veiculo': 'CARRETA'}, lookup.get_cached_nprc_data(code),
+                      ctx.base.propose_file(code)))
+    pfep, mdr = lookup.get_pfep_data(), lookup.get_mdr_data()
+
+    def run():
+        for data, nprc, propose in cases:
+            calculator.calculate(data, pfep, nprc, mdr, asis_data=propose)
+    return run, len(cases)
+
+
+def bench_viajante(ctx):
+    demanda, cod_fornecedor, cod_destino = viajante_demand(ctx.base.params['viajante_pns'], seed=ctx.seed)
+    # Primeira chamada carrega os cadastros do Viajante (fica fora da medição, como no app aberto)
+    run_viajante_headless(demanda, cod_fornecedor, cod_destino, 'CARRETA', caminho_BD=str(VIAJANTE_BD))
+
+    def run():
+        result = run_viajante_headless(demanda, cod_fornecedor, cod_destino, 'CARRETA', caminho_BD=str(VIAJANTE_BD))
+        for etapa, segundos in (result.get('tempos') or {}).items():
+            profiling.add_stage(f"viajante.{etapa}", segundos)
+        if result.get('status') != 'success':
+            raise RuntimeError(result.get('message'))
+    return run, 1
+
+
+def bench_tariff(ctx):
+    lookup = ctx.sap_lookup
+
+    def run():
+        for query in ctx.tariff_queries:
+            with profiling.stage('tariff'):
+                lookup.calculate_tariff(*query)
+    return run, len(ctx.tariff_queries)
+
+
+BENCH_FUNCS = {
+    'startup': bench_startup,
+    'load_cold': bench_load_cold,
+    'load_warm': bench_load_warm,
+    'load_snapshot': bench_load_snapshot,
+    'lookup': bench_lookup,
+    'qme': bench_qme,
+    'viajante': bench_viajante,
+    'tariff': bench_tariff,
+}
+
+
+# ---------------------------------------------------------------------- execução
+def run_benchmark(name, ctx, repeat, profiler):
+    """Executa o benchmark repeat vezes; retorna o resumo com tempos e etapas da última execução"""
+    func, ops = BENCH_FUNCS[name](ctx)
+    timings = []
+    last = None
+    for _ in range(repeat):
+        with profiler.run(name) as profile:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        last = profile
+    median = statistics.median(timings)
+    stages = last.to_dict()['stages'] if last is not None else {}
+    return {
+        'runs': repeat,
+        'ops': ops,
+        'seconds': {
+            'min': round(min(timings), 6),
+            'median': round(median, 6),
+            'mean': round(statistics.fmean(timings), 6),
+            'max': round(max(timings), 6),
+        },
+        'ms_per_op': round(median / ops * 1000, 4),
+        'stages': stages,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT.parent,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'json_encoder': serialization.ENCODER,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compara a mediana de cada benchmark com a do baseline
+
+    Returns:
+        {nome: {'baseline': s, 'current': s, 'ratio': atual/baseline, 'verdict': 'regression'|'faster'|'same'}}
+    """
+    comparison = {}
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        before, after = previous['seconds']['median'], current['seconds']['median']
+        ratio = after / before if before else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'regression'
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        comparison[name] = {'baseline': before, 'current': after, 'ratio': round(ratio, 4), 'verdict': verdict}
+    return comparison
+
+
+def print_report(results, comparison=None):
+    print(f"\nBenchmarks - escala {results['scale']} (seed {results['seed']}, commit {results['environment']['commit']})")
+    print(f"{'benchmark':<12} {'mediana (s)':>12} {'min (s)':>10} {'ms/op':>10}  {'vs baseline':>12}")
+    for name, bench in results['benchmarks'].items():
+        line = f"{name:<12} {bench['seconds']['median']:>12.4f} {bench['seconds']['min']:>10.4f} {bench['ms_per_op']:>10.2f}"
+        if comparison and name in comparison:
+            cmp = comparison[name]
+            flag = {'regression': '  << REGRESSÃO', 'faster': '  mais rápido', 'same': ''}[cmp['verdict']]
+            line += f"  {cmp['ratio']:>11.2f}x{flag}"
+        print(line)
+        top = sorted(bench['stages'].items(), key=lambda item: -item[1]['seconds'])[:4]
+        if top:
+            print("    " + ", ".join(f"{stage} {info['seconds']:.3f}s" for stage, info in top))
+
+
+def parse_overrides(values):
+    overrides = {}
+    for value in values or []:
+        key, sep, number = value.partition('=')
+        if not sep:
+            raise SystemExit(f"--set espera chave=valor (recebido: {value})")
+        overrides[key.strip()] = number.strip()
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do BC Turbo em bases sintéticas")
+    parser.add_argument('--scale', default='small', choices=list(SCALES))
+    parser.add_argument('--set', action='append', metavar='CHAVE=VALOR',
+                        help="sobrescreve um parâmetro da escala (ex: --set tdc_rows=100000)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help=f"lista separada por vírgula ({','.join(BENCHMARKS)})")
+    parser.add_argument('--data-dir', type=Path, help="pasta da base sintética (padrão: benchmarks/data/<escala>-<seed>)")
+    parser.add_argument('--regenerate', action='store_true', help="regera a base mesmo se já existir")
+    parser.add_argument('--output', type=Path, help="arquivo JSON de saída (padrão: benchmarks/results/<escala>-<data>.json)")
+    parser.add_argument('--baseline', type=Path, help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.10, help="variação tolerada antes de acusar regressão (0.10 = 10%%)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="sai com código 1 se houver regressão")
+    parser.add_argument('--log-level', default='ERROR')
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level)
+    selected = [name.strip() for name in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCH_FUNCS]
+    if unknown:
+        parser.error(f"benchmark desconhecido: {', '.join(unknown)}")
+
+    overrides = parse_overrides(args.set)
+    data_dir = args.data_dir or DEFAULT_DATA_DIR / f"{args.scale}-{args.seed}"
+    start = time.perf_counter()
+    base, folder = generate_db_folder(data_dir, args.scale, overrides, seed=args.seed, force=args.regenerate)
+    print(f"Base sintética em {folder} ({time.perf_counter() - start:.1f}s): "
+          f"{len(base.pfep)} PNs PFEP, {len(base.tdc)} linhas TDC, {len(base.nprc)} linhas NPRC, "
+          f"{sum(len(c) for c in base.tarifas.values())} tabelas de tarifa")
+
+    ctx = BenchContext(base, folder, args.seed)
+    profiler = profiling.Profiler(log_file=None)
+    results = {
+        'scale': args.scale,
+        'params': base.params,
+        'seed': args.seed,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'benchmarks': {},
+    }
+    for name in selected:
+        print(f"  {name}...", flush=True)
+        results['benchmarks'][name] = run_benchmark(name, ctx, args.repeat, profiler)
+
+    comparison = None
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if baseline.get('params') != results['params']:
+            print(f"Aviso: baseline gerado com outros parâmetros de escala ({baseline.get('scale')})")
+        comparison = compare(results, baseline, args.threshold)
+        results['comparison'] = {'baseline': str(args.baseline), 'threshold': args.threshold, 'benchmarks': comparison}
+
+    output = args.output or DEFAULT_RESULTS_DIR / f"{args.scale}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    print_report(results, comparison)
+    print(f"\nResultado salvo em {output}")
+    if args.fail_on_regression and comparison and any(c['verdict'] == 'regression' for c in comparison.values()):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
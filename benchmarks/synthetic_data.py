@@ -0,0 +1,362 @@
+"""
+Geradores de dados sintéticos para os benchmarks
+Montam uma pasta de database no mesmo formato lido pelo SAPLookup (PFEP, TDC, MDR, NPRC e
+Fluxos de Tarifa) em escala configurável, sem precisar da base real. A demanda do Viajante
+é sorteada a partir dos cadastros versionados em Viajante/BD (PN x fornecedor com rota no FLUXO).
+
+Os mesmos parâmetros (escala + seed) geram sempre os mesmos arquivos; generate_db_folder
+reaproveita a pasta se o manifest bater.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Escalas pré-definidas; qualquer chave pode ser sobrescrita na linha de comando (--set chave=valor)
+SCALES = {
+    'small': {
+        'suppliers': 20, 'pns_per_supplier': 15, 'nprc_models': 2, 'mdrs': 60,
+        'tdc_rows': 2_000, 'destinos': 3, 'carriers': 3, 'fluxos': 3, 'routes_per_carrier': 40,
+        'viajante_pns': 40,
+    },
+    'medium': {
+        'suppliers': 150, 'pns_per_supplier': 40, 'nprc_models': 3, 'mdrs': 400,
+        'tdc_rows': 30_000, 'destinos': 5, 'carriers': 6, 'fluxos': 4, 'routes_per_carrier': 250,
+        'viajante_pns': 200,
+    },
+    'large': {
+        'suppliers': 600, 'pns_per_supplier': 80, 'nprc_models': 4, 'mdrs': 1_500,
+        'tdc_rows': 200_000, 'destinos': 8, 'carriers': 10, 'fluxos': 5, 'routes_per_carrier': 1_000,
+        'viajante_pns': 800,
+    },
+}
+
+MESES_TDC = ['JANEIRO', 'FEVEREIRO', 'MARÇO', 'ABRIL', 'MAIO', 'JUNHO',
+             'JULHO', 'AGOSTO', 'SETEMBRO', 'OUTUBRO', 'NOVEMBRO', 'DEZEMBRO']
+MESES_VIAJANTE = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+VEICULOS_TARIFA = ['CARRETA', 'TRUCK', 'TOCO', '3/4', 'VAN', 'FIORINO']
+# Fluxos na ordem em que entram conforme 'fluxos' cresce; o MILK RUN usa a planilha por FAIXA KM
+FLUXOS = ['01. PRINCIPAL', '03. LINE HAUL', '04. MILK RUN', '05. EXPRESSO', '06. SPOT DEDICADO', '07. REGIONAL']
+MODALIDADE_POR_FLUXO = {'01. PRINCIPAL': 'Principal', '03. LINE HAUL': 'Line Haul', '04. MILK RUN': 'Milk Run'}
+CIDADES = [('Betim', 'MG'), ('Contagem', 'MG'), ('Sete Lagoas', 'MG'), ('Campinas', 'SP'), ('Sorocaba', 'SP'),
+           ('Curitiba', 'PR'), ('Joinville', 'SC'), ('Caxias Do Sul', 'RS'), ('Resende', 'RJ'), ('Goiana', 'PE')]
+DESTINOS = ['1080', '1018', '2040', '3011', '3150', '4420', '5001', '6120']
+
+VIAJANTE_BD = Path(__file__).resolve().parent.parent / "Viajante" / "BD"
+
+
+def resolve_scale(name='small', overrides=None):
+    """Parâmetros da escala name com as chaves de overrides trocadas (valores inteiros)"""
+    if name not in SCALES:
+        raise ValueError(f"Escala desconhecida: {name} (use {', '.join(SCALES)})")
+    params = dict(SCALES[name])
+    for key, value in (overrides or {}).items():
+        if key not in params:
+            raise ValueError(f"Parâmetro de escala desconhecido: {key}")
+        params[key] = int(value)
+    return params
+
+
+class SyntheticBase:
+    """Tabelas sintéticas (DataFrames) de uma escala; write() grava a pasta de database"""
+
+    def __init__(self, params, seed=42):
+        self.params = dict(params)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.destinos = DESTINOS[:max(1, params['destinos'])]
+        self.fluxos = FLUXOS[:max(1, min(params['fluxos'], len(FLUXOS)))]
+        self.suppliers = self._make_suppliers()
+        self.mdr = self._make_mdr()
+        self.pfep = self._make_pfep()
+        self.nprc = self._make_nprc()
+        self.tdc = self._make_tdc()
+        self.tarifas = self._make_tarifas()
+
+    # ------------------------------------------------------------------ tabelas
+    def _make_suppliers(self):
+        n = self.params['suppliers']
+        cidades = [CIDADES[i % len(CIDADES)] for i in self.rng.integers(0, len(CIDADES), n)]
+        fluxos_pfep = [f for f in self.fluxos if f in MODALIDADE_POR_FLUXO] or ['01. PRINCIPAL']
+        return pd.DataFrame({
+            'COD SAP': [str(800_100_000 + i * 37) for i in range(n)],
+            'COD IMS': [str(10_000 + i * 7) for i in range(n)],
+            'Nome Fornecedor': [f"FORNECEDOR SINTETICO {i:04d}" for i in range(n)],
+            'Cidade Fornecedor': [c for c, _ in cidades],
+            'Estado Fornecedor': [uf for _, uf in cidades],
+            'Modalidade': [MODALIDADE_POR_FLUXO.get(fluxos_pfep[i % len(fluxos_pfep)], 'Principal')
+                           for i in range(n)],
+            'KM': self.rng.integers(20, 900, n),
+        })
+
+    def _make_mdr(self):
+        n = self.params['mdrs']
+        dims = self.rng.uniform(0.2, 1.4, (n, 3))
+        volume = np.round(dims.prod(axis=1), 4)
+        # ~3% das embalagens sem volume cadastrado (caminho "MDR sem volume" do QME)
+        volume[self.rng.random(n) < 0.03] = np.nan
+        return pd.DataFrame({
+            'MDR': [f"S{i:04d}" for i in range(n)],
+            'FONTE DIMENSÕES': self.rng.choice(['MEDIDO', 'CATALOGO', 'ESTIMADO'], n),
+            'MDR PESO': np.round(self.rng.uniform(1, 40, n), 2),
+            'VOLUME': volume,
+        })
+
+    def _make_pfep(self):
+        per = self.params['pns_per_supplier']
+        sup = self.suppliers.loc[self.suppliers.index.repeat(per)].reset_index(drop=True)
+        n = len(sup)
+        qme = self.rng.integers(1, 200, n)
+        return pd.DataFrame({
+            'Part Number': [str(400_000_000 + i * 13) for i in range(n)],
+            'Pecas por semana': self.rng.integers(10, 5_000, n),
+            'COD IMS': sup['COD IMS'].astype(int),
+            'COD SAP': sup['COD SAP'].astype(int),
+            'Nome Fornecedor': sup['Nome Fornecedor'],
+            'Cidade Fornecedor': sup['Cidade Fornecedor'],
+            'Estado Fornecedor': sup['Estado Fornecedor'],
+            'Modalidade': sup['Modalidade'],
+            'Metro Cúbico Semanal': np.round(self.rng.uniform(0.1, 30, n), 3),
+            'COD Embalagem': self.rng.choice(self.mdr['MDR'].to_numpy(), n),
+            'QME (Pecas/Embalagem)': qme,
+        })
+
+    def _make_nprc(self):
+        models = max(1, self.params['nprc_models'])
+        pns = self.pfep['Part Number']
+        # Cada PN aparece em 1..models linhas (modelos de veículo) - o QME soma as duplicatas
+        reps = self.rng.integers(1, models + 1, len(pns))
+        pn_rows = np.repeat(pns.to_numpy(), reps)
+        n = len(pn_rows)
+        frame = pd.DataFrame({
+            'PN': pn_rows,
+            'Plant': 'BETIM',
+            'Model': [f"MOD{m}" for m in self.rng.integers(1, models + 1, n)],
+        })
+        volumes = self.rng.integers(0, 20_000, (n, 12))
+        for month in range(12):
+            frame[str(month + 1)] = volumes[:, month]
+        return frame
+
+    def _make_tdc(self):
+        n = self.params['tdc_rows']
+        sup_idx = self.rng.integers(0, len(self.suppliers), n)
+        fluxo_names = [f.split('. ', 1)[-1] for f in self.fluxos]
+        return pd.DataFrame({
+            'Codigo IMS - Origem': self.suppliers['COD IMS'].to_numpy()[sup_idx].astype(int),
+            'Codigo IMS Destino': self.rng.choice(np.array(self.destinos, dtype=int), n),
+            'Transportadora': [f"TRANSP {c}" for c in self.rng.integers(0, self.params['carriers'], n)],
+            'Pedagio': np.round(self.rng.uniform(0, 300, n), 2),
+            'Cod. Rota': self.rng.integers(1, 5_000, n),
+            'Fluxo Viagem': self.rng.choice(fluxo_names, n),
+            'KM': self.suppliers['KM'].to_numpy()[sup_idx],
+            'Veiculo': self.rng.choice(VEICULOS_TARIFA, n),
+            'Trip': self.rng.choice(['RT', 'OW'], n, p=[0.7, 0.3]),
+            'CrossDock': self.rng.choice(['SIM', 'NAO'], n, p=[0.2, 0.8]),
+            'Ativacao': self.rng.integers(1, max(2, n // 4), n),
+            'Mês': self.rng.choice(MESES_TDC, n),
+        })
+
+    def _make_tarifas(self):
+        """{fluxo: {transportadora: DataFrame}} - rotas (origem x destino) com tarifa RT/OW por veículo"""
+        tarifas = {}
+        n = self.params['routes_per_carrier']
+        for fluxo in self.fluxos:
+            tarifas[fluxo] = {}
+            for c in range(self.params['carriers']):
+                if 'MILK RUN' in fluxo:
+                    tarifas[fluxo][f"TRANSP {c}"] = self._milk_run_table()
+                    continue
+                sup_idx = self.rng.integers(0, len(self.suppliers), n)
+                destinos = self.rng.choice(self.destinos, n)
+                frame = pd.DataFrame({
+                    'Nomeação': fluxo.split('. ', 1)[-1],
+                    'Fornecedor': self.suppliers['Nome Fornecedor'].to_numpy()[sup_idx],
+                    'Cidade de Coleta': [f"{c} - {uf}" for c, uf in zip(self.suppliers['Cidade Fornecedor'].to_numpy()[sup_idx],
+                                                                         self.suppliers['Estado Fornecedor'].to_numpy()[sup_idx])],
+                    'Local de Coleta': 'PLANTA',
+                    'Destino Materiais': [f"FIASA({d})" for d in destinos],
+                    'Distância': self.suppliers['KM'].to_numpy()[sup_idx],
+                })
+                base = frame['Distância'].to_numpy() * self.rng.uniform(3, 9, n)
+                for v_idx, veiculo in enumerate(VEICULOS_TARIFA):
+                    fator = 1.0 - v_idx * 0.12
+                    frame[(veiculo, 'RT')] = np.round(base * fator, 2)
+                    frame[(veiculo, 'OW')] = np.round(base * fator * 0.6, 2)
+                tarifas[fluxo][f"TRANSP {c}"] = frame
+        return tarifas
+
+    def _milk_run_table(self):
+        faixas = ['0 a 50', '51 a 100', '101 a 200', '201 a 400', 'acima de 400']
+        frame = pd.DataFrame({'FAIXA KM': faixas})
+        for v_idx, veiculo in enumerate(VEICULOS_TARIFA):
+            frame[veiculo] = np.round(self.rng.uniform(4, 12, len(faixas)) * (1.0 - v_idx * 0.1), 2)
+        return frame
+
+    # ------------------------------------------------------------------ gravação
+    def write(self, folder):
+        """Grava os arquivos Excel no layout que o SAPLookup/TarifaManager esperam"""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        # PFEP: cabeçalho na linha 10 (header=9); TDC/MDR na primeira linha; NPRC na aba NPRC_Monthly, linha 6
+        _write_with_preamble(self.pfep, folder / "PFEP_FIASA_SINTETICO.xlsx", 'PFEP', preamble_rows=9)
+        self.tdc.to_excel(folder / "TDC_SINTETICO.xlsx", index=False)
+        self.mdr.to_excel(folder / "BD_CADASTRO_MDR_SINTETICO.xlsx", index=False)
+        _write_with_preamble(self.nprc, folder / "NPRC_Geral_SINTETICO.xlsx", 'NPRC_Monthly', preamble_rows=5)
+
+        fluxos_dir = folder / "Fluxos"
+        for fluxo, carriers in self.tarifas.items():
+            fluxo_dir = fluxos_dir / fluxo
+            fluxo_dir.mkdir(parents=True, exist_ok=True)
+            for carrier, frame in carriers.items():
+                path = fluxo_dir / f"TARIFA_{carrier.replace(' ', '_')}.xlsx"
+                if 'MILK RUN' in fluxo:
+                    _write_milk_run(frame, path)
+                else:
+                    _write_two_level(frame, path)
+        return folder
+
+    # ------------------------------------------------------------------ cenários
+    def sample_sap_codes(self, count):
+        """Códigos SAP existentes (para lookup/QME), espalhados pela base"""
+        codes = self.suppliers['COD SAP'].to_numpy()
+        step = max(1, len(codes) // max(1, count))
+        return [str(c) for c in codes[::step][:count]]
+
+    def propose_file(self, cod_sap, share=0.6):
+        """Arquivo AS IS/TO BE (colunas PN, TO_BE_QME, TO_BE_MDR) para share dos PNs do fornecedor"""
+        pns = self.pfep.loc[self.pfep['COD SAP'].astype(str) == str(cod_sap)]
+        pns = pns.sample(frac=share, random_state=self.seed) if len(pns) > 1 else pns
+        return pd.DataFrame({
+            'PN': pns['Part Number'].to_numpy(),
+            'TO_BE_QME': (pns['QME (Pecas/Embalagem)'].to_numpy() * 1.5).astype(int),
+            'TO_BE_MDR': self.rng.choice(self.mdr['MDR'].to_numpy(), len(pns)),
+        })
+
+    def tariff_queries(self, count):
+        """Consultas (fluxo, origem, destino, veiculo, km, viagem) tiradas das próprias tabelas"""
+        queries = []
+        for i in range(count):
+            fluxo = self.fluxos[i % len(self.fluxos)]
+            veiculo = VEICULOS_TARIFA[i % len(VEICULOS_TARIFA)]
+            viagem = 'RT' if i % 3 else 'OW'
+            carriers = list(self.tarifas[fluxo].values())
+            frame = carriers[i % len(carriers)]
+            if 'MILK RUN' in fluxo:
+                queries.append((fluxo, '', '', veiculo, int(self.rng.integers(10, 450)), viagem))
+                continue
+            row = frame.iloc[int(self.rng.integers(0, len(frame)))]
+            origem = row['Cidade de Coleta'].split('-')[0].strip()
+            destino = row['Destino Materiais'][-5:-1]
+            queries.append((fluxo, origem, destino, veiculo, int(row['Distância']), viagem))
+        return queries
+
+
+def viajante_demand(n_pns, seed=42, bd_folder=VIAJANTE_BD):
+    """
+    Demanda [Mês, COD FORNECEDOR, DESENHO, QTDE] com n_pns desenhos reais do BD_CADASTRO_PN
+    de fornecedores que têm rota no FLUXO (12 meses, quantidades sorteadas).
+    Retorna (demanda_df, cod_fornecedor_principal, cod_destino).
+    """
+    rng = np.random.default_rng(seed)
+    fluxo = pd.read_excel(Path(bd_folder) / "FLUXO.xlsx")
+    fluxo = fluxo[pd.to_numeric(fluxo['COD FORNECEDOR'], errors='coerce').notna()]
+    cod_destino = str(fluxo['COD DESTINO'].mode().iloc[0])
+    fornecedores = set(pd.to_numeric(fluxo.loc[fluxo['COD DESTINO'].astype(str) == cod_destino,
+                                               'COD FORNECEDOR']).astype('int64'))
+
+    pn = pd.read_excel(Path(bd_folder) / "BD_CADASTRO_PN.xlsx", sheet_name='BD',
+                       usecols=['CÓD. FORNECEDOR', 'DESENHO', 'MDR'])
+    pn = pn.dropna(subset=['CÓD. FORNECEDOR', 'DESENHO', 'MDR'])
+    pn = pn[pd.to_numeric(pn['CÓD. FORNECEDOR'], errors='coerce').isin(fornecedores)]
+    pn = pn[pd.to_numeric(pn['DESENHO'], errors='coerce').notna()].drop_duplicates(['CÓD. FORNECEDOR', 'DESENHO'])
+    if pn.empty:
+        raise ValueError(f"Nenhum desenho com rota para o destino {cod_destino} em {bd_folder}")
+    pn = pn.sample(n=min(n_pns, len(pn)), random_state=seed)
+
+    fornecedor = pn['CÓD. FORNECEDOR'].astype('int64').to_numpy()
+    desenho = pn['DESENHO'].astype('int64').to_numpy()
+    demanda = pd.DataFrame({
+        'Mês': np.repeat(MESES_VIAJANTE, len(pn)),
+        'COD FORNECEDOR': np.tile(fornecedor, 12),
+        'DESENHO': np.tile(desenho, 12),
+        'QTDE': rng.integers(50, 15_000, 12 * len(pn)),
+    })
+    principal = str(pd.Series(fornecedor).mode().iloc[0])
+    return demanda, principal, cod_destino
+
+
+def generate_db_folder(folder, scale='small', overrides=None, seed=42, force=False):
+    """
+    Gera (ou reaproveita) a pasta de database sintética em folder
+
+    Returns:
+        (SyntheticBase, Path) - a base em memória (para montar cenários) e a pasta gravada
+    """
+    params = resolve_scale(scale, overrides)
+    folder = Path(folder)
+    manifest_path = folder / "manifest.json"
+    manifest = {'scale': scale, 'params': params, 'seed': seed}
+    base = SyntheticBase(params, seed=seed)
+
+    if not force and manifest_path.exists():
+        try:
+            if json.loads(manifest_path.read_text(encoding='utf-8')) == manifest:
+                return base, folder
+        except ValueError:
+            pass
+    if folder.exists():
+        shutil.rmtree(folder)
+    base.write(folder)
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    return base, folder
+
+
+def clear_parquet_caches(folder):
+    """Remove os caches Parquet e o snapshot gerados pela carga (para medir a carga a frio)"""
+    for pattern in ("*.parquet", "*.arrow"):
+        for path in Path(folder).rglob(pattern):
+            path.unlink()
+
+
+def _write_with_preamble(df, path, sheet_name, preamble_rows):
+    """Planilha com linhas de título antes do cabeçalho (como os arquivos PFEP/NPRC originais)"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=preamble_rows)
+        writer.sheets[sheet_name].cell(row=1, column=1, value=f"{sheet_name} - base sintética para benchmark")
+
+
+def _write_two_level(frame, path):
+    """Tarifa padrão: linha 1 com o veículo (só na primeira coluna do par), linha 2 com RT/OW"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('TARIFA')
+    top, bottom = [], []
+    for col in frame.columns:
+        if isinstance(col, tuple):
+            veiculo, viagem = col
+            top.append(veiculo if viagem == 'RT' else None)
+            bottom.append(viagem)
+        else:
+            top.append(None)
+            bottom.append(col)
+    ws.append(top)
+    ws.append(bottom)
+    for row in frame.itertuples(index=False):
+        ws.append([v.item() if hasattr(v, 'item') else v for v in row])
+    wb.save(path)
+
+
+def _write_milk_run(frame, path):
+    """Tarifa MILK RUN: título, linha com o tipo de viagem, cabeçalho 'FAIXA KM' + veículos, faixas"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('TARIFA')
+    ws.append(['TARIFA MILK RUN - base sintética'])
+    ws.append([None, 'ROUND TRIP'] + [None] * (len(frame.columns) - 2))
+    ws.append(list(frame.columns))
+    for row in frame.itertuples(index=False):
+        ws.append([v.item() if hasattr(v, 'item') else v for v in row])
+    wb.save(path)
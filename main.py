@@ -1,19 +1,34 @@
+import time
+_STARTED = time.perf_counter()
+
+from modules import startup
+startup.begin(_STARTED)
+
 import webview
 from api import Api
+from modules.logging_config import configure_logging, DEFAULT_LOG_FILE
+startup.mark('imports')
+
+# Log no console + logs/bc_turbo.log (nível: BC_TURBO_LOG_LEVEL, padrão INFO)
+configure_logging(log_file=DEFAULT_LOG_FILE)
 
-# Inicializa API
+# Inicializa API (pandas, openpyxl e o database ficam para o warm_up, depois da janela)
 api = Api()
+startup.mark('api')
 
 # Cria a janela
 window = webview.create_window(
-    'BC Turbo - System', 
-    'assets/index.html', 
+    'BC Turbo - System',
+    'assets/index.html',
     js_api=api,
-    width=1200, 
+    width=1200,
     height=800,
     resizable=True
 )
+window.events.loaded += lambda: startup.mark('page_loaded')
+startup.mark('window')
 
 if __name__ == '__main__':
     # debug=True permite clicar com botão direito -> Inspecionar Elemento (útil para dev)
-    webview.start(debug=False)
+    # api.warm_up roda numa thread assim que a GUI está no ar (tempos em logs/profiles.jsonl, kind 'startup')
+    webview.start(api.warm_up, debug=False)
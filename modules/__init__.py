@@ -1,11 +1,39 @@
 """
 BC Turbo App - Módulos de Processamento
+
+Os nomes exportados são importados no primeiro acesso (PEP 562): `import modules` e os
+módulos leves (profiling, job_manager, logging_config...) não carregam pandas/pyarrow/openpyxl,
+então a janela abre antes das bibliotecas pesadas (ver modules.startup).
 """
 
-from .sap_lookup import SAPLookup
-from .qme_calculator import QMECalculator
-from .file_manager import FileManager
-from .export_manager import ExportManager
-from .tarifa_manager import TarifaManager
+import importlib
+
+# nome exportado -> submódulo onde está
+_EXPORTS = {
+    'SAPLookup': 'sap_lookup',
+    'QMECalculator': 'qme_calculator',
+    'FileManager': 'file_manager',
+    'ExportManager': 'export_manager',
+    'TarifaManager': 'tarifa_manager',
+    'VehicleRegistry': 'vehicle_registry',
+    'get_vehicle_registry': 'vehicle_registry',
+    'JobManager': 'job_manager',
+    'JobCancelled': 'job_manager',
+    'SimulationSession': 'simulation_session',
+    'SessionManager': 'simulation_session',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ['SAPLookup', 'QMECalculator', 'FileManager', 'ExportManager', 'TarifaManager']
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
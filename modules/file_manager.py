@@ -1,10 +1,13 @@
 """
 Módulo para gerenciamento de importação de arquivos
 """
+import logging
 import os
 import pandas as pd
 import webview
 
+logger = logging.getLogger(__name__)
+
 
 class FileManager:
     def __init__(self):
@@ -29,11 +32,10 @@ class FileManager:
                 file_types=file_types
             )
             
-            # print(f"File dialog result: {result}")
             
             if result and len(result) > 0:
                 file_path = result[0]
-                print(f"Selected file: {file_path}")
+                logger.debug('Selected file: %s', file_path)
                 
                 try:
                     # Lê o arquivo com AS IS e TO BE
@@ -126,7 +128,7 @@ class FileManager:
                     return status, df
                     
                 except Exception as e:
-                    print(f"Error reading file: {str(e)}")
+                    logger.error('Error reading file: %s', e)
                     status = {
                         "status": "error",
                         "message": f"Erro ao ler arquivo: {str(e)}"
@@ -140,7 +142,7 @@ class FileManager:
             return status, None
             
         except Exception as e:
-            print(f"Error in import_asis_file: {str(e)}")
+            logger.error('Error in import_asis_file: %s', e)
             status = {
                 "status": "error",
                 "message": f"Erro ao abrir diálogo: {str(e)}"
@@ -165,11 +167,11 @@ class FileManager:
             
             if result and len(result) > 0:
                 folder_selected = result[0]
-                print(f"Folder selected: {folder_selected}")
+                logger.debug('Folder selected: %s', folder_selected)
                 return folder_selected, os.path.basename(folder_selected)
             
             return None, "Não Selecionado"
             
         except Exception as e:
-            print(f"Error selecting folder: {str(e)}")
+            logger.error('Error selecting folder: %s', e)
             return None, "Não Selecionado"
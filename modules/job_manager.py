@@ -0,0 +1,184 @@
+"""
+Módulo de jobs em segundo plano
+Executa cargas e processamentos longos fora da thread da ponte JS do pywebview;
+a interface recebe um job_id na hora e consulta status, progresso e tempos por fonte
+(ou recebe os eventos pelo callback on_event)
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do job quando o cancelamento foi pedido"""
+
+
+class Job:
+    """Estado de um job: status, progresso (%), mensagem, tempos por fonte e resultado"""
+
+    def __init__(self, kind, description=''):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = 'pending'  # pending | running | done | error | cancelled
+        self.progress = 0.0
+        self.message = ''
+        self.timings = {}        # {fonte: segundos}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._notify = None  # definido pelo JobManager: notify(job, event)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Ponto de cancelamento cooperativo: chame entre etapas do trabalho"""
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} cancelado")
+
+    def report(self, message, percent=None):
+        """Atualiza mensagem e progresso; também serve de ponto de cancelamento"""
+        with self._lock:
+            self.message = message
+            if percent is not None:
+                self.progress = max(0.0, min(100.0, float(percent)))
+        self.check_cancelled()
+        if self._notify:
+            self._notify(self, 'progress')
+
+    def record_timing(self, source, seconds):
+        with self._lock:
+            self.timings[source] = round(seconds, 3)
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "description": self.description,
+                "status": self.status,
+                "progress": round(self.progress, 1),
+                "message": self.message,
+                "timings": dict(self.timings),
+                "elapsed": elapsed,
+                "cancel_requested": self._cancel_event.is_set(),
+                "error": self.error,
+            }
+
+
+class JobManager:
+    """
+    Executor em segundo plano com registro de jobs por id
+
+    on_event: callback(evento) chamado a cada mudança de um job ('running', 'progress', 'done',
+        'error', 'cancelled'); o evento é o to_dict() do job com 'event' e, em 'done', 'result'
+    """
+
+    def __init__(self, max_workers=2, max_finished=50, on_event=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bc-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+        self.on_event = on_event
+
+    def submit(self, kind, func, *args, description='', **kwargs):
+        """
+        Agenda func(job, *args, **kwargs) e retorna o Job imediatamente.
+        O retorno de func vira job.result; JobCancelled marca o job como cancelado.
+        """
+        job = Job(kind, description)
+        job._notify = self._notify
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _notify(self, job, event):
+        if self.on_event is None:
+            return
+        payload = job.to_dict()
+        payload['event'] = event
+        if event == 'done':
+            payload['result'] = job.result
+        try:
+            self.on_event(payload)
+        except Exception as e:
+            logger.warning('job event callback failed (%s %s): %s', job.kind, job.id, e)
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            self._notify(job, 'cancelled')
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        self._notify(job, 'running')
+        try:
+            result = func(job, *args, **kwargs)
+            # Cancelado enquanto terminava: o resultado já está obsoleto e é descartado
+            job.check_cancelled()
+            job.result = result
+            job.progress = 100.0
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+            job.message = 'Cancelado'
+        except Exception as e:
+            job.status = 'error'
+            job.error = str(e)
+            logger.exception('Error in job %s (%s)', job.kind, job.id)
+        finally:
+            job.finished_at = time.time()
+        self._notify(job, job.status)
+
+    def _prune(self):
+        """Descarta os jobs finalizados mais antigos além de max_finished"""
+        finished = [j for j in self._jobs.values() if j.status in ('done', 'error', 'cancelled')]
+        excess = len(finished) - self.max_finished
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.created_at)[:excess]:
+                self._jobs.pop(job.id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return job.to_dict() if job else None
+
+    def cancel(self, job_id):
+        """Pede o cancelamento; o job para no próximo ponto de cancelamento"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        if job.status in ('pending', 'running'):
+            job._cancel_event.set()
+            return True
+        return False
+
+    def list_jobs(self, kind=None):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j.to_dict() for j in sorted(jobs, key=lambda j: j.created_at) if kind is None or j.kind == kind]
+
+    def shutdown(self, wait=False):
+        for job in list(self._jobs.values()):
+            job._cancel_event.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,87 @@
+"""
+Configuração do log da aplicação
+Os módulos usam logging.getLogger(__name__) com mensagens em formato lazy ('%s', valor):
+o texto só é montado quando o nível está ligado. Diagnósticos caros (amostras de valores,
+contagens extras) ficam atrás de logger.isEnabledFor(logging.DEBUG).
+
+Nível padrão INFO; BC_TURBO_LOG_LEVEL=DEBUG (ou Api.set_log_level) liga os diagnósticos.
+"""
+
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+LOG_LEVEL_ENV = 'BC_TURBO_LOG_LEVEL'
+DEFAULT_LOG_FILE = Path(__file__).resolve().parent.parent / "logs" / "bc_turbo.log"
+
+# Loggers dos pacotes da aplicação (api.py, modules/, Viajante/)
+APP_LOGGERS = ('api', 'modules', 'Viajante', 'DB', 'cadastros')
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """INFO/DEBUG saem só com a mensagem (como os prints); WARNING+ ganham nível e origem"""
+
+    def __init__(self):
+        super().__init__('%(message)s')
+        self._detailed = logging.Formatter('%(levelname)s [%(name)s] %(message)s')
+
+    def format(self, record):
+        if record.levelno >= logging.WARNING:
+            return self._detailed.format(record)
+        return super().format(record)
+
+
+def _parse_level(level):
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV) or logging.INFO
+    if isinstance(level, str):
+        name = level.strip().upper()
+        if name.isdigit():
+            return int(name)
+        value = logging.getLevelName(name)
+        if not isinstance(value, int):
+            raise ValueError(f"Nível de log inválido: {level}")
+        return value
+    return int(level)
+
+
+def set_level(level):
+    """Muda o nível dos loggers da aplicação em tempo de execução; retorna o nome do nível"""
+    value = _parse_level(level)
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(value)
+    return logging.getLevelName(value)
+
+
+def configure_logging(level=None, log_file=None, max_bytes=5 * 1024 * 1024, backup_count=3):
+    """
+    Liga o log no console (e opcionalmente em arquivo rotativo) para a aplicação
+
+    level: nome ou número do nível; sem valor usa BC_TURBO_LOG_LEVEL ou INFO
+    log_file: caminho do arquivo de log (None = só console)
+    Chamadas repetidas não duplicam handlers.
+    """
+    root = logging.getLogger()
+    if not any(getattr(h, '_bc_turbo', False) for h in root.handlers):
+        console = logging.StreamHandler()
+        console.setFormatter(_ConsoleFormatter())
+        console._bc_turbo = True
+        root.addHandler(console)
+
+        if log_file is not None:
+            try:
+                Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+                file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding='utf-8')
+            except OSError as e:
+                logging.getLogger(__name__).warning('log file disabled (%s): %s', log_file, e)
+            else:
+                file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+                file_handler._bc_turbo = True
+                root.addHandler(file_handler)
+
+    # Bibliotecas ficam em WARNING; o nível escolhido vale para os loggers da aplicação
+    if root.level == logging.NOTSET or root.level > logging.WARNING:
+        root.setLevel(logging.WARNING)
+    return set_level(level)
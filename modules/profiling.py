@@ -0,0 +1,218 @@
+"""
+Perfil de execução por etapa
+Cada execução (carga do database, lookup, simulação, exportação...) vira um RunProfile com
+o tempo e o número de chamadas de cada etapa e contadores (linhas, bytes...). Os perfis
+terminados vão para um JSONL rotativo (logs/profiles.jsonl) e os últimos ficam em memória
+para a Api (get_run_profiles).
+
+Código dos módulos marca etapas sem receber o perfil como parâmetro:
+
+    with profiling.stage('tariff'):
+        ...
+    profiling.count('tdc_rows', len(df))
+
+Fora de uma execução (nenhum perfil ativo na thread) as marcações não fazem nada.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from .job_manager import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_FILE = Path(__file__).resolve().parent.parent / "logs" / "profiles.jsonl"
+
+_local = threading.local()
+
+
+def current():
+    """Perfil ativo na thread atual (ou None)"""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def stage(name):
+    """Mede a etapa no perfil ativo da thread; sem perfil ativo não mede nada"""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
+
+
+def count(name, value=1):
+    """Soma value no contador do perfil ativo da thread"""
+    profile = current()
+    if profile is not None:
+        profile.count(name, value)
+
+
+def add_stage(name, seconds, calls=1):
+    """Registra no perfil ativo uma etapa medida fora dele (ex: tempos do Viajante)"""
+    profile = current()
+    if profile is not None:
+        profile.add_stage(name, seconds, calls)
+
+
+class RunProfile:
+    """Tempos por etapa ({etapa: {seconds, calls}}), contadores e metadados de uma execução"""
+
+    def __init__(self, kind, meta=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = dict(meta or {})
+        self.status = None
+        self.error = None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.seconds = None
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds, calls=1):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self, status=None, error=None):
+        self.seconds = time.perf_counter() - self._start
+        if status is not None:
+            self.status = status
+        if error is not None:
+            self.error = error
+        if self.status is None:
+            self.status = 'success'
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "kind": self.kind,
+                "started_at": round(self.started_at, 3),
+                "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+                "status": self.status,
+                "error": self.error,
+                "meta": dict(self.meta),
+                "stages": {name: {"seconds": round(v["seconds"], 4), "calls": v["calls"]}
+                           for name, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class Profiler:
+    """
+    Abre execuções (run), grava os perfis terminados em JSONL rotativo e guarda os últimos
+
+    log_file: arquivo JSONL (None desliga a gravação); rotaciona em max_bytes com backup_count cópias
+    keep: quantos perfis ficam em memória para recent()
+    """
+
+    def __init__(self, log_file=DEFAULT_LOG_FILE, max_bytes=5 * 1024 * 1024, backup_count=3, keep=200):
+        self.log_file = Path(log_file) if log_file else None
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._logger = None
+        if self.log_file is not None:
+            self._load_recent()
+            self._logger = self._make_logger(max_bytes, backup_count)
+
+    def _make_logger(self, max_bytes, backup_count):
+        try:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(self.log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding='utf-8')
+        except OSError as e:
+            logger.warning('profile log disabled (%s): %s', self.log_file, e)
+            return None
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        profile_logger = logging.getLogger(f"bc_turbo.profiles.{id(self)}")
+        profile_logger.setLevel(logging.INFO)
+        profile_logger.propagate = False
+        profile_logger.addHandler(handler)
+        return profile_logger
+
+    def _load_recent(self):
+        """Recupera do JSONL os últimos perfis de execuções anteriores do app"""
+        if not self.log_file.exists():
+            return
+        try:
+            with open(self.log_file, encoding='utf-8') as f:
+                lines = deque(f, maxlen=self._recent.maxlen)
+        except OSError:
+            return
+        for line in lines:
+            try:
+                self._recent.append(json.loads(line))
+            except ValueError:
+                continue
+
+    @contextmanager
+    def run(self, kind, **meta):
+        """
+        Execução medida de ponta a ponta; dentro dela stage()/count() gravam neste perfil.
+        Se já houver uma execução ativa na thread (ex: calculate_qme dentro da simulação),
+        esta vira apenas uma etapa da execução externa.
+        """
+        outer = current()
+        if outer is not None:
+            with outer.stage(kind):
+                yield outer
+            return
+
+        profile = RunProfile(kind, meta)
+        _local.profile = profile
+        try:
+            yield profile
+        except JobCancelled:
+            profile.finish(status='cancelled')
+            raise
+        except BaseException as e:
+            profile.finish(status='error', error=f"{type(e).__name__}: {e}")
+            raise
+        else:
+            profile.finish()
+        finally:
+            _local.profile = None
+            self._record(profile)
+
+    def _record(self, profile):
+        data = profile.to_dict()
+        with self._lock:
+            self._recent.append(data)
+        if self._logger is not None:
+            try:
+                self._logger.info(json.dumps(data, ensure_ascii=False, default=str))
+            except Exception as e:
+                logger.warning('could not write profile %s: %s', profile.run_id, e)
+
+    def recent(self, limit=20, kind=None):
+        """Últimos perfis (mais recente primeiro), opcionalmente de um tipo"""
+        with self._lock:
+            profiles = list(self._recent)
+        if kind:
+            profiles = [p for p in profiles if p.get('kind') == kind]
+        profiles.reverse()
+        return profiles[:limit] if limit else profiles
@@ -2,16 +2,18 @@
 Módulo para cálculo de QME (AS IS e TO BE)
 """
 
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 class QMECalculator:
-    def __init__(self):
-        self.asis_data = None
-        self.last_results = None
+    """
+    Cálculo sem estado: o arquivo AS IS/TO BE e os resultados ficam na sessão de simulação
+    (ver SimulationSession), então várias simulações podem usar o mesmo calculador
+    """
     
-    def set_asis_data(self, data):
-        """Define os dados AS IS/TO BE carregados"""
-        self.asis_data = data
-    
-    def calculate(self, data, pfep_data=None, nprc_data=None, mdr_data=None):
+    def calculate(self, data, pfep_data=None, nprc_data=None, mdr_data=None, asis_data=None):
         """
         Calcula QME baseado nos dados TO BE (propose file) e AS IS (PFEP)
         
@@ -20,42 +22,29 @@ class QMECalculator:
             pfep_data: DataFrame com dados PFEP completos - fonte de AS IS data
             nprc_data: DataFrame com dados NPRC filtrados (opcional)
             mdr_data: DataFrame com dados MDR para lookup de volumes
+            asis_data: DataFrame do arquivo AS IS/TO BE importado (propose file) da sessão
             
         Returns:
             Dicionário com resultados da simulação
         """
-        # print("Dados recebidos:", data)
         
-        if self.asis_data is None:
+        if asis_data is None:
             return {
                 "status": "error",
                 "message": "Carregue o arquivo AS IS/TO BE antes de simular!"
             }
         
         # Log informações sobre os dados recebidos
-        print(f"\n{'='*60}")
-        print("QME CALCULATION STARTING")
-        print(f"{'='*60}")
-        print(f"PROPOSE file (TO BE data): {len(self.asis_data)} rows")
-        if pfep_data is not None:
-            print(f"PFEP data (AS IS source): {len(pfep_data)} total rows")
-        else:
-            print("PFEP data: Not provided")
-        if nprc_data is not None:
-            print(f"NPRC data available: {len(nprc_data)} rows")
-        else:
-            print("NPRC data: Not provided")
-        if mdr_data is not None:
-            print(f"MDR data (volume lookup): {len(mdr_data)} rows")
-        else:
-            print("MDR data: Not provided")
-        print(f"{'='*60}\n")
+        logger.debug('QME calculation: propose %s rows | PFEP %s | NPRC %s | MDR %s',
+                     len(asis_data),
+                     len(pfep_data) if pfep_data is not None else 'not provided',
+                     len(nprc_data) if nprc_data is not None else 'not provided',
+                     len(mdr_data) if mdr_data is not None else 'not provided')
         
         # STEP 1: Aggregate NPRC data by PN (sum monthly volumes for duplicate PNs)
         nprc_aggregated = {}
         if nprc_data is not None and 'PN' in nprc_data.columns:
-            print(f"Aggregating NPRC data by PN...")
-            print(f"  NPRC raw rows: {len(nprc_data)}")
+            logger.debug('Aggregating NPRC data by PN (%s raw rows)...', len(nprc_data))
             
             month_cols = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12']
             
@@ -85,18 +74,14 @@ class QMECalculator:
                 
                 nprc_aggregated[pn]['rows_aggregated'] += 1
             
-            # Check how many PNs had duplicates
-            duplicates = sum(1 for pn_data in nprc_aggregated.values() if pn_data['rows_aggregated'] > 1)
-            print(f"  NPRC unique PNs: {len(nprc_aggregated)}")
-            print(f"  PNs with duplicates (aggregated): {duplicates}")
-            
-            # Show example of aggregated PN
-            example_pn = next((pn_data for pn_data in nprc_aggregated.values() if pn_data['rows_aggregated'] > 1), None)
-            if example_pn:
-                print(f"\n  Example aggregated PN: {example_pn['PN']}")
-                print(f"    Rows aggregated: {example_pn['rows_aggregated']}")
-                print(f"    Total volume (all months): {sum(example_pn[col] for col in ['1','2','3','4','5','6','7','8','9','10','11','12'])}")
-            print()
+            # Diagnóstico das duplicatas: percorre todos os PNs, então só com DEBUG ligado
+            if logger.isEnabledFor(logging.DEBUG):
+                duplicates = sum(1 for pn_data in nprc_aggregated.values() if pn_data['rows_aggregated'] > 1)
+                logger.debug('NPRC unique PNs: %s | PNs with duplicates (aggregated): %s', len(nprc_aggregated), duplicates)
+                example_pn = next((pn_data for pn_data in nprc_aggregated.values() if pn_data['rows_aggregated'] > 1), None)
+                if example_pn:
+                    logger.debug('Example aggregated PN: %s (%s rows, total volume %s)', example_pn['PN'],
+                                 example_pn['rows_aggregated'], sum(example_pn[col] for col in month_cols))
         
         # STEP 2: Find PNs that exist in BOTH PFEP and NPRC (intersection)
         # This creates the BASE DATASET for calculations
@@ -106,31 +91,23 @@ class QMECalculator:
         
         if pfep_data is not None:
             pfep_pn_set = set(pfep_data['Part Number'].astype(str).str.strip().unique().tolist())
-            print(f"PFEP filtered PNs: {len(pfep_pn_set)}")
+            logger.debug('PFEP filtered PNs: %s', len(pfep_pn_set))
         
         if nprc_aggregated:
             nprc_pn_set = set(nprc_aggregated.keys())
-            print(f"NPRC aggregated PNs: {len(nprc_pn_set)}")
+            logger.debug('NPRC aggregated PNs: %s', len(nprc_pn_set))
         
         # Find intersection: PNs that exist in BOTH PFEP and NPRC
         matched_pns = pfep_pn_set.intersection(nprc_pn_set)
         
-        # print(f"\n{'='*60}")
-        # print(f"PFEP + NPRC INTERSECTION")
-        # print(f"{'='*60}")
-        # print(f"PNs in PFEP (filtered by SAP): {len(pfep_pn_set)}")
-        # print(f"PNs in NPRC (aggregated): {len(nprc_pn_set)}")
-        # print(f"PNs in BOTH (intersection): {len(matched_pns)}")
-        # print(f"Sample matched PNs: {list(matched_pns)[:10]}")
-        # print(f"{'='*60}\n")
         
         # STEP 3: Create propose file lookup for TO BE values
         propose_lookup = {}
         propose_pns_in_dataset = []
         propose_pns_not_in_dataset = []
         
-        if self.asis_data is not None:
-            for idx, row in self.asis_data.iterrows():
+        if asis_data is not None:
+            for idx, row in asis_data.iterrows():
                 pn = str(row.get('PN', '')).strip()
                 propose_lookup[pn] = {
                     'qme_tobe': row.get('TO_BE_QME', 0),
@@ -143,11 +120,6 @@ class QMECalculator:
                 else:
                     propose_pns_not_in_dataset.append(pn)
             
-            # print(f"Propose file analysis:")
-            # print(f"  Total PNs in propose file: {len(propose_lookup)}")
-            # print(f"  PNs found in PFEP+NPRC dataset: {len(propose_pns_in_dataset)} - {propose_pns_in_dataset}")
-            # print(f"  PNs NOT in dataset: {len(propose_pns_not_in_dataset)} - {propose_pns_not_in_dataset}")
-            # print()
 
         # STEP 3: Process ALL matched PNs (PFEP + NPRC intersection)
         results = []
@@ -249,9 +221,9 @@ class QMECalculator:
                         else:
                             # All rows have null/zero volume
                             if row_num <= 3:
-                                print(f"  WARNING: MDR AS IS '{mdr_asis}' found but all volume values are null/zero for PN {pn}")
+                                logger.warning("MDR AS IS '%s' found but all volume values are null/zero for PN %s", mdr_asis, pn)
                     elif row_num <= 3:  # Log first 3 PNs if MDR not found
-                        print(f"  WARNING: MDR AS IS '{mdr_asis}' not found in MDR database for PN {pn}")
+                        logger.warning("MDR AS IS '%s' not found in MDR database for PN %s", mdr_asis, pn)
                 
                 # Lookup TO BE volume using TO BE MDR
                 # Note: If PN not in propose file, mdr_tobe = mdr_asis, so this will get same volume
@@ -278,21 +250,15 @@ class QMECalculator:
                         else:
                             # All rows have null/zero volume
                             if row_num <= 3 and has_propose_data:
-                                print(f"  WARNING: MDR TO BE '{mdr_tobe}' found but all volume values are null/zero for PN {pn}")
+                                logger.warning("MDR TO BE '%s' found but all volume values are null/zero for PN %s", mdr_tobe, pn)
                     elif row_num <= 3 and has_propose_data:  # Only warn if PN has propose data
-                        print(f"  WARNING: MDR TO BE '{mdr_tobe}' not found in MDR database for PN {pn}")
+                        logger.warning("MDR TO BE '%s' not found in MDR database for PN %s", mdr_tobe, pn)
             
             # Debug logging for first PN to verify data retrieval
             if row_num == 1:
-                print(f"\n=== DEBUG: First PN Data Retrieval ===")
-                print(f"PN: {pn}")
-                print(f"Has propose data: {has_propose_data}")
-                print(f"QME AS IS: {qme_asis}, MDR AS IS: {mdr_asis}, Volume AS IS: {vol_asis_m3} m³")
-                print(f"QME TO BE: {qme_tobe}, MDR TO BE: {mdr_tobe}, Volume TO BE: {vol_tobe_m3} m³")
-                print(f"Sample monthly volume (Jan): {monthly_volumes.get('Jan', 0)}")
-                if not has_propose_data:
-                    print(f"⚠️  Note: PN not in propose file - TO BE uses AS IS values")
-                print(f"==========================================\n")
+                logger.debug('First PN %s (propose data: %s) | AS IS: QME %s, MDR %s, %s m³ | TO BE: QME %s, MDR %s, %s m³ | Jan volume: %s',
+                             pn, has_propose_data, qme_asis, mdr_asis, vol_asis_m3,
+                             qme_tobe, mdr_tobe, vol_tobe_m3, monthly_volumes.get('Jan', 0))
             
             # Calculate weekly M³ for AS IS and TO BE (per PN, per month)
             # Formula: ((Monthly_QTD / 4.4) / QME) × Volume_m³
@@ -395,33 +361,10 @@ class QMECalculator:
         total_asis_anual = sum(r['vol_asis'] for r in results) * 12
         total_tobe_anual = sum(r['vol_tobe'] for r in results) * 12
         
-        # print(f"\nMonthly Volume Totals (from NPRC):")
-        # for month in months:
-        #     print(f"  {month}: {monthly_volumes_total[month]:.0f}")
-        # print(f"  Total Annual: {total_qme_asis:.0f}\n")
-        
-        # print(f"\nMonthly M³ Totals:")
-        # print(f"  AS IS:")
-        # for month in months:
-        #     print(f"    {month}: {monthly_m3_asis_total[month]:.2f} m³")
-        # print(f"    Total Annual AS IS: {sum(monthly_m3_asis_total.values()):.2f} m³")
-        # print(f"  TO BE:")
-        # for month in months:
-        #     print(f"    {month}: {monthly_m3_tobe_total[month]:.2f} m³")
-        # print(f"    Total Annual TO BE: {sum(monthly_m3_tobe_total.values()):.2f} m³")
-        # print(f"    Saving M³ (12 months): {sum(monthly_m3_asis_total.values()) - sum(monthly_m3_tobe_total.values()):.2f} m³\n")
-        
         # Count PNs with propose data
         pns_with_propose = sum(1 for r in results if r.get('has_propose_data', False))
         pns_without_propose = len(results) - pns_with_propose
         
-        # print(f"\n{'='*60}")
-        # print(f"FINAL DATASET SUMMARY")
-        # print(f"{'='*60}")
-        # print(f"Total PNs in dataset (PFEP+NPRC intersection): {len(results)}")
-        # print(f"PNs with TO BE data (from propose file): {pns_with_propose}")
-        # print(f"PNs without TO BE data: {pns_without_propose}")
-        # print(f"{'='*60}\n")
         
         response = {
             "status": "success",
@@ -452,15 +395,4 @@ class QMECalculator:
             }
         }
         
-        self.last_results = response
         return response
-    
-    
-    
-    def get_last_results(self):
-        """Retorna os últimos resultados calculados"""
-        return self.last_results
-    
-    def has_data(self):
-        """Verifica se há dados AS IS carregados"""
-        return self.asis_data is not None
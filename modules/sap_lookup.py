@@ -1,22 +1,31 @@
 """
 Módulo para busca de dados SAP
 """
+import logging
 import pandas as pd
 from pathlib import Path
 import os
-import traceback
+import time
 from .tarifa_manager import TarifaManager
-  
+from . import profiling, snapshot, vehicle_registry
+
+logger = logging.getLogger(__name__)
+
+
 class SAPLookup:
-    def __init__(self, db_folder=None):
+    # Tabelas do database guardadas no snapshot (nome no arquivo -> atributo)
+    SNAPSHOT_TABLES = {'pfep': 'pfep_data', 'tdc': 'tdc_data', 'mdr': 'mdr_data', 'nprc': 'nprc_data'}
+
+    def __init__(self, db_folder=None, use_snapshot=True):
         self.db_folder = db_folder
+        self.use_snapshot = use_snapshot  # warm start pelo snapshot Arrow (modules.snapshot)
         self.sap_cache = {}
         self.pfep_data = None
         self.tdc_data = None
         self.mdr_data = None
         self.nprc_data = None
-        self.last_lookup_result = None  # Store last lookup result to reuse in calculations
-        self.tarifa_manager = TarifaManager(db_folder)  # Initialize Tarifa Manager
+        self.load_timings = {}  # {fonte: segundos} da última carga do database
+        self.tarifa_manager = TarifaManager(db_folder, fluxo_normalizer=self._normalize_fluxo)  # Initialize Tarifa Manager
     
     def _needs_parquet_conversion(self, excel_path, parquet_path):
         """Verifica se o arquivo Excel precisa ser convertido para Parquet"""
@@ -37,7 +46,7 @@ class SAPLookup:
     def _convert_to_parquet(self, excel_path, parquet_path, usecols, header_row, is_pfep=True):
         """Converte arquivo Excel para Parquet com limpeza de dados"""
         try:
-            print(f"  Converting to Parquet for faster loading...")
+            logger.info('Converting to Parquet for faster loading...')
             df = pd.read_excel(excel_path, usecols=usecols, engine='openpyxl', header=header_row)
             
             # Limpa os dados ANTES de salvar no Parquet
@@ -52,10 +61,10 @@ class SAPLookup:
                         pass
             
             df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-            print(f"  ✓ Parquet cache created")
+            logger.info('✓ Parquet cache created')
             return True
         except Exception as e:
-            print(f"  Warning: Parquet conversion failed ({e}), will use Excel")
+            logger.warning('Parquet conversion failed (%s), will use Excel', e)
             return False
     
     @staticmethod
@@ -134,7 +143,7 @@ class SAPLookup:
         for file in db_path.glob("*.xlsx"):
             filename = file.name.upper()
             if "PFEP" in filename and ("FIASA" in filename or "BETIM" in filename) and '~$' not in filename:
-                print(f"Loading PFEP file: {file.name}")
+                logger.info('Loading PFEP file: %s', file.name)
                 
                 # Define caminho do arquivo Parquet
                 parquet_path = file.with_suffix('.parquet')
@@ -147,11 +156,11 @@ class SAPLookup:
                     
                     # Tenta carregar do Parquet (100x mais rápido)
                     if parquet_path.exists():
-                        print(f"  Loading from Parquet cache (fast mode)...")
+                        logger.debug('Loading from Parquet cache (fast mode)...')
                         df = pd.read_parquet(parquet_path, engine='pyarrow')
                     else:
                         # Fallback para Excel se Parquet falhou
-                        print(f"  Loading from Excel (slow mode)...")
+                        logger.info('Loading from Excel (slow mode)...')
                         df = pd.read_excel(file, usecols=lambda x: x in pfep_columns, 
                                          engine='openpyxl', header=9)
                         df = self._clean_data(df, is_pfep=True)
@@ -159,7 +168,7 @@ class SAPLookup:
                     dataframes.append(df)
                     
                 except Exception as e:
-                    print(f"Error reading {file.name}: {e}")
+                    logger.error('Error reading %s: %s', file.name, e)
         
         # Procura arquivos .xlsm
         for file in db_path.glob("*.xlsm"):
@@ -167,7 +176,7 @@ class SAPLookup:
                 continue
             filename = file.name.upper()
             if "PFEP" in filename and ("FIASA" in filename or "BETIM" in filename):
-                print(f"Loading PFEP file: {file.name}")
+                logger.info('Loading PFEP file: %s', file.name)
                 
                 parquet_path = file.with_suffix('.parquet')
                 
@@ -177,10 +186,10 @@ class SAPLookup:
                                                 lambda x: x in pfep_columns, header_row=10, is_pfep=True)
                     
                     if parquet_path.exists():
-                        print(f"  Loading from Parquet cache (fast mode)...")
+                        logger.debug('Loading from Parquet cache (fast mode)...')
                         df = pd.read_parquet(parquet_path, engine='pyarrow')
                     else:
-                        print(f"  Loading from Excel (slow mode)...")
+                        logger.info('Loading from Excel (slow mode)...')
                         df = pd.read_excel(file, usecols=lambda x: x in pfep_columns, 
                                          engine='openpyxl', header=10)
                         df = self._clean_data(df, is_pfep=True)
@@ -188,12 +197,12 @@ class SAPLookup:
                     dataframes.append(df)
                     
                 except Exception as e:
-                    print(f"Error reading {file.name}: {e}")
+                    logger.error('Error reading %s: %s', file.name, e)
         
         if dataframes:
             self.pfep_data = pd.concat(dataframes, ignore_index=True)
             
-            print(f"Loaded {len(self.pfep_data)} rows from PFEP files")
+            logger.info('Loaded %s rows from PFEP files', len(self.pfep_data))
             return self.pfep_data
         
         return None
@@ -220,7 +229,7 @@ class SAPLookup:
         for file in db_path.glob("*TDC*.xlsx"):
             if '~$' in file.name:
                 continue
-            print(f"Loading TDC file: {file.name}")
+            logger.info('Loading TDC file: %s', file.name)
             
             parquet_path = file.with_suffix('.parquet')
             
@@ -230,21 +239,21 @@ class SAPLookup:
                                             lambda x: x in tdc_columns, header_row=0, is_pfep=False)
                 
                 if parquet_path.exists():
-                    print(f"  Loading from Parquet cache (fast mode)...")
+                    logger.debug('Loading from Parquet cache (fast mode)...')
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                 else:
-                    print(f"  Loading from Excel (slow mode)...")
+                    logger.info('Loading from Excel (slow mode)...')
                     df = pd.read_excel(file, usecols=lambda x: x in tdc_columns)
                     df = self._clean_data(df, is_pfep=False)
                 
                 dataframes.append(df)
                 
             except Exception as e:
-                print(f"Error reading {file.name}: {e}")
+                logger.error('Error reading %s: %s', file.name, e)
         
         if dataframes:
             self.tdc_data = pd.concat(dataframes, ignore_index=True)
-            print(f"Loaded {len(self.tdc_data)} rows from TDC files")
+            logger.info('Loaded %s rows from TDC files', len(self.tdc_data))
             return self.tdc_data
         
         return None
@@ -267,14 +276,14 @@ class SAPLookup:
         for file in db_path.glob("*BD_CADASTRO_MDR*.xlsx"):
             if '~$' in file.name:
                 continue
-            print(f"Loading MDR file: {file.name}")
+            logger.info('Loading MDR file: %s', file.name)
             
             parquet_path = file.with_suffix('.parquet')
             
             try:
                 if self._needs_parquet_conversion(file, parquet_path):
                     # Converte para parquet (header na linha 0 por padrão)
-                    print(f"  Converting to Parquet for faster loading...")
+                    logger.info('Converting to Parquet for faster loading...')
                     df = pd.read_excel(file, usecols=lambda x: x in mdr_columns, engine='openpyxl', header=0)
                     
                     # Limpa dados
@@ -286,31 +295,31 @@ class SAPLookup:
                                 pass
                     
                     df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-                    print(f"  ✓ Parquet cache created")
+                    logger.info('✓ Parquet cache created')
                 
                 if parquet_path.exists():
-                    print(f"  Loading from Parquet cache (fast mode)...")
+                    logger.debug('Loading from Parquet cache (fast mode)...')
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                 else:
-                    print(f"  Loading from Excel (slow mode)...")
+                    logger.info('Loading from Excel (slow mode)...')
                     df = pd.read_excel(file, usecols=lambda x: x in mdr_columns, engine='openpyxl', header=0)
                 
                 dataframes.append(df)
                 
             except Exception as e:
-                print(f"Error reading {file.name}: {e}")
+                logger.error('Error reading %s: %s', file.name, e)
         
         # Também procura arquivos .xlsm
         for file in db_path.glob("*BD_CADASTRO_MDR*.xlsm"):
             if '~$' in file.name:
                 continue
-            print(f"Loading MDR file: {file.name}")
+            logger.info('Loading MDR file: %s', file.name)
             
             parquet_path = file.with_suffix('.parquet')
             
             try:
                 if self._needs_parquet_conversion(file, parquet_path):
-                    print(f"  Converting to Parquet for faster loading...")
+                    logger.info('Converting to Parquet for faster loading...')
                     df = pd.read_excel(file, usecols=lambda x: x in mdr_columns, engine='openpyxl', header=0)
                     
                     for col in df.columns:
@@ -321,23 +330,23 @@ class SAPLookup:
                                 pass
                     
                     df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-                    print(f"  ✓ Parquet cache created")
+                    logger.info('✓ Parquet cache created')
                 
                 if parquet_path.exists():
-                    print(f"  Loading from Parquet cache (fast mode)...")
+                    logger.debug('Loading from Parquet cache (fast mode)...')
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                 else:
-                    print(f"  Loading from Excel (slow mode)...")
+                    logger.info('Loading from Excel (slow mode)...')
                     df = pd.read_excel(file, usecols=lambda x: x in mdr_columns, engine='openpyxl', header=0)
                 
                 dataframes.append(df)
                 
             except Exception as e:
-                print(f"Error reading {file.name}: {e}")
+                logger.error('Error reading %s: %s', file.name, e)
         
         if dataframes:
             self.mdr_data = pd.concat(dataframes, ignore_index=True)
-            print(f"Loaded {len(self.mdr_data)} rows from MDR files")
+            logger.info('Loaded %s rows from MDR files', len(self.mdr_data))
             return self.mdr_data
         
         return None
@@ -357,14 +366,14 @@ class SAPLookup:
         for file in db_path.glob("*NPRC_Geral*.xlsx"):
             if '~$' in file.name:
                 continue
-            print(f"Loading NPRC file: {file.name}")
+            logger.info('Loading NPRC file: %s', file.name)
             
             parquet_path = file.parent / (file.stem + "_NPRC_Monthly.parquet")
             
             try:
                 if self._needs_parquet_conversion(file, parquet_path):
                     # Converte para parquet - lê da linha 6 (header=5 para índice 0-based)
-                    print(f"  Converting to Parquet for faster loading...")
+                    logger.info('Converting to Parquet for faster loading...')
                     df = pd.read_excel(file, sheet_name='NPRC_Monthly', engine='openpyxl', header=5)
                     
                     # Remove colunas vazias (sem nome ou todas vazias)
@@ -384,13 +393,13 @@ class SAPLookup:
                                 pass
                     
                     df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-                    print(f"  ✓ Parquet cache created")
+                    logger.info('✓ Parquet cache created')
                 
                 if parquet_path.exists():
-                    print(f"  Loading from Parquet cache (fast mode)...")
+                    logger.debug('Loading from Parquet cache (fast mode)...')
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                 else:
-                    print(f"  Loading from Excel (slow mode)...")
+                    logger.info('Loading from Excel (slow mode)...')
                     df = pd.read_excel(file, sheet_name='NPRC_Monthly', engine='openpyxl', header=5)
                     df = df.dropna(axis=1, how='all')
                     df = df.loc[:, df.columns.notna()]
@@ -398,32 +407,32 @@ class SAPLookup:
                 dataframes.append(df)
                 
             except Exception as e:
-                print(f"Error reading {file.name}: {e}")
+                logger.error('Error reading %s: %s', file.name, e)
         
         # Também procura arquivos .xlsm
         for file in db_path.glob("*NPRC_Geral*.xlsm"):
             if '~$' in file.name:
                 continue
-            print(f"Loading NPRC file: {file.name}")
+            logger.info('Loading NPRC file: %s', file.name)
             
             parquet_path = file.parent / (file.stem + "_NPRC_Monthly.parquet")
             
             try:
                 if self._needs_parquet_conversion(file, parquet_path):
-                    print(f"  Converting to Parquet for faster loading...")
+                    logger.info('Converting to Parquet for faster loading...')
                     df = pd.read_excel(file, sheet_name='NPRC_Monthly', engine='openpyxl', header=5)
-                    print(f"  Raw Excel load: {len(df)} rows, {len(df.columns)} columns")
+                    logger.debug('Raw Excel load: %s rows, %s columns', len(df), len(df.columns))
                     
                     df = df.dropna(axis=1, how='all')
                     df = df.loc[:, df.columns.notna()]
-                    print(f"  After dropna: {len(df)} rows, {len(df.columns)} columns")
+                    logger.debug('After dropna: %s rows, %s columns', len(df), len(df.columns))
                     
                     # Limpa coluna PN para remover .0 postfix tratando como string
                     if 'PN' in df.columns:
                         df['PN'] = pd.to_numeric(df['PN'], errors='coerce').fillna(0).astype('Int64').astype(str).replace('0', '').replace('<NA>', '')
-                        print(f"  PN column cleaned: {df['PN'].head(10).tolist()}")
+                        logger.debug('PN column cleaned: %s', df['PN'].head(10).tolist())
                     else:
-                        print(f"  WARNING: PN column not found! Available columns: {df.columns.tolist()[:10]}")
+                        logger.warning('PN column not found! Available columns: %s', df.columns.tolist()[:10])
                     
                     for col in df.columns:
                         if df[col].dtype == 'object':
@@ -435,16 +444,16 @@ class SAPLookup:
                     # Remove rows where PN is empty or '0'
                     if 'PN' in df.columns:
                         df = df[df['PN'].notna() & (df['PN'] != '') & (df['PN'] != '0')]
-                        print(f"  After filtering empty PNs: {len(df)} rows")
+                        logger.debug('After filtering empty PNs: %s rows', len(df))
                     
                     df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-                    print(f"  ✓ Parquet cache created with {len(df)} rows")
+                    logger.info('✓ Parquet cache created with %s rows', len(df))
                 
                 if parquet_path.exists():
-                    print(f"  Loading from Parquet cache (fast mode)...")
+                    logger.debug('Loading from Parquet cache (fast mode)...')
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                 else:
-                    print(f"  Loading from Excel (slow mode)...")
+                    logger.info('Loading from Excel (slow mode)...')
                     df = pd.read_excel(file, sheet_name='NPRC_Monthly', engine='openpyxl', header=5)
                     df = df.dropna(axis=1, how='all')
                     df = df.loc[:, df.columns.notna()]
@@ -452,11 +461,11 @@ class SAPLookup:
                 dataframes.append(df)
                 
             except Exception as e:
-                print(f"Error reading {file.name}: {e}")
+                logger.error('Error reading %s: %s', file.name, e)
         
         if dataframes:
             self.nprc_data = pd.concat(dataframes, ignore_index=True)
-            print(f"Loaded {len(self.nprc_data)} rows from NPRC files")
+            logger.info('Loaded %s rows from NPRC files', len(self.nprc_data))
             return self.nprc_data
         
         return None
@@ -502,8 +511,6 @@ class SAPLookup:
                 pfep_result = cached['pfep_result']
                 cod_ims_for_tdc = cached['cod_ims_for_tdc']
                 nprc_result = cached['nprc_result']
-                # print(f"PFEP lookup for {filter_column}={cod_sap_str}: using cached results ({cached['pfep_count']} matches)")
-                # print(f"NPRC lookup: using cached results ({cached['nprc_count']} matches)")
             else:
                 # Busca nos dados PFEP
                 pfep_result = None
@@ -514,7 +521,6 @@ class SAPLookup:
                     mask = (self.pfep_data[filter_column] == cod_sap_str)
                     pfep_match = self.pfep_data[mask]
                     
-                    # print(f"PFEP lookup for {filter_column}={cod_sap_str}: found {len(pfep_match)} matches")
                     
                     if not pfep_match.empty:
                         pfep_result = pfep_match.iloc[0].to_dict()
@@ -539,30 +545,23 @@ class SAPLookup:
                     
                     related_pns = self.pfep_data[mask]['Part Number'].astype(str).str.strip().tolist()
                     
-                    # print(f"NPRC lookup: filtering by {len(related_pns)} PNs from PFEP...")
-                    # print(f"  Sample PNs from PFEP: {related_pns[:5]}")
                     
                     # Verifica se coluna PN existe no NPRC
                     if 'PN' in self.nprc_data.columns:
-                        # Mostra sample de PNs no NPRC para comparação
-                        nprc_pns_sample = self.nprc_data['PN'].astype(str).str.strip().unique().tolist()[:10]
-                        # print(f"  Sample PNs in NPRC database: {nprc_pns_sample}")
-                        
                         # Filtra NPRC pelos PNs encontrados
                         nprc_mask = self.nprc_data['PN'].astype(str).str.strip().isin(related_pns)
                         nprc_filtered_df = self.nprc_data[nprc_mask]
                         
-                        # print(f"NPRC lookup: found {len(nprc_filtered_df)} matches")
                         
-                        if nprc_filtered_df.empty and len(related_pns) > 0:
-                            # Debug: verifica se há match sem strip
+                        if nprc_filtered_df.empty and len(related_pns) > 0 and logger.isEnabledFor(logging.DEBUG):
+                            # Debug: verifica se há match sem strip (varre o NPRC inteiro, só com DEBUG ligado)
                             nprc_mask_no_strip = self.nprc_data['PN'].astype(str).isin(related_pns)
                             test_match = self.nprc_data[nprc_mask_no_strip]
-                            print(f"  DEBUG: Without strip: {len(test_match)} matches")
+                            logger.debug('Without strip: %s matches', len(test_match))
                             
                             # Debug: mostra tipos de dados
-                            print(f"  DEBUG: NPRC PN dtype: {self.nprc_data['PN'].dtype}")
-                            print(f"  DEBUG: PFEP Part Number dtype: {self.pfep_data['Part Number'].dtype}")
+                            logger.debug('NPRC PN dtype: %s', self.nprc_data['PN'].dtype)
+                            logger.debug('PFEP Part Number dtype: %s', self.pfep_data['Part Number'].dtype)
                         
                         if not nprc_filtered_df.empty:
                             # Retorna o DataFrame filtrado completo (não apenas primeira linha)
@@ -593,7 +592,7 @@ class SAPLookup:
 
             if is_milk_run_or_line_haul:
                 # TDC não é necessário para Milk Run / Line Haul — usa opções fixas
-                print(f"  Fluxo '{normalized_fluxo}' detectado: ignorando TDC, retornando opções fixas (Carreta / 74 m³)")
+                logger.debug("Fluxo '%s' detectado: ignorando TDC, retornando opções fixas (Carreta / 74 m³)", normalized_fluxo)
                 tdc_options = {
                     'Transportadora': [],          # lista vazia = campo de texto livre
                     'Veiculo': ['Carreta'],
@@ -630,12 +629,12 @@ class SAPLookup:
                                 'Veiculo': tdc_match['Veiculo'].dropna().unique().tolist() if 'Veiculo' in tdc_match.columns else [],
                                 'Fluxo': tdc_match['Fluxo Viagem'].dropna().unique().tolist() if 'Fluxo Viagem' in tdc_match.columns else [],
                                 'Trip': tdc_match['Trip'].dropna().unique().tolist() if 'Trip' in tdc_match.columns else [],
-                                'all_rows': tdc_match.to_dict('records')  # Todas as linhas para referência
+                                'all_rows': tdc_match  # Todas as linhas para referência (DataFrame, serializado direto pela Api)
                             }
                     else:
                         # Destino IMS não foi fornecido - sinaliza que é necessário
                         tdc_needs_destino = True
-                        print(f"TDC lookup: Destino IMS required. Only Origem={cod_ims_for_tdc} available.")
+                        logger.debug('TDC lookup: Destino IMS required. Only Origem=%s available.', cod_ims_for_tdc)
                         
                         # Busca CrossDock do TDC apenas com origem (para mostrar ao usuário)
                         mask = (self.tdc_data['Codigo IMS - Origem'].astype(str).str.strip() == cod_ims_for_tdc)
@@ -653,9 +652,6 @@ class SAPLookup:
                 if tdc_result:
                     combined_data.update(tdc_result)
                 
-                # Armazena o último resultado para reutilizar nos cálculos
-                self.last_lookup_result = combined_data
-                
                 result = {
                     "status": "success",
                     "data": combined_data,
@@ -684,8 +680,6 @@ class SAPLookup:
                 combined_data = {}
                 combined_data.update(pfep_result)
                 
-                self.last_lookup_result = combined_data
-                
                 result = {
                     "status": "success",
                     "data": combined_data,
@@ -715,50 +709,117 @@ class SAPLookup:
             return {"status": "error", "message": str(e)}
     
     def update_db_folder(self, db_folder, progress_callback=None):
-        """Atualiza o caminho da pasta de database e carrega os dados imediatamente"""
+        """
+        Atualiza o caminho da pasta de database e carrega os dados imediatamente
+        
+        Args:
+            db_folder: Pasta do database
+            progress_callback: callback(mensagem, percentual=None); pode levantar exceção para
+                interromper a carga entre fontes (cancelamento do job)
+        
+        Returns:
+            Dict {fonte: segundos} com o tempo de carga de cada fonte
+        """
         self.db_folder = db_folder
         # Limpa dados antigos
         self.pfep_data = None
         self.tdc_data = None
         self.mdr_data = None
         self.nprc_data = None
+        self.load_timings = {}
         
         # Notifica início do carregamento
         if progress_callback:
-            progress_callback("Preparing to load database files...")
-        
-        # Carrega dados imediatamente (inclui conversão para Parquet se necessário)
-        print("\n" + "="*60)
-        print("📂 Loading and preparing database files...")
-        print("="*60)
-        
-        if progress_callback:
-            progress_callback("Loading PFEP files...")
-        self._load_pfep_files()
+            progress_callback("Preparing to load database files...", 0)
         
-        if progress_callback:
-            progress_callback("Loading TDC files...")
-        self._load_tdc_files()
+        # Assinatura das planilhas antes de ler: se mudarem durante a carga, o snapshot não vale
+        signature = self._source_signature(db_folder) if self.use_snapshot else None
+        if signature is not None:
+            start = time.perf_counter()
+            with profiling.stage("load.Snapshot"):
+                restored = self._restore_snapshot(db_folder, signature)
+            if restored:
+                self.load_timings["Snapshot"] = round(time.perf_counter() - start, 3)
+                logger.info('✓ Database ready from snapshot in %.2fs', self.load_timings["Snapshot"])
+                if progress_callback:
+                    progress_callback("Database ready!", 100)
+                return self.load_timings
         
-        if progress_callback:
-            progress_callback("Loading MDR files...")
-        self._load_mdr_files()
+        # Carrega dados imediatamente (inclui conversão para Parquet se necessário)
+        logger.info('📂 Loading and preparing database files...')
         
-        if progress_callback:
-            progress_callback("Loading NPRC files...")
-        self._load_nprc_files()
+        # (fonte, mensagem, carga) - Tarifa inclui todos os fluxos
+        sources = [
+            ("PFEP", "Loading PFEP files...", self._load_pfep_files),
+            ("TDC", "Loading TDC files...", self._load_tdc_files),
+            ("MDR", "Loading MDR files...", self._load_mdr_files),
+            ("NPRC", "Loading NPRC files...", self._load_nprc_files),
+            ("Tarifa", "Loading Tarifa data (fluxos)...",
+             lambda: self.tarifa_manager.update_db_folder(db_folder, progress_callback)),
+        ]
+        for index, (source, message, load) in enumerate(sources):
+            if progress_callback:
+                progress_callback(message, index * 100 / len(sources))
+            start = time.perf_counter()
+            with profiling.stage(f"load.{source}"):
+                load()
+            self.load_timings[source] = round(time.perf_counter() - start, 3)
+            logger.info('%s loaded in %.2fs', source, self.load_timings[source])
         
-        # Load Tarifa data (all fluxos)
-        if progress_callback:
-            progress_callback("Loading Tarifa data (fluxos)...")
-        self.tarifa_manager.update_db_folder(db_folder, progress_callback)
+        if signature is not None:
+            if progress_callback:
+                progress_callback("Saving database snapshot...", 95)
+            start = time.perf_counter()
+            with profiling.stage("load.SnapshotWrite"):
+                self._write_snapshot(db_folder, signature)
+            self.load_timings["SnapshotWrite"] = round(time.perf_counter() - start, 3)
         
-        print("="*60)
-        print("✓ Database ready! You can now perform searches.")
-        print("="*60 + "\n")
+        logger.info('✓ Database ready! You can now perform searches.')
         
         if progress_callback:
-            progress_callback("Database ready!")
+            progress_callback("Database ready!", 100)
+        return self.load_timings
+    
+    def _source_signature(self, db_folder):
+        """Assinatura das planilhas da pasta (None se a pasta não existir)"""
+        try:
+            return snapshot.source_signature(db_folder)
+        except OSError as e:
+            logger.debug('No snapshot signature for %s: %s', db_folder, e)
+            return None
+    
+    def _restore_snapshot(self, db_folder, signature):
+        """Estado completo (tabelas, Tarifa, veículos) do snapshot; False se não houver snapshot válido"""
+        loaded = snapshot.read_snapshot(Path(db_folder) / snapshot.SNAPSHOT_FILE, signature)
+        if loaded is None:
+            return False
+        meta, tables = loaded
+        for name, attribute in self.SNAPSHOT_TABLES.items():
+            setattr(self, attribute, tables.get(name))
+        self.tarifa_manager.restore_state(db_folder, meta['tarifa'], tables)
+        vehicle_registry.restore_registry(meta.get('vehicles'), tables.get('vehicles'))
+        logger.debug('Snapshot restored: %s', {name: len(df) for name, df in tables.items()})
+        return True
+    
+    def _write_snapshot(self, db_folder, signature):
+        """Grava o estado recém-carregado para o próximo warm start; falha só desliga o snapshot"""
+        tables = {name: getattr(self, attribute) for name, attribute in self.SNAPSHOT_TABLES.items()
+                  if getattr(self, attribute) is not None}
+        if not tables and not self.tarifa_manager.fluxo_data:
+            return
+        path = Path(db_folder) / snapshot.SNAPSHOT_FILE
+        try:
+            tarifa_tables, tarifa_meta = self.tarifa_manager.snapshot_state()
+            tables.update(tarifa_tables)
+            meta = {'sources': signature, 'tarifa': tarifa_meta}
+            vehicles_df, vehicles_meta = vehicle_registry.registry_snapshot()
+            if vehicles_df is not None:
+                tables['vehicles'] = vehicles_df
+                meta['vehicles'] = vehicles_meta
+            size = snapshot.write_snapshot(path, tables, meta)
+            logger.info('✓ Database snapshot saved (%.1f MB)', size / 1e6)
+        except Exception as e:
+            logger.warning('Database snapshot not saved (%s): %s', path, e)
     
     def reload_data(self):
         """Recarrega os dados dos arquivos"""
@@ -779,13 +840,8 @@ class SAPLookup:
         self.tdc_data = None
         self.mdr_data = None
         self.nprc_data = None
-        self.last_lookup_result = None
         self.tarifa_manager.clear_data()  # Clear Tarifa data too
     
-    def get_last_lookup_result(self):
-        """Retorna o último resultado de lookup para reutilizar nos cálculos"""
-        return self.last_lookup_result
-    
     def get_pfep_data(self):
         """Retorna o DataFrame completo de dados PFEP"""
         return self.pfep_data
@@ -798,57 +854,44 @@ class SAPLookup:
         """Retorna o DataFrame completo de dados NPRC"""
         return self.nprc_data
     
-    def get_cached_nprc_data(self, cod_sap=None):
+    def get_cached_nprc_data(self, cod_sap):
         """Retorna o DataFrame filtrado de NPRC para um SAP code específico (se disponível)
         
         Args:
-            cod_sap: Código SAP/IMS para buscar no cache. Se None, retorna o primeiro disponível.
+            cod_sap: Código SAP/IMS buscado no cache pelo lookup_data
         
         Returns:
-            DataFrame filtrado de NPRC ou None
+            DataFrame filtrado de NPRC ou None (sem cache para este código)
         """
-        # Verifica se há dados em cache
-        if not self.sap_cache:
+        if not cod_sap or not self.sap_cache:
             return None
         
-        # Se cod_sap foi fornecido, busca cache específico
-        if cod_sap:
-            # Limpa e converte o código
-            if isinstance(cod_sap, (int, float)):
-                cod_sap_str = str(int(cod_sap)).strip()
-            else:
-                cod_sap_str = str(cod_sap).strip().replace('.0', '')
-            
-            cod_length = len(cod_sap_str)
-            
-            # Determina qual coluna foi usada baseado no tamanho
-            if cod_length < 7:
-                filter_column = "COD IMS"
-            elif 6 < cod_length < 10:
-                filter_column = "COD SAP"
-            else:
-                return None
-            
-            # Busca cache com a key específica
-            cache_key = f"{filter_column}_{cod_sap_str}"
-            if cache_key in self.sap_cache:
-                cached_data = self.sap_cache[cache_key]
-                nprc_result = cached_data.get('nprc_result')
-                if nprc_result is not None:
-                    print(f"✅ Using cached NPRC data for {filter_column}={cod_sap_str} ({len(nprc_result)} rows)")
-                    return nprc_result
-            else:
-                print(f"⚠️ No cached NPRC data found for {filter_column}={cod_sap_str}")
-                return None
+        # Limpa e converte o código
+        if isinstance(cod_sap, (int, float)):
+            cod_sap_str = str(int(cod_sap)).strip()
+        else:
+            cod_sap_str = str(cod_sap).strip().replace('.0', '')
         
-        # Fallback: pega o primeiro cache disponível
-        for cache_key, cached_data in self.sap_cache.items():
-            nprc_result = cached_data.get('nprc_result')
-            if nprc_result is not None:
-                print(f"⚠️ Using first available cached NPRC data (key: {cache_key})")
-                return nprc_result
+        cod_length = len(cod_sap_str)
         
-        return None
+        # Determina qual coluna foi usada baseado no tamanho
+        if cod_length < 7:
+            filter_column = "COD IMS"
+        elif 6 < cod_length < 10:
+            filter_column = "COD SAP"
+        else:
+            return None
+        
+        # Busca cache com a key específica
+        cache_key = f"{filter_column}_{cod_sap_str}"
+        cached_data = self.sap_cache.get(cache_key)
+        if cached_data is None:
+            logger.warning('⚠️ No cached NPRC data found for %s=%s', filter_column, cod_sap_str)
+            return None
+        nprc_result = cached_data.get('nprc_result')
+        if nprc_result is not None:
+            logger.debug('✅ Using cached NPRC data for %s=%s (%s rows)', filter_column, cod_sap_str, len(nprc_result))
+        return nprc_result
     
     def prepare_viajante_data(self, cod_sap, cidade_destino=None, veiculo=None):
         """
@@ -861,11 +904,11 @@ class SAPLookup:
             veiculo: Tipo de veículo selecionado (opcional)
             
         Returns:
-            Tuple (status_dict, dataframe)
+            Tuple (status_dict, dataframe) - quem chama guarda a demanda (sessão de simulação)
         """
         try:
-            # Get cached NPRC data (already filtered by PNs from lookup)
-            nprc_filtered = self.get_cached_nprc_data()
+            # NPRC já filtrado pelo lookup deste SAP (nunca o de outro fornecedor)
+            nprc_filtered = self.get_cached_nprc_data(cod_sap)
             
             if nprc_filtered is None or nprc_filtered.empty:
                 return {
@@ -906,7 +949,6 @@ class SAPLookup:
                     "message": "Nenhuma coluna de mês identificada no NPRC."
                 }, None
             
-            # print(f"Identified {len(month_columns)} month columns: {month_columns[:12]}")
             
             # Melt DataFrame from wide to long format
             # PN stays as identifier, month columns become (Mês, QTDE) pairs
@@ -952,11 +994,6 @@ class SAPLookup:
             # Sort by month and DESENHO
             demanda_df = demanda_df.sort_values(['Mês', 'DESENHO']).reset_index(drop=True)
             
-            # Store in self for later use (Viajante integration)
-            self.viajante_demanda_data = demanda_df
-            self.viajante_cidade_destino = cidade_destino
-            self.viajante_veiculo = veiculo
-            
             # Determine save path: Viajante/Demandas/ folder
             # Try to find Viajante folder relative to workspace
             workspace_path = None
@@ -981,9 +1018,9 @@ class SAPLookup:
             # Ensure folder exists
             try:
                 demandas_folder.mkdir(parents=True, exist_ok=True)
-                print(f"  Ensured folder exists: {demandas_folder}")
+                logger.debug('Ensured folder exists: %s', demandas_folder)
             except Exception as e:
-                print(f"  Warning: Could not create folder {demandas_folder}: {e}")
+                logger.warning('Could not create folder %s: %s', demandas_folder, e)
             
             # Generate filename (no timestamp - one file per SAP, gets overwritten)
             filename = f"Demanda_{cod_sap_str}.xlsx"
@@ -992,20 +1029,16 @@ class SAPLookup:
             # Save to Excel with error handling
             try:
                 demanda_df.to_excel(file_path, index=False, engine='openpyxl')
-                print(f"\n✓ Viajante demand file SAVED successfully!")
-                print(f"  File path: {file_path}")
-                print(f"  File exists: {file_path.exists()}")
-                print(f"  File size: {file_path.stat().st_size if file_path.exists() else 'N/A'} bytes")
+                logger.info('✓ Viajante demand file saved: %s', file_path)
             except Exception as e:
-                print(f"\n❌ Error saving file: {e}")
-                traceback.print_exc()
+                logger.exception('❌ Error saving file: %s', e)
                 return {
                     "status": "error",
                     "message": f"Erro ao salvar arquivo: {str(e)}"
                 }, None
             
-            print(f"  Total rows: {len(demanda_df)}")
-            print(f"  Unique PNs (DESENHO): {demanda_df['DESENHO'].nunique()}")
+            unique_pns = int(demanda_df['DESENHO'].nunique())
+            logger.debug('Total rows: %s | Unique PNs (DESENHO): %s', len(demanda_df), unique_pns)
             
             # Show months with proper ordering (Jan, Feb, Mar...)
             month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
@@ -1013,42 +1046,25 @@ class SAPLookup:
             unique_months = demanda_df['Mês'].unique().tolist()
             sorted_months = [m for m in month_order if m in unique_months]
             
-            # print(f"  Months covered: {sorted_months}")
-            # print(f"  Sample data:")
-            # print(demanda_df.head(10).to_string(index=False))
             
             return {
                 "status": "success",
                 "message": f"Arquivo de demanda criado com {len(demanda_df)} registros",
                 "file_path": str(file_path),
                 "total_rows": len(demanda_df),
-                "unique_pns": int(demanda_df['DESENHO'].nunique()),
+                "unique_pns": unique_pns,
                 "months": sorted_months,
                 "cidade_destino": cidade_destino,
                 "veiculo": veiculo
             }, demanda_df
             
         except Exception as e:
-            print(f"Error in prepare_viajante_data: {str(e)}")
-          
-            traceback.print_exc()
+            logger.exception('Error in prepare_viajante_data: %s', e)
             return {
                 "status": "error",
                 "message": f"Erro ao preparar dados Viajante: {str(e)}"
             }, None
     
-    def get_viajante_demanda_data(self):
-        """Retorna o DataFrame de demanda preparado para Viajante (se disponível)"""
-        return getattr(self, 'viajante_demanda_data', None)
-    
-    def get_viajante_parameters(self):
-        """Retorna os parâmetros armazenados para integração com Viajante"""
-        return {
-            'demanda_data': getattr(self, 'viajante_demanda_data', None),
-            'cidade_destino': getattr(self, 'viajante_cidade_destino', None),
-            'veiculo': getattr(self, 'viajante_veiculo', None)
-        }
-    
     # ==================== Tarifa Management Methods ====================
     
     def get_available_fluxos(self):
@@ -1059,6 +1075,10 @@ class SAPLookup:
         """Retorna DataFrame de um fluxo específico"""
         return self.tarifa_manager.get_fluxo_data(fluxo_name)
     
+    def resolve_tarifa_fluxo(self, fluxo):
+        """Resolve o fluxo do TDC/PFEP (ex: 'Line Haul') para a pasta de Tarifa correspondente"""
+        return self.tarifa_manager.resolve_fluxo(fluxo)
+    
     def calculate_tariff(self, fluxo_name, origem, destino, veiculo, km_value, viagem=None):
         """
         Calcula a melhor tarifa baseada nos parâmetros fornecidos
@@ -1077,3 +1097,29 @@ class SAPLookup:
         return self.tarifa_manager.calculate_tariff(
             fluxo_name, origem, destino, veiculo, km_value, viagem
         )
+    
+    def quote_tariffs(self, fluxo_name, origem, destino, veiculo, km_value, viagens=None):
+        """
+        Cotação completa (todas as transportadoras × RT/OW) em uma única passada
+        
+        Args:
+            fluxo_name: Nome do fluxo (ex: "01. PRINCIPAL")
+            origem: Cidade de origem
+            destino: Cidade de destino
+            veiculo: Tipo de veículo
+            km_value: Distância em KM
+            viagens: Lista de tipos de viagem (ex: ['RT', 'OW']) - None = todos
+        
+        Returns:
+            Dict com a matriz de cotações, melhor opção por viagem e comparação por transportadora
+        """
+        with profiling.stage('tariff'):
+            return self.tarifa_manager.quote_tariffs(
+                fluxo_name, origem, destino, veiculo, km_value, viagens
+            )
+    
+    def get_best_carriers(self, fluxo_name, origem, destino, veiculo, viagem=None, km_value=None):
+        """Melhor e segunda melhor transportadora da rota (matriz pré-calculada do fluxo)"""
+        return self.tarifa_manager.get_best_carriers(
+            fluxo_name, origem, destino, veiculo, viagem, km_value
+        )
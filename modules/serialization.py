@@ -0,0 +1,121 @@
+"""
+Serialização JSON das respostas para a interface
+Gera o JSON numa passada direto das estruturas Python/NumPy/pandas, com NaN/Inf/NaT -> null,
+sem a cópia recursiva que o clean_nan_values fazia. Usa o orjson quando instalado e um
+encoder em Python puro (mesma saída) quando não.
+"""
+
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson >= 3.9: JSON já pronto (ex: DataFrame.to_json) entra sem ser decodificado
+_FRAGMENT = getattr(orjson, 'Fragment', None) if orjson is not None else None
+
+ENCODER = 'orjson' if orjson is not None else 'json'
+
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _frame_json(df):
+    """DataFrame como lista de registros em JSON (encoder C do pandas, NaN -> null)"""
+    return df.to_json(orient='records', date_format='iso', date_unit='s', double_precision=15, force_ascii=False)
+
+
+def _default(obj):
+    """Tipos que o orjson não serializa sozinho"""
+    if isinstance(obj, pd.DataFrame):
+        if _FRAGMENT is not None and obj.columns.is_unique:
+            return _FRAGMENT(_frame_json(obj))
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _float(value):
+    if math.isnan(value) or math.isinf(value):
+        return 'null'
+    return float.__repr__(value)
+
+
+def _iterencode(obj, parts):
+    """Encoder em Python puro usado sem orjson (uma passada, escreve em parts)"""
+    if obj is None or obj is True or obj is False:
+        parts.append('null' if obj is None else ('true' if obj else 'false'))
+    elif isinstance(obj, str):
+        parts.append(_encode_str(obj))
+    elif isinstance(obj, float):
+        parts.append(_float(obj))
+    elif isinstance(obj, int):
+        parts.append(int.__repr__(obj))
+    elif isinstance(obj, dict):
+        parts.append('{')
+        first = True
+        for key, value in obj.items():
+            if not first:
+                parts.append(',')
+            first = False
+            if not isinstance(key, str):
+                key = _json_key(key)
+            parts.append(_encode_str(key))
+            parts.append(':')
+            _iterencode(value, parts)
+        parts.append('}')
+    elif isinstance(obj, (list, tuple)):
+        parts.append('[')
+        for index, value in enumerate(obj):
+            if index:
+                parts.append(',')
+            _iterencode(value, parts)
+        parts.append(']')
+    elif isinstance(obj, pd.DataFrame) and obj.columns.is_unique:
+        parts.append(_frame_json(obj))
+    elif isinstance(obj, np.ndarray):
+        _iterencode(obj.tolist(), parts)
+    elif isinstance(obj, np.floating):
+        parts.append(_float(float(obj)))
+    else:
+        _iterencode(_default(obj), parts)
+
+
+def _json_key(key):
+    """Chaves não-string como no json.dumps (1 -> '1', None -> 'null', True -> 'true')"""
+    if isinstance(key, np.generic):
+        key = key.item()
+    if key is None or key is True or key is False:
+        return 'null' if key is None else ('true' if key else 'false')
+    if isinstance(key, float):
+        return _float(key)
+    return str(key)
+
+
+def dumps(obj):
+    """
+    Serializa obj para uma string JSON válida para o JSON.parse do navegador
+
+    Aceita dict/list aninhados com escalares NumPy, Timestamps, NaN/NaT/NA e DataFrames
+    (viram lista de registros).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    parts = []
+    _iterencode(obj, parts)
+    return ''.join(parts)
@@ -0,0 +1,129 @@
+"""
+Sessões de simulação
+Cada sessão guarda as entradas e os resultados intermediários de uma simulação (lookup,
+arquivo AS IS/TO BE, demanda do Viajante, resultados do Viajante e do QME).
+Os dados de referência (PFEP, TDC, MDR, NPRC, Tarifa, veículos) continuam no SAPLookup e
+são apenas lidos, então simulações em sessões diferentes podem rodar em paralelo.
+"""
+
+import threading
+import time
+import uuid
+
+DEFAULT_SESSION_ID = 'default'
+
+
+class SimulationSession:
+    """Entradas e intermediários de uma simulação; os DataFrames guardados não são alterados"""
+
+    def __init__(self, session_id=None, parent_id=None):
+        self.id = session_id or uuid.uuid4().hex[:12]
+        self.parent_id = parent_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.job_id = None            # simulação em andamento nesta sessão
+
+        # Entradas
+        self.lookup_result = None     # dados PFEP+TDC do último lookup SAP
+        self.asis_data = None         # arquivo AS IS/TO BE importado
+        self.demanda_data = None      # demanda preparada para o Viajante
+        self.cidade_destino = None
+        self.veiculo = None
+
+        # Resultados
+        self.viajante_results = None
+        self.qme_results = None
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def fork(self):
+        """
+        Nova sessão com as mesmas entradas (referências, sem cópia) e sem resultados.
+        Usada pelos jobs: a simulação roda sobre um retrato das entradas e o formulário
+        pode continuar mudando a sessão de origem.
+        """
+        child = SimulationSession(parent_id=self.id)
+        child.lookup_result = dict(self.lookup_result) if self.lookup_result else self.lookup_result
+        child.asis_data = self.asis_data
+        child.demanda_data = self.demanda_data
+        child.cidade_destino = self.cidade_destino
+        child.veiculo = self.veiculo
+        return child
+
+    def adopt_results(self, other):
+        """Copia as entradas derivadas e os resultados de uma sessão filha (fim do job)"""
+        self.demanda_data = other.demanda_data
+        self.cidade_destino = other.cidade_destino
+        self.veiculo = other.veiculo
+        self.viajante_results = other.viajante_results
+        self.qme_results = other.qme_results
+        self.touch()
+
+    def clear_results(self):
+        self.viajante_results = None
+        self.qme_results = None
+
+    def to_dict(self):
+        return {
+            "session_id": self.id,
+            "parent_id": self.parent_id,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "job_id": self.job_id,
+            "has_lookup": self.lookup_result is not None,
+            "has_asis": self.asis_data is not None,
+            "demanda_rows": len(self.demanda_data) if self.demanda_data is not None else 0,
+            "cidade_destino": self.cidade_destino,
+            "veiculo": self.veiculo,
+            "has_viajante_results": self.viajante_results is not None,
+            "has_qme_results": self.qme_results is not None,
+        }
+
+
+class SessionManager:
+    """
+    Registro de sessões por id
+    A sessão 'default' é a da interface e nunca é descartada; as demais são descartadas
+    (as menos usadas primeiro) quando passam de max_sessions
+    """
+
+    def __init__(self, max_sessions=20):
+        self._sessions = {DEFAULT_SESSION_ID: SimulationSession(DEFAULT_SESSION_ID)}
+        self._lock = threading.Lock()
+        self.max_sessions = max_sessions
+
+    def create(self, parent=None):
+        """Nova sessão vazia ou, com parent, um fork das entradas dela"""
+        session = parent.fork() if parent is not None else SimulationSession()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._prune()
+        return session
+
+    def get(self, session_id=None):
+        """Sessão pelo id; sem id retorna a 'default'. None se o id não existir"""
+        with self._lock:
+            session = self._sessions.get(session_id or DEFAULT_SESSION_ID)
+        if session is not None:
+            session.touch()
+        return session
+
+    def close(self, session_id):
+        if not session_id or session_id == DEFAULT_SESSION_ID:
+            return False
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def list_sessions(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [s.to_dict() for s in sorted(sessions, key=lambda s: s.created_at)]
+
+    def _prune(self):
+        excess = len(self._sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        candidates = [s for s in self._sessions.values() if s.id != DEFAULT_SESSION_ID and s.job_id is None]
+        for session in sorted(candidates, key=lambda s: s.last_used)[:excess]:
+            self._sessions.pop(session.id, None)
@@ -0,0 +1,142 @@
+"""
+Snapshot do database já preparado (warm start)
+Depois da primeira carga, as tabelas tipadas (PFEP, TDC, MDR, NPRC), as tabelas e índices de
+Tarifa e o cadastro de veículos vão para um único arquivo Arrow IPC na pasta do database. Nas
+aberturas seguintes o arquivo é mapeado em memória e o estado volta sem ler Excel/Parquet nem
+refazer as limpezas (_clean_data, consolidação das tarifas, matriz de transportadoras).
+
+Formato: MAGIC + tamanho do cabeçalho (8 bytes) + cabeçalho JSON + um stream Arrow IPC por
+tabela, alinhados em 64 bytes (offset/tamanho de cada um no cabeçalho).
+
+O snapshot só vale se a assinatura das planilhas de origem (caminho, tamanho e mtime), a
+SNAPSHOT_VERSION e as versões de pandas/pyarrow baterem; senão a carga normal é feita e o
+arquivo é regravado.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "bc_turbo_snapshot.arrow"
+# Mude quando o formato ou o preparo das tabelas mudar (snapshots antigos deixam de valer)
+SNAPSHOT_VERSION = 1
+
+MAGIC = b"BCTSNAP1"
+_ALIGN = 64
+SOURCE_SUFFIXES = ('.xlsx', '.xlsm', '.xls', '.csv')
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _is_source(path):
+    return path.suffix.lower() in SOURCE_SUFFIXES and not path.name.startswith('~$')
+
+
+def source_signature(db_folder):
+    """
+    [caminho relativo, tamanho, mtime_ns] das planilhas lidas na carga: arquivos da raiz da
+    pasta e, recursivamente, da pasta de Fluxos (Tarifa)
+    """
+    root = Path(db_folder)
+    files = []
+    for entry in root.iterdir():
+        if entry.is_file() and _is_source(entry):
+            files.append(entry)
+        elif entry.is_dir() and 'fluxos' in entry.name.lower():
+            files.extend(p for p in entry.rglob('*') if p.is_file() and _is_source(p))
+    signature = []
+    for path in files:
+        stat = path.stat()
+        signature.append([path.relative_to(root).as_posix(), stat.st_size, stat.st_mtime_ns])
+    return sorted(signature)
+
+
+def environment_key():
+    """Versões que mudam a forma como as tabelas voltam do Arrow"""
+    return {'version': SNAPSHOT_VERSION, 'pandas': pd.__version__, 'pyarrow': pa.__version__}
+
+
+def write_snapshot(path, tables, meta):
+    """
+    Grava {nome: DataFrame} e os metadados (JSON) num único arquivo
+
+    Escreve num temporário e troca no final: um snapshot pela metade nunca fica no lugar.
+    Returns:
+        Tamanho do arquivo em bytes
+    """
+    path = Path(path)
+    streams, entries, offset = [], {}, 0
+    for name, df in tables.items():
+        table = pa.Table.from_pandas(df, preserve_index=None)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+        entries[name] = {'offset': offset, 'length': buffer.size, 'rows': table.num_rows}
+        streams.append((offset, buffer))
+        offset = _aligned(offset + buffer.size)
+
+    header = json.dumps({**environment_key(), 'created_at': time.time(), 'meta': meta, 'tables': entries},
+                        ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for table_offset, buffer in streams:
+            f.seek(data_start + table_offset)
+            f.write(buffer)
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def read_snapshot(path, signature=None):
+    """
+    Mapeia o snapshot e devolve (meta, {nome: DataFrame})
+
+    signature: assinatura atual das fontes (source_signature); se não bater com a gravada,
+    ou o arquivo não existir/estiver corrompido, retorna None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        buffer = pa.memory_map(str(path), 'r').read_buffer()
+        if buffer.size < len(MAGIC) + 8 or buffer.slice(0, len(MAGIC)).to_pybytes() != MAGIC:
+            logger.warning('Snapshot inválido (formato): %s', path)
+            return None
+        header_size = int.from_bytes(buffer.slice(len(MAGIC), 8).to_pybytes(), 'little')
+        header = json.loads(buffer.slice(len(MAGIC) + 8, header_size).to_pybytes())
+    except (OSError, ValueError, pa.ArrowException) as e:
+        logger.warning('Snapshot ilegível (%s): %s', path, e)
+        return None
+
+    if any(header.get(key) != value for key, value in environment_key().items()):
+        logger.info('Snapshot de outra versão, refazendo a carga: %s', path)
+        return None
+    meta = header.get('meta', {})
+    if signature is not None and meta.get('sources') != signature:
+        logger.info('Planilhas alteradas desde o snapshot, refazendo a carga')
+        return None
+
+    data_start = _aligned(len(MAGIC) + 8 + header_size)
+    tables = {}
+    try:
+        for name, entry in header['tables'].items():
+            stream = buffer.slice(data_start + entry['offset'], entry['length'])
+            tables[name] = pa.ipc.open_stream(stream).read_all().to_pandas()
+    except (KeyError, ValueError, pa.ArrowException) as e:
+        logger.warning('Snapshot corrompido (%s): %s', path, e)
+        return None
+    return meta, tables
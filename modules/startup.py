@@ -0,0 +1,82 @@
+"""
+Tempo de abertura do app e orçamento de startup
+main.py marca as etapas desde o início do processo (imports, Api, janela, GUI no ar, página
+carregada); Api.warm_up fecha com o aquecimento das bibliotecas pesadas em segundo plano.
+O tempo até a janela aparecer ('gui') é comparado com o orçamento (BC_TURBO_STARTUP_BUDGET,
+em segundos; padrão DEFAULT_BUDGET) e um estouro vira warning no log.
+
+Só usa a biblioteca padrão: é importado antes de tudo no main.py.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BUDGET_ENV = 'BC_TURBO_STARTUP_BUDGET'
+DEFAULT_BUDGET = 1.5  # segundos do início do processo até a janela no ar
+BUDGET_MARK = 'gui'
+
+_lock = threading.Lock()
+_origin = None
+_marks = {}  # {etapa: segundos desde o início}
+
+
+def begin(origin=None):
+    """Início da contagem (perf_counter); main.py passa o instante da primeira linha"""
+    global _origin
+    with _lock:
+        _origin = time.perf_counter() if origin is None else origin
+        _marks.clear()
+
+
+def mark(name):
+    """Registra a etapa name (segundos desde begin); a primeira marcação de cada etapa vale"""
+    now = time.perf_counter()
+    with _lock:
+        if _origin is None or name in _marks:
+            return None
+        _marks[name] = round(now - _origin, 4)
+        return _marks[name]
+
+
+def marks():
+    with _lock:
+        return dict(_marks)
+
+
+def budget():
+    try:
+        return float(os.environ.get(BUDGET_ENV) or DEFAULT_BUDGET)
+    except ValueError:
+        return DEFAULT_BUDGET
+
+
+def stages():
+    """Duração de cada etapa (diferença para a marcação anterior), na ordem em que aconteceram"""
+    result, previous = {}, 0.0
+    for name, seconds in sorted(marks().items(), key=lambda item: item[1]):
+        result[name] = round(seconds - previous, 4)
+        previous = seconds
+    return result
+
+
+def report():
+    """
+    Resumo da abertura: marcações, orçamento e se a janela abriu dentro dele
+
+    Returns:
+        {"marks": {...}, "budget": s, "window_seconds": s|None, "within_budget": bool|None}
+    """
+    current = marks()
+    limit = budget()
+    window = current.get(BUDGET_MARK)
+    within = None if window is None else window <= limit
+    summary = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in current.items())
+    if within is False:
+        logger.warning('Startup over budget: window after %.2fs (budget %.2fs) - %s', window, limit, summary)
+    else:
+        logger.info('Startup: %s (budget %.2fs)', summary, limit)
+    return {"marks": current, "budget": limit, "window_seconds": window, "within_budget": within}
@@ -3,6 +3,7 @@ Módulo para gerenciamento de dados de Tarifa por Fluxo
 Processa arquivos Excel de diferentes tipos de fluxo e gera parquets para performance
 """
 
+import logging
 import pandas as pd
 import numpy as np
 import os
@@ -11,12 +12,25 @@ import unicodedata
 import openpyxl
 from pathlib import Path
 
+from .vehicle_registry import canonical_tariff_class
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
 
 class TarifaManager:
-    def __init__(self, db_folder=None):
+    def __init__(self, db_folder=None, fluxo_normalizer=None):
         self.db_folder = db_folder
+        self.fluxo_normalizer = fluxo_normalizer  # Ex: SAPLookup._normalize_fluxo (nomes canônicos)
+        self._fluxo_aliases = {}  # Dict: {alias normalizado: fluxo_name}
+        self._fluxo_resolve_cache = {}  # Dict: {valor normalizado: fluxo_name ou None}
         self.tarifa_base_folder = None
         self.fluxo_data = {}  # Dict: {fluxo_name: DataFrame}
+        self._geoship_lookup = None  # GeoshipTable normalizada (carregada uma vez por load_tarifa_data)
+        self._geoship_loaded = False
+        self.fluxo_dirs = {}  # Dict: {fluxo_name: pasta do fluxo (onde ficam os parquets)}
+        self.carrier_matrix = {}  # Dict: {fluxo_name: DataFrame melhor/segunda transportadora}
+        self._carrier_index = {}  # Dict: {fluxo_name: {(origem, destino, veiculo): [opções]}}
         
     def _parse_transporter_name(self, filename):
         """Extrai nome da transportadora do nome do arquivo"""
@@ -27,26 +41,7 @@ class TarifaManager:
     
     def _normalize_vehicle_name(self, name):
         """Normaliza nomes de veículos para padronização"""
-        if not name or not str(name).strip():
-            return None
-        clean_name = str(name).strip().upper()
-        if 'BITREM' in clean_name:
-            return 'BITREM'
-        if 'VANDERLEIA' in clean_name:
-            return 'VANDERLEIA'
-        if 'CARRETA' in clean_name:
-            return 'CARRETA'
-        if 'VAN' in clean_name or 'DUCATO' in clean_name:
-            return 'VAN'
-        if '3/4' in clean_name or '0.75' in clean_name:
-            return '3/4'
-        if 'TOCO' in clean_name:
-            return 'TOCO'
-        if 'TRUCK' in clean_name:
-            return 'TRUCK'
-        if 'FIORINO' in clean_name:
-            return 'FIORINO'
-        return clean_name
+        return canonical_tariff_class(name)
     
     def _normalize_text(self, text):
         """Remove acentos e normaliza texto"""
@@ -104,14 +99,14 @@ class TarifaManager:
                         break
                 
                 if header_row_idx == -1:
-                    print(f"  Skipping file {file_name}: Could not find 'FAIXA KM' header.")
+                    logger.debug("Skipping file %s: Could not find 'FAIXA KM' header.", file_name)
                     continue
 
                 rt_info_row_idx = header_row_idx - 1
                 data_start_row_idx = header_row_idx + 1
 
                 if rt_info_row_idx < 0 or data_start_row_idx >= len(full_df):
-                    print(f"  Skipping file {file_name}: Invalid structure around 'FAIXA KM' header.")
+                    logger.debug("Skipping file %s: Invalid structure around 'FAIXA KM' header.", file_name)
                     continue
 
                 # Carry over the trip type to all vehicles
@@ -174,14 +169,14 @@ class TarifaManager:
                                     'Chave': 'N/A & N/A'
                                 })
                         except Exception as inner_e:
-                            print(f"  Error processing vehicle column in {file_name}: {inner_e}")
+                            logger.error('Error processing vehicle column in %s: %s', file_name, inner_e)
                             continue
                     
                 if processed_rows:
                     all_melted_dfs.append(pd.DataFrame(processed_rows))
 
             except Exception as e:
-                print(f"  Error processing file {file_path} for 'MILK RUN': {e}")
+                logger.error("Error processing file %s for 'MILK RUN': %s", file_path, e)
                 continue
         
         return all_melted_dfs
@@ -217,7 +212,7 @@ class TarifaManager:
                 destino_indices = [i for i, col in enumerate(data_df.columns) if col == 'Destino']
 
                 if not origem_indices or not destino_indices:
-                    print(f"  Skipping file {file_name} due to missing 'Origem' or 'Destino' columns.")
+                    logger.debug("Skipping file %s due to missing 'Origem' or 'Destino' columns.", file_name)
                     continue
 
                 origem_idx = origem_indices[0]
@@ -243,7 +238,7 @@ class TarifaManager:
                                 distancia_min = int(match.group(1))
                                 distancia_max = int(match.group(2))
                             except Exception as e:
-                                print(f"  Erro ao converter Distancia em '{destino_full}': {e}")
+                                logger.error("Erro ao converter Distancia em '%s': %s", destino_full, e)
 
                     for col_idx, _ in enumerate(data_df.columns):
                         if col_idx == origem_idx or col_idx == destino_idx:
@@ -273,11 +268,80 @@ class TarifaManager:
                     all_melted_dfs.append(pd.DataFrame(processed_rows))
 
             except Exception as e:
-                print(f"  Error processing file {file_path} for 'FAIXA': {e}")
+                logger.error("Error processing file %s for 'FAIXA': %s", file_path, e)
                 continue
         
         return all_melted_dfs
     
+    def _read_sheet_values(self, file_path):
+        """Lê a planilha ativa em uma única passada (read-only) e devolve uma matriz 2D de valores"""
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = [tuple(row) for row in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+
+        width = max((len(row) for row in rows), default=0)
+        values = np.full((len(rows), width), None, dtype=object)
+        for r_idx, row in enumerate(rows):
+            values[r_idx, :len(row)] = row
+        return values
+
+    def _parse_spots_destinos(self, origens, destinos):
+        """Extrai destino limpo e faixa de distância da coluna Destino (vetorizado)"""
+        destinos = pd.Series(destinos, dtype=object)
+        origens = pd.Series(origens, dtype=object)
+        clean = pd.Series(pd.NA, index=destinos.index, dtype=object)
+        dist_min = pd.Series(pd.NA, index=destinos.index, dtype=object)
+        dist_max = pd.Series(pd.NA, index=destinos.index, dtype=object)
+
+        # Scenario 1: "PE 01 KM - 10 Km" or "MG 11-20"
+        # Scenario 2: "De 21 km a 30 km" -> Destino becomes the same as Origem
+        # Scenario 3: "BA acima 40 km"
+        # Scenario 4: "SE até 40 km"
+        scenarios = [
+            (r'^(.*?)\s*(\d+)\s*(?:km)?\s*-\s*(\d+)', None),
+            (r'()de\s*(\d+)\s*(?:a|-|até)\s*(\d+)', 'origem'),
+            (r'^(.*?)\s*acima (?:de)?\s*(\d+)()', 200.0),
+            (r'^(.*?)\s*até\s*()(\d+)', 1),
+        ]
+        for pattern, special in scenarios:
+            pending = dist_min.isna()
+            if not pending.any():
+                break
+            found = destinos[pending].str.extract(pattern, flags=re.IGNORECASE)
+            found = found[found.notna().all(axis=1)]
+            if found.empty:
+                continue
+            idx = found.index
+            if special == 'origem':
+                clean[idx] = origens[idx]
+            else:
+                clean[idx] = found[0].str.strip()
+            if special == 1:
+                dist_min[idx] = 1
+                dist_max[idx] = [int(v) for v in found[2]]
+            elif special == 200.0:
+                dist_min[idx] = [int(v) for v in found[1]]
+                dist_max[idx] = float(200)
+            else:
+                dist_min[idx] = [int(v) for v in found[1]]
+                dist_max[idx] = [int(v) for v in found[2]]
+
+        # If no distance range was found after all checks
+        unmatched = dist_min.isna()
+        clean[unmatched] = destinos[unmatched].str.split(' ').str[0].str.strip()
+        dist_min[unmatched] = 1
+        dist_max[unmatched] = 1
+
+        # Fallback: If parsing results in an empty destination, use Origem
+        empty = clean == ''
+        clean[empty] = origens[empty]
+
+        clean = clean.str.split(' ').str[0].str.strip()
+        clean = clean.str.split('(').str[0].str.strip()
+        return clean.tolist(), dist_min.tolist(), dist_max.tolist()
+
     def _process_spots_fluxo(self, fluxo_path, fluxo_name):
         """Processa arquivos do tipo SPOTS"""
         all_melted_dfs = []
@@ -287,13 +351,13 @@ class TarifaManager:
                 continue
             file_path = os.path.join(fluxo_path, file_name)
             try:
-                wb = openpyxl.load_workbook(file_path, data_only=True)
-                sheet = wb.active
+                values = self._read_sheet_values(file_path)
+                n_rows, n_cols = values.shape
                 motorista_cols = {}
                 last_vehicle = None
                 
-                for col_idx in range(1, sheet.max_column + 1):
-                    cell_val = sheet.cell(row=1, column=col_idx).value
+                for col_idx in range(n_cols):
+                    cell_val = values[0, col_idx] if n_rows > 0 else None
                     if cell_val and str(cell_val).strip():
                         vehicle_name = str(cell_val).strip()
                         if vehicle_name == '0.75':
@@ -302,7 +366,7 @@ class TarifaManager:
                             last_vehicle = vehicle_name
                     
                     if last_vehicle:
-                        motorista_val_raw = sheet.cell(row=3, column=col_idx).value
+                        motorista_val_raw = values[2, col_idx] if n_rows > 2 else None
                         if motorista_val_raw is not None:
                             try:
                                 motorista_clean = int(float(str(motorista_val_raw).strip()))
@@ -311,147 +375,178 @@ class TarifaManager:
                                 continue
 
                 header_map = {}
-                data_start_row, header_found_row = 1, -1
-                for r in range(1, min(10, sheet.max_row + 1)):
-                    if header_found_row != -1 and r > header_found_row:
-                        break
-                    for c in range(1, min(20, sheet.max_column + 1)):
-                        cell_val = str(sheet.cell(row=r, column=c).value or '').strip().lower()
+                data_start_row = 0
+                for r in range(min(9, n_rows)):
+                    for c in range(min(19, n_cols)):
+                        cell_val = str(values[r, c] or '').strip().lower()
                         if 'origem' in cell_val:
                             header_map['Origem'] = c
                         elif 'destino' in cell_val:
                             header_map['Destino'] = c
                     if 'Origem' in header_map or 'Destino' in header_map:
-                        header_found_row, data_start_row = r, r + 1
+                        data_start_row = r + 1
+                        break
                 
                 if 'Origem' not in header_map or 'Destino' not in header_map:
                     continue
-                
-                processed_rows = []
-                for row_idx in range(data_start_row, sheet.max_row + 1):
-                    origem = str(sheet.cell(row=row_idx, column=header_map['Origem']).value or '').strip()
-                    destino_raw = str(sheet.cell(row=row_idx, column=header_map['Destino']).value or '').strip()
-                    if not origem or not destino_raw:
-                        continue
 
-                    # Parse distance and destination
-                    distancia_min, distancia_max = None, None
-                    clean_destino = destino_raw
+                data = values[data_start_row:]
+                origens = np.array([str(v or '').strip() for v in data[:, header_map['Origem']]], dtype=object)
+                destinos = np.array([str(v or '').strip() for v in data[:, header_map['Destino']]], dtype=object)
+                keep = (origens != '') & (destinos != '')
+                if not keep.any() or not motorista_cols:
+                    continue
+                data, origens, destinos = data[keep], origens[keep], destinos[keep]
 
-                    # Scenario 1: "PE 01 KM - 10 Km" or "MG 11-20"
-                    match = re.search(r'^(.*?)\s*(\d+)\s*(?:km)?\s*-\s*(\d+)', destino_raw, re.IGNORECASE)
-                    if match:
-                        clean_destino = match.group(1).strip()
-                        distancia_min, distancia_max = int(match.group(2)), int(match.group(3))
-                    else:
-                        # Scenario 2: "De 21 km a 30 km" -> Destino becomes the same as Origem
-                        match = re.search(r'de\s*(\d+)\s*(?:a|-|até)\s*(\d+)', destino_raw, re.IGNORECASE)
-                        if match:
-                            distancia_min, distancia_max = int(match.group(1)), int(match.group(2))
-                            clean_destino = origem
-                        else:
-                            # Scenario 3: "BA acima 40 km"
-                            match = re.search(r'^(.*?)\s*acima (?:de)?\s*(\d+)', destino_raw, re.IGNORECASE)
-                            if match:
-                                clean_destino = match.group(1).strip()
-                                distancia_min, distancia_max = int(match.group(2)), float(200)
-                            else:
-                                # Scenario 4: "SE até 40 km"
-                                match = re.search(r'^(.*?)\s*até\s*(\d+)', destino_raw, re.IGNORECASE)
-                                if match:
-                                    clean_destino = match.group(1).strip()
-                                    distancia_min, distancia_max = 1, int(match.group(2))
-                    
-                    # If no distance range was found after all checks
-                    if distancia_min is None:
-                        clean_destino = clean_destino.split(' ')[0].strip()
-                        distancia_min = 1
-                        distancia_max = 1
+                clean_destinos, dist_min, dist_max = self._parse_spots_destinos(origens, destinos)
 
-                    # Fallback: If parsing results in an empty destination, use Origem
-                    if not clean_destino:
-                        clean_destino = origem
-                    
-                    clean_destino = clean_destino.split(' ')[0].strip()
-                    clean_destino = clean_destino.split('(')[0].strip()
+                # Tariff grid: rows x motorista columns, flattened row-major (row, then column)
+                col_indices = list(motorista_cols.keys())
+                tarifas = pd.Series(data[:, col_indices].ravel(), dtype=object)
+                filled = tarifas.notna() & (tarifas.astype(str).str.strip() != '')
+                tarifa_num = pd.to_numeric(tarifas.where(filled), errors='coerce').astype(float)
+                # Values the vectorized parse could not read fall back to float() (e.g. 'nan', '1_000')
+                for pos in tarifa_num.index[filled & tarifa_num.isna()]:
+                    try:
+                        tarifa_num[pos] = float(tarifas[pos])
+                    except (ValueError, TypeError):
+                        filled[pos] = False
+                valid = filled.to_numpy()
+                if not valid.any():
+                    continue
 
-                    for col_idx, (vehicle, motorista) in motorista_cols.items():
-                        tarifa = sheet.cell(row=row_idx, column=col_idx).value
-                        if tarifa is not None and str(tarifa).strip() != "":
-                            try:
-                                processed_rows.append({
-                                    'Transportadora': self._parse_transporter_name(file_name),
-                                    'Veiculo': vehicle,
-                                    'Motorista': motorista,
-                                    'Origem': origem,
-                                    'Destino': clean_destino,
-                                    'DistanciaMin': distancia_min,
-                                    'DistanciaMax': distancia_max,
-                                    'Distancia': float(motorista),
-                                    'Tarifa': float(tarifa),
-                                    'Nomeacao': 'N/A',
-                                    'Fornecedor': 'N/A',
-                                    'LocalColeta': 'N/A',
-                                    'Viagem': 'N/A',
-                                    'Chave': f"{origem} & {clean_destino}"
-                                })
-                            except (ValueError, TypeError):
-                                continue
-                
-                if processed_rows:
-                    all_melted_dfs.append(pd.DataFrame(processed_rows))
+                n_motoristas = len(col_indices)
+                row_pos = np.repeat(np.arange(len(data)), n_motoristas)[valid]
+                col_pos = np.tile(np.arange(n_motoristas), len(data))[valid]
+                vehicles = np.array([motorista_cols[c][0] for c in col_indices], dtype=object)
+                motoristas = np.array([motorista_cols[c][1] for c in col_indices])
+                origens_out = origens[row_pos]
+                destinos_out = np.array(clean_destinos, dtype=object)[row_pos]
+
+                all_melted_dfs.append(pd.DataFrame({
+                    'Transportadora': self._parse_transporter_name(file_name),
+                    'Veiculo': vehicles[col_pos],
+                    'Motorista': motoristas[col_pos],
+                    'Origem': origens_out,
+                    'Destino': destinos_out,
+                    'DistanciaMin': np.array(dist_min)[row_pos],
+                    'DistanciaMax': np.array(dist_max)[row_pos],
+                    'Distancia': motoristas[col_pos].astype(float),
+                    'Tarifa': tarifa_num.to_numpy()[valid],
+                    'Nomeacao': 'N/A',
+                    'Fornecedor': 'N/A',
+                    'LocalColeta': 'N/A',
+                    'Viagem': 'N/A',
+                    'Chave': [f"{o} & {d}" for o, d in zip(origens_out, destinos_out)]
+                }))
             
             except Exception as e:
-                print(f"  Error processing file {file_path} for 'SPOTS': {e}")
+                logger.error("Error processing file %s for 'SPOTS': %s", file_path, e)
         
         return all_melted_dfs
     
-    def _process_standard_fluxo(self, fluxo_path, fluxo_name):
-        """Processa arquivos dos fluxos padrão (01. PRINCIPAL, 03. LINE HAUL, etc.)"""
-        all_melted_dfs = []
-        
-        # Try to load Geoship table (search in parent and grandparent of Fluxos folder)
-        geoship_df = None
-        try:
-            if self.tarifa_base_folder:
-                # Search in parent folder (Bases)
-                parent_folder = os.path.dirname(self.tarifa_base_folder)
-                
-                # Search in current parent
-                geoship_filename = next(
-                    (f for f in os.listdir(parent_folder)
-                     if 'geoshiptable' in f.lower() and f.endswith(('.xlsx', '.xls'))),
-                    None
-                )
+    def _find_geoship_file(self):
+        """Busca a GeoshipTable na pasta pai (Bases) ou avó (BC TURBO) da pasta Fluxos"""
+        parent_folder = os.path.dirname(self.tarifa_base_folder)
+        for folder in (parent_folder, os.path.dirname(parent_folder)):
+            if not os.path.exists(folder):
+                continue
+            geoship_filename = next(
+                (f for f in os.listdir(folder)
+                 if 'geoshiptable' in f.lower() and f.endswith(('.xlsx', '.xls'))),
+                None
+            )
+            if geoship_filename:
+                return os.path.join(folder, geoship_filename)
+        return None
 
-                # If not found, try grandparent (BC TURBO level)
-                if not geoship_filename:
-                    grandparent_folder = os.path.dirname(parent_folder)
-                    if os.path.exists(grandparent_folder):
-                        geoship_filename = next(
-                            (f for f in os.listdir(grandparent_folder)
-                             if 'geoshiptable' in f.lower() and f.endswith(('.xlsx', '.xls'))),
-                            None
-                        )
-                        if geoship_filename:
-                            parent_folder = grandparent_folder
-
-                if geoship_filename:
-                    geoship_full_path = os.path.join(parent_folder, geoship_filename)
-                    geoship_df = pd.read_excel(geoship_full_path, engine='openpyxl')
-                    geoship_df = geoship_df.rename(columns={
-                        'Fornecedor': 'Fornecedor_geoship',
-                        'Km Total': 'Distancia_geoship',
-                        'Destino Materiais': 'Destino_geoship'
-                    })
-                    print(f"    ✅ Loaded GeoshipTable: '{geoship_filename}'")
-                else:
-                    print(f"    ℹ️  GeoshipTable not found (optional)")
+    def _get_geoship_lookup(self):
+        """
+        Carrega e normaliza a GeoshipTable uma única vez por load_tarifa_data.
+        Retorna DataFrame com '_geo_key' (tipo de fluxo em minúsculas) e as colunas de substituição,
+        ou None se a tabela não existir.
+        """
+        if self._geoship_loaded:
+            return self._geoship_lookup
+        self._geoship_loaded = True
+        self._geoship_lookup = None
+
+        if not self.tarifa_base_folder:
+            return None
+
+        try:
+            geoship_full_path = self._find_geoship_file()
+            if not geoship_full_path:
+                logger.debug('ℹ️  GeoshipTable not found (optional)')
+                return None
 
+            geoship_df = pd.read_excel(geoship_full_path, engine='openpyxl')
+            geoship_df = geoship_df.rename(columns={
+                'Fornecedor': 'Fornecedor_geoship',
+                'Km Total': 'Distancia_geoship',
+                'Destino Materiais': 'Destino_geoship'
+            })
+            logger.info("✅ Loaded GeoshipTable: '%s'", os.path.basename(geoship_full_path))
         except FileNotFoundError:
-            print(f"    ⚠️  Directory not found for GeoshipTable")
+            logger.warning('⚠️  Directory not found for GeoshipTable')
+            return None
         except Exception as e:
-            print(f"    ⚠️  Error loading GeoshipTable: {e}")
+            logger.warning('⚠️  Error loading GeoshipTable: %s', e)
+            return None
+
+        geoship_key_col = next((col for col in geoship_df.columns if 'tipo' in str(col).lower() and 'fluxo' in str(col).lower()), None)
+        if geoship_key_col is None:
+            geoship_key_col = next((col for col in geoship_df.columns if 'geoship' in str(col).lower()), None)
+
+        # Sem coluna-chave nenhuma linha é substituída; lookup vazio mantém esse comportamento
+        lookup = pd.DataFrame({'_geo_key': pd.Series(dtype=object)})
+        if geoship_key_col is not None:
+            lookup = pd.DataFrame({'_geo_key': geoship_df[geoship_key_col].astype(str).str.lower()})
+
+        # Colunas da GeoshipTable que substituem as da tarifa (apenas se existirem)
+        override_map = {
+            'Fornecedor_geoship': 'Fornecedor',
+            'Distancia_geoship': 'Distancia',
+            'CNPJ Origem': 'Origem',
+            'Destino_geoship': 'Destino',
+        }
+        for geo_col, target_col in override_map.items():
+            if geo_col in geoship_df.columns and geoship_key_col is not None:
+                lookup[f'_geo_{target_col}'] = geoship_df[geo_col].values
+
+        self._geoship_lookup = lookup
+        return lookup
+
+    def _expand_geoship_rows(self, melted_df, tipo_fluxo_col, geoship_lookup):
+        """
+        Substitui as linhas Geoship pelas linhas correspondentes da GeoshipTable (um merge).
+        Linhas sem correspondência são mantidas; linhas não-Geoship vêm primeiro.
+        """
+        is_geoship = melted_df[tipo_fluxo_col].astype(str).str.lower().str.contains('geoship', na=False)
+        non_geoship = melted_df[~is_geoship]
+        geoship_rows = melted_df[is_geoship].copy()
+
+        geoship_rows['_geo_key'] = geoship_rows[tipo_fluxo_col].astype(str).str.strip().str.lower()
+        expanded = geoship_rows.merge(geoship_lookup, on='_geo_key', how='left', indicator='_geo_match', sort=False)
+        matched = (expanded['_geo_match'] == 'both').to_numpy()
+
+        for target_col in ('Fornecedor', 'Distancia', 'Origem', 'Destino'):
+            geo_col = f'_geo_{target_col}'
+            if geo_col not in expanded.columns:
+                continue
+            if target_col in expanded.columns:
+                expanded[target_col] = expanded[target_col].astype(object).where(~matched, expanded[geo_col])
+            else:
+                expanded[target_col] = expanded[geo_col].where(matched)
+
+        expanded = expanded.drop(columns=[c for c in expanded.columns if str(c).startswith('_geo_')])
+        return pd.concat([non_geoship, expanded], ignore_index=True).drop(columns=[tipo_fluxo_col], errors='ignore')
+
+    def _process_standard_fluxo(self, fluxo_path, fluxo_name):
+        """Processa arquivos dos fluxos padrão (01. PRINCIPAL, 03. LINE HAUL, etc.)"""
+        all_melted_dfs = []
+        
+        geoship_lookup = self._get_geoship_lookup()
         
         # Process Excel files in fluxo folder
         for file_name in os.listdir(fluxo_path):
@@ -518,42 +613,13 @@ class TarifaManager:
                 melted_df['Chave'] = melted_df['Origem'].astype(str) + ' & ' + melted_df['Destino'].astype(str)
 
                 # Replace Geoship Rows if applicable
-                if tipo_fluxo_col and tipo_fluxo_col in melted_df.columns and geoship_df is not None:
-                    is_geoship = melted_df[tipo_fluxo_col].astype(str).str.lower().str.contains('geoship', na=False)
-                    geoship_matches = melted_df[is_geoship]
-                    non_geoship = melted_df[~is_geoship]
-                    updated_rows = []
-
-                    for _, row in geoship_matches.iterrows():
-                        tipo_fluxo_value = str(row[tipo_fluxo_col]).strip()
-                        geoship_key_col = next((col for col in geoship_df.columns if 'tipo' in col.lower() and 'fluxo' in col.lower()), None)
-                        if geoship_key_col is None:
-                            geoship_key_col = next((col for col in geoship_df.columns if 'geoship' in col.lower()), None)
-                        
-                        if geoship_key_col:
-                            matched_geo_rows = geoship_df[
-                                geoship_df[geoship_key_col].astype(str).str.lower() == tipo_fluxo_value.lower()
-                            ]
-                        else:
-                            matched_geo_rows = pd.DataFrame()
-
-                        if matched_geo_rows.empty:
-                            updated_rows.append(row)
-                        else:
-                            for _, geo_row in matched_geo_rows.iterrows():
-                                new_row = row.copy()
-                                new_row['Fornecedor'] = geo_row.get('Fornecedor_geoship', new_row.get('Fornecedor', 'N/A'))
-                                new_row['Distancia'] = geo_row.get('Distancia_geoship', new_row.get('Distancia', None))
-                                new_row['Origem'] = geo_row.get('CNPJ Origem', new_row.get('Origem', None))
-                                new_row['Destino'] = geo_row.get('Destino_geoship', new_row.get('Destino', None))
-                                updated_rows.append(new_row)
-
-                    melted_df = pd.concat([non_geoship, pd.DataFrame(updated_rows)], ignore_index=True).drop(columns=[tipo_fluxo_col], errors='ignore')
+                if tipo_fluxo_col and tipo_fluxo_col in melted_df.columns and geoship_lookup is not None:
+                    melted_df = self._expand_geoship_rows(melted_df, tipo_fluxo_col, geoship_lookup)
 
                 all_melted_dfs.append(melted_df)
 
             except Exception as e:
-                print(f"  Error processing file {file_path}: {e}")
+                logger.error('Error processing file %s: %s', file_path, e)
                 continue
         
         return all_melted_dfs
@@ -611,7 +677,7 @@ class TarifaManager:
     
     def _load_fluxo_from_folder(self, fluxo_path, fluxo_name):
         """Carrega dados de um fluxo específico"""
-        print(f"  📁 Processing fluxo: {fluxo_name}")
+        logger.debug('📁 Processing fluxo: %s', fluxo_name)
         
         all_melted_dfs = []
         
@@ -630,10 +696,10 @@ class TarifaManager:
         master_df = self._consolidate_and_clean_data(all_melted_dfs, fluxo_name)
         
         if master_df is not None and not master_df.empty:
-            print(f"    ✅ Loaded {len(master_df)} rows from {fluxo_name}")
+            logger.info('✅ Loaded %s rows from %s', len(master_df), fluxo_name)
             return master_df
         else:
-            print(f"    ⚠️  No valid data found in {fluxo_name}")
+            logger.warning('⚠️  No valid data found in %s', fluxo_name)
             return None
     
     def _find_tarifa_base_folder(self):
@@ -652,13 +718,13 @@ class TarifaManager:
         
         for candidate in fluxos_candidates:
             if candidate.exists() and candidate.is_dir():
-                print(f"  ✓ Found Fluxos at: {candidate}")
+                logger.info('✓ Found Fluxos at: %s', candidate)
                 return str(candidate)
         
         # Look for any folder containing "fluxos" in its name
         for folder in db_path.iterdir():
             if folder.is_dir() and 'fluxos' in folder.name.lower():
-                print(f"  ✓ Found Fluxos at: {folder}")
+                logger.info('✓ Found Fluxos at: %s', folder)
                 return str(folder)
         
         return None
@@ -666,19 +732,24 @@ class TarifaManager:
     def load_tarifa_data(self, progress_callback=None):
         """Carrega todos os dados de Tarifa (todos os fluxos)"""
         if not self.db_folder:
-            print("⚠️  Database folder not set")
+            logger.warning('⚠️  Database folder not set')
             return False
         
         # Find Tarifa Base folder
         self.tarifa_base_folder = self._find_tarifa_base_folder()
+        self._geoship_lookup = None
+        self._geoship_loaded = False
+        self.fluxo_dirs = {}
+        self.carrier_matrix = {}
+        self._carrier_index = {}
+        self._fluxo_aliases = {}
+        self._fluxo_resolve_cache = {}
         
         if not self.tarifa_base_folder:
-            print("ℹ️  Tarifa Base folder not found (optional)")
+            logger.debug('ℹ️  Tarifa Base folder not found (optional)')
             return False
         
-        print(f"\n{'='*60}")
-        print(f"📦 Loading Tarifa Data from: {self.tarifa_base_folder}")
-        print(f"{'='*60}")
+        logger.info('📦 Loading Tarifa Data from: %s', self.tarifa_base_folder)
         
         base_path = Path(self.tarifa_base_folder)
         
@@ -686,10 +757,10 @@ class TarifaManager:
         fluxos = [d for d in base_path.iterdir() if d.is_dir()]
         
         if not fluxos:
-            print("⚠️  No fluxo folders found in Tarifa Base")
+            logger.warning('⚠️  No fluxo folders found in Tarifa Base')
             return False
         
-        print(f"Found {len(fluxos)} fluxo folders")
+        logger.info('Found %s fluxo folders', len(fluxos))
         
         # Process each fluxo
         for fluxo_dir in sorted(fluxos):
@@ -698,6 +769,8 @@ class TarifaManager:
             if progress_callback:
                 progress_callback(f"Loading Tarifa: {fluxo_name}...")
             
+            self.fluxo_dirs[fluxo_name] = str(fluxo_dir)
+
             # Check if parquet exists and is up-to-date
             parquet_path = fluxo_dir / f"{fluxo_name}.parquet"
             
@@ -709,27 +782,28 @@ class TarifaManager:
                     # Save to parquet
                     try:
                         df.to_parquet(parquet_path, engine='pyarrow', compression='snappy')
-                        print(f"    ✓ Parquet cache created for {fluxo_name}")
+                        logger.info('✓ Parquet cache created for %s', fluxo_name)
                     except Exception as e:
-                        print(f"    ⚠️  Failed to create parquet: {e}")
+                        logger.warning('⚠️  Failed to create parquet: %s', e)
                     
                     self.fluxo_data[fluxo_name] = df
             else:
                 # Load from parquet (fast)
                 try:
-                    print(f"  📁 Loading {fluxo_name} from parquet cache...")
+                    logger.debug('📁 Loading %s from parquet cache...', fluxo_name)
                     df = pd.read_parquet(parquet_path, engine='pyarrow')
                     self.fluxo_data[fluxo_name] = df
-                    print(f"    ✅ Loaded {len(df)} rows from cache")
+                    logger.debug('✅ Loaded %s rows from cache', len(df))
                 except Exception as e:
-                    print(f"    ⚠️  Failed to load parquet, reprocessing: {e}")
+                    logger.warning('⚠️  Failed to load parquet, reprocessing: %s', e)
                     df = self._load_fluxo_from_folder(str(fluxo_dir), fluxo_name)
                     if df is not None:
                         self.fluxo_data[fluxo_name] = df
         
-        print(f"{'='*60}")
-        print(f"✅ Tarifa data loaded: {len(self.fluxo_data)} fluxos ready")
-        print(f"{'='*60}\n")
+        with profiling.stage('index'):
+            self._build_fluxo_alias_index()
+        
+        logger.info('✅ Tarifa data loaded: %s fluxos ready', len(self.fluxo_data))
         
         return True
     
@@ -749,6 +823,186 @@ class TarifaManager:
         """Retorna DataFrame de um fluxo específico"""
         return self.fluxo_data.get(fluxo_name)
     
+    def _fold_fluxo_key(self, value):
+        """Chave de comparação de fluxo: sem acentos, maiúsculas, '-'/'_' como espaço"""
+        if value is None:
+            return ''
+        text = ''.join(
+            c for c in unicodedata.normalize('NFKD', str(value))
+            if not unicodedata.combining(c)
+        )
+        text = text.upper().replace('-', ' ').replace('_', ' ')
+        return ' '.join(text.split())
+
+    def _fluxo_aliases_for(self, value):
+        """Aliases de um nome de fluxo: nome completo, sem prefixo numérico ('01. ') e nome canônico"""
+        full = self._fold_fluxo_key(value)
+        stripped = self._fold_fluxo_key(re.sub(r'^\s*\d+\s*[.)]?\s*', '', str(value)))
+        aliases = [full, stripped]
+        if self.fluxo_normalizer:
+            for candidate in (value, stripped):
+                canonical = self._fold_fluxo_key(self.fluxo_normalizer(candidate))
+                if canonical:
+                    aliases.append(canonical)
+        return [a for a in dict.fromkeys(aliases) if a]
+
+    def _build_fluxo_alias_index(self):
+        """
+        Monta o índice alias → pasta de fluxo (chamado ao final de load_tarifa_data)
+        Nomes completos têm prioridade sobre aliases derivados; empates resolvidos pela ordem alfabética
+        """
+        self._fluxo_aliases = {}
+        self._fluxo_resolve_cache = {}
+        names = sorted(self.fluxo_data.keys())
+        for name in names:
+            self._fluxo_aliases.setdefault(self._fold_fluxo_key(name), name)
+        for name in names:
+            for alias in self._fluxo_aliases_for(name):
+                self._fluxo_aliases.setdefault(alias, name)
+
+    def resolve_fluxo(self, fluxo):
+        """
+        Resolve um valor de fluxo (ex: 'Fluxo Viagem' do TDC, 'Milk Run') para o nome da pasta de Tarifa
+        
+        Returns:
+            Nome do fluxo (chave de fluxo_data) ou None
+        """
+        key = self._fold_fluxo_key(fluxo)
+        if not key:
+            return None
+        if key in self._fluxo_resolve_cache:
+            return self._fluxo_resolve_cache[key]
+
+        matched = None
+        for alias in self._fluxo_aliases_for(fluxo):
+            if alias in self._fluxo_aliases:
+                matched = self._fluxo_aliases[alias]
+                break
+
+        if matched is None:
+            # Fallback: contém/está contido, preferindo o alias mais longo (determinístico)
+            candidates = sorted(
+                (alias for alias in self._fluxo_aliases if alias in key or key in alias),
+                key=lambda alias: (-len(alias), self._fluxo_aliases[alias])
+            )
+            if candidates:
+                matched = self._fluxo_aliases[candidates[0]]
+
+        self._fluxo_resolve_cache[key] = matched
+        return matched
+
+    def _normalize_viagem_input(self, viagem):
+        """Normaliza o tipo de viagem informado para o código RT/OW"""
+        if not viagem:
+            return None
+        _viagem_input_map = {
+            'ROUND TRIP': 'RT', 'ROUNDTRIP': 'RT', 'IDA E VOLTA': 'RT', 'IDA/VOLTA': 'RT',
+            'ONE WAY': 'OW', 'ONEWAY': 'OW', 'SOMENTE IDA': 'OW', 'SO IDA': 'OW', 'IDA': 'OW',
+        }
+        return _viagem_input_map.get(str(viagem).strip().upper(), str(viagem).strip().upper())
+
+    def _filter_tariff_candidates(self, fluxo_name, origem, destino, veiculo, km_value):
+        """
+        Aplica os filtros de rota sobre o fluxo (sem o filtro de viagem)
+        Ordem: Origem → Veiculo → KM range → Destino (contains)
+        
+        Returns:
+            (DataFrame filtrado, is_range_based)
+        """
+        df = self.fluxo_data[fluxo_name]
+        # Amostras de valores (unique nas colunas) só são calculadas com DEBUG ligado
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug('[Tarifa Filter] Starting with %s rows | Viagem values in data: %s', len(df),
+                         sorted(df['Viagem'].unique().tolist()) if 'Viagem' in df.columns else 'N/A')
+
+        # 1) Origem
+        if origem:
+            df = df[df['Origem'].str.upper() == str(origem).strip().upper()]
+            logger.debug("[Tarifa Filter] After Origem='%s': %s rows", origem, len(df))
+            # Sample of Destino values so we can verify the format
+            if debug and 'Destino' in df.columns and not df.empty:
+                logger.debug('[Tarifa Filter] Destino sample (first 15): %s', df['Destino'].dropna().unique()[:15].tolist())
+
+        # 2) Veiculo
+        if veiculo:
+            df = df[df['Veiculo'].str.upper() == str(veiculo).strip().upper()]
+            logger.debug("[Tarifa Filter] After Veiculo='%s': %s rows", veiculo, len(df))
+
+        # 3) KM range (before Destino so we can narrow down with distance first)
+        is_range_based = 'DistanciaMin' in df.columns
+        if is_range_based and km_value and not df.empty:
+            range_mask = (
+                pd.to_numeric(df['DistanciaMin'], errors='coerce').fillna(0) <= km_value
+            ) & (
+                pd.to_numeric(df['DistanciaMax'], errors='coerce').fillna(0) >= km_value
+            )
+            df = df[range_mask]
+            logger.debug('[Tarifa Filter] After KM range (%s km): %s rows', km_value, len(df))
+
+        # 4) Destino — contains match: code like '1080' must be found inside 'FIASA(1080)'
+        if destino and not df.empty:
+            destino_str = str(destino).strip()
+            # Strip trailing .0 from float-converted strings (e.g. '1080.0' → '1080')
+            if destino_str.endswith('.0') and destino_str[:-2].isdigit():
+                destino_str = destino_str[:-2]
+            df = df[df['Destino'].astype(str).str.upper().str.contains(destino_str.upper(), regex=False, na=False)]
+            logger.debug("[Tarifa Filter] After Destino contains '%s': %s rows", destino_str, len(df))
+
+        return df, is_range_based
+
+    def _compute_tarifa_real(self, df, fluxo_name, is_range_based, km_value):
+        """Calcula a coluna Tarifa_Real conforme o tipo de fluxo"""
+        df = df.copy()
+        if is_range_based:
+            if 'MILK RUN' in fluxo_name.upper():
+                if km_value and km_value > 0:
+                    df['Tarifa_Real'] = km_value * df['Tarifa']
+                else:
+                    df['Tarifa_Real'] = df['Tarifa']  # no km → use base rate
+            elif 'SPOTS' in fluxo_name.upper() and 'Distancia' in df.columns:
+                if km_value and km_value > 0:
+                    df['Tarifa_Real'] = (km_value * df['Tarifa']) / df['Distancia'].replace(0, float('nan'))
+                else:
+                    df['Tarifa_Real'] = df['Tarifa']
+            else:  # FAIXA — tarifa is already per trip
+                df['Tarifa_Real'] = df['Tarifa']
+        else:
+            # Standard fluxo (e.g. Line Haul): Tarifa × KM / Distancia if km available,
+            # otherwise use base tarifa directly (fixed rates indexed by Origem/Destino)
+            if 'Distancia' in df.columns and km_value and km_value > 0:
+                df['Tarifa_Real'] = (km_value * df['Tarifa']) / df['Distancia'].replace(0, float('nan'))
+            else:
+                df['Tarifa_Real'] = df['Tarifa']
+        return df
+
+    def _build_tariff_result(self, df_sorted, km_value):
+        """Monta o dicionário de resultado a partir das opções já ordenadas por Tarifa_Real"""
+        if df_sorted.empty:
+            return {
+                'status': 'not_found',
+                'message': 'Nenhuma tarifa válida calculada'
+            }
+        
+        # Get best option
+        best = df_sorted.iloc[0]
+        
+        # Get other options (top 5)
+        others = df_sorted.iloc[1:6].to_dict('records') if len(df_sorted) > 1 else []
+        
+        return {
+            'status': 'success',
+            'tarifa_original': float(best['Tarifa']),
+            'tarifa_real': float(best['Tarifa_Real']),
+            'transportadora': str(best.get('Transportadora', 'N/A')),
+            'veiculo': str(best.get('Veiculo', 'N/A')),
+            'viagem': str(best.get('Viagem', 'N/A')),
+            'origem': str(best.get('Origem', 'N/A')),
+            'destino': str(best.get('Destino', 'N/A')),
+            'distancia_usada': float(km_value) if km_value else 0,
+            'outras_opcoes': others
+        }
+
     def calculate_tariff(self, fluxo_name, origem, destino, veiculo, km_value, viagem=None):
         """
         Calcula a melhor tarifa baseada nos parâmetros fornecidos
@@ -777,60 +1031,14 @@ class TarifaManager:
                     'message': f'Fluxo {fluxo_name} não encontrado'
                 }
             
-            df = self.fluxo_data[fluxo_name].copy()
-            print(f"  [Tarifa Filter] Starting with {len(df)} rows | Viagem values in data: {sorted(df['Viagem'].unique().tolist()) if 'Viagem' in df.columns else 'N/A'}")
-
-            # Normalize viagem input to RT/OW code
-            if viagem:
-                _viagem_input_map = {
-                    'ROUND TRIP': 'RT', 'ROUNDTRIP': 'RT', 'IDA E VOLTA': 'RT', 'IDA/VOLTA': 'RT',
-                    'ONE WAY': 'OW', 'ONEWAY': 'OW', 'SOMENTE IDA': 'OW', 'SO IDA': 'OW', 'IDA': 'OW',
-                }
-                viagem_normalized = _viagem_input_map.get(str(viagem).strip().upper(), str(viagem).strip().upper())
-            else:
-                viagem_normalized = None
-
-            # --- Filter order: Origem → Veiculo → KM range → Destino (contains) → Viagem ---
-
-            # 1) Origem
-            if origem:
-                df = df[df['Origem'].str.upper() == str(origem).strip().upper()]
-                print(f"  [Tarifa Filter] After Origem='{origem}': {len(df)} rows")
-                # Print sample of Destino values so we can verify the format
-                if 'Destino' in df.columns and not df.empty:
-                    sample = df['Destino'].dropna().unique()[:15].tolist()
-                    print(f"  [Tarifa Filter] Destino sample (first 15): {sample}")
-
-            # 2) Veiculo
-            if veiculo:
-                df = df[df['Veiculo'].str.upper() == str(veiculo).strip().upper()]
-                print(f"  [Tarifa Filter] After Veiculo='{veiculo}': {len(df)} rows")
-
-            # 3) KM range (before Destino so we can narrow down with distance first)
-            is_range_based = 'DistanciaMin' in df.columns
-            df_km = df  # keep pre-km df for fallback
-            if is_range_based and km_value and not df.empty:
-                range_mask = (
-                    pd.to_numeric(df['DistanciaMin'], errors='coerce').fillna(0) <= km_value
-                ) & (
-                    pd.to_numeric(df['DistanciaMax'], errors='coerce').fillna(0) >= km_value
-                )
-                df = df[range_mask]
-                print(f"  [Tarifa Filter] After KM range ({km_value} km): {len(df)} rows")
-
-            # 4) Destino — contains match: code like '1080' must be found inside 'FIASA(1080)'
-            if destino and not df.empty:
-                destino_str = str(destino).strip()
-                # Strip trailing .0 from float-converted strings (e.g. '1080.0' → '1080')
-                if destino_str.endswith('.0') and destino_str[:-2].isdigit():
-                    destino_str = destino_str[:-2]
-                df = df[df['Destino'].astype(str).str.upper().str.contains(destino_str.upper(), regex=False, na=False)]
-                print(f"  [Tarifa Filter] After Destino contains '{destino_str}': {len(df)} rows")
+            viagem_normalized = self._normalize_viagem_input(viagem)
+
+            df, is_range_based = self._filter_tariff_candidates(fluxo_name, origem, destino, veiculo, km_value)
 
             # 5) Viagem
             if viagem_normalized and 'Viagem' in df.columns and not df.empty:
                 df = df[df['Viagem'].str.upper() == viagem_normalized]
-                print(f"  [Tarifa Filter] After Viagem='{viagem_normalized}': {len(df)} rows")
+                logger.debug("[Tarifa Filter] After Viagem='%s': %s rows", viagem_normalized, len(df))
 
             if df.empty:
                 return {
@@ -838,65 +1046,294 @@ class TarifaManager:
                     'message': 'Nenhuma tarifa encontrada para os filtros especificados'
                 }
 
-            df_filtered = df.copy()
-
-            # Calculate Tarifa_Real based on fluxo type
-            if is_range_based:
-                if 'MILK RUN' in fluxo_name.upper():
-                    if km_value and km_value > 0:
-                        df_filtered['Tarifa_Real'] = km_value * df_filtered['Tarifa']
-                    else:
-                        df_filtered['Tarifa_Real'] = df_filtered['Tarifa']  # no km → use base rate
-                elif 'SPOTS' in fluxo_name.upper() and 'Distancia' in df_filtered.columns:
-                    if km_value and km_value > 0:
-                        df_filtered['Tarifa_Real'] = (km_value * df_filtered['Tarifa']) / df_filtered['Distancia'].replace(0, float('nan'))
-                    else:
-                        df_filtered['Tarifa_Real'] = df_filtered['Tarifa']
-                else:  # FAIXA — tarifa is already per trip
-                    df_filtered['Tarifa_Real'] = df_filtered['Tarifa']
-            else:
-                # Standard fluxo (e.g. Line Haul): Tarifa × KM / Distancia if km available,
-                # otherwise use base tarifa directly (fixed rates indexed by Origem/Destino)
-                if 'Distancia' in df_filtered.columns and km_value and km_value > 0:
-                    df_filtered['Tarifa_Real'] = (km_value * df_filtered['Tarifa']) / df_filtered['Distancia'].replace(0, float('nan'))
-                else:
-                    df_filtered['Tarifa_Real'] = df_filtered['Tarifa']
+            df_filtered = self._compute_tarifa_real(df, fluxo_name, is_range_based, km_value)
             
             # Sort by best (cheapest) tariff
             df_sorted = df_filtered.sort_values('Tarifa_Real', ascending=True)
             
-            if df_sorted.empty:
+            return self._build_tariff_result(df_sorted, km_value)
+        
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f'Erro ao calcular tarifa: {str(e)}'
+            }
+
+    def quote_tariffs(self, fluxo_name, origem, destino, veiculo, km_value, viagens=None):
+        """
+        Cotação completa em uma única passada: todas as transportadoras × tipos de viagem
+        
+        Args:
+            fluxo_name, origem, destino, veiculo, km_value: mesmos filtros de calculate_tariff
+            viagens: Lista de tipos de viagem desejados (ex: ['RT', 'OW']).
+                     None = todos os tipos presentes nos candidatos
+        
+        Returns:
+            Dict: {
+                'status': 'success/error/not_found',
+                'quotes': [],          # Matriz completa (Transportadora, Viagem, Tarifa_Real, Rank...)
+                'best_by_viagem': {},  # {viagem: mesmo formato de calculate_tariff}
+                'carriers': []         # Melhor Tarifa_Real por transportadora, uma coluna por viagem
+            }
+        """
+        try:
+            if fluxo_name not in self.fluxo_data:
+                return {
+                    'status': 'error',
+                    'message': f'Fluxo {fluxo_name} não encontrado'
+                }
+
+            df, is_range_based = self._filter_tariff_candidates(fluxo_name, origem, destino, veiculo, km_value)
+            if df.empty:
                 return {
                     'status': 'not_found',
-                    'message': 'Nenhuma tarifa válida calculada'
+                    'message': 'Nenhuma tarifa encontrada para os filtros especificados'
                 }
-            
-            # Get best option
-            best = df_sorted.iloc[0]
-            
-            # Get other options (top 5)
-            others = df_sorted.iloc[1:6].to_dict('records') if len(df_sorted) > 1 else []
-            
+
+            df_sorted = self._compute_tarifa_real(df, fluxo_name, is_range_based, km_value)
+            df_sorted = df_sorted.sort_values('Tarifa_Real', ascending=True, kind='mergesort')
+
+            has_viagem = 'Viagem' in df_sorted.columns
+            viagem_upper = df_sorted['Viagem'].str.upper() if has_viagem else None
+
+            if viagens is None:
+                codes = viagem_upper.dropna().unique().tolist() if has_viagem else []
+            else:
+                codes = [self._normalize_viagem_input(v) for v in viagens if v]
+
+            # Melhor opção por viagem (mesmo resultado de calculate_tariff(..., viagem=code))
+            best_by_viagem = {}
+            for code in codes:
+                subset = df_sorted[viagem_upper == code] if has_viagem else df_sorted
+                if subset.empty:
+                    best_by_viagem[code] = {
+                        'status': 'not_found',
+                        'message': 'Nenhuma tarifa encontrada para os filtros especificados'
+                    }
+                else:
+                    best_by_viagem[code] = self._build_tariff_result(subset, km_value)
+
+            # Matriz completa: transportadora × viagem × tarifa_real, com ranking por viagem
+            matrix_cols = [c for c in ['Transportadora', 'Veiculo', 'Viagem', 'Origem', 'Destino',
+                                       'Fornecedor', 'Tarifa', 'Tarifa_Real'] if c in df_sorted.columns]
+            matrix = df_sorted[matrix_cols].copy()
+            if has_viagem:
+                matrix['Viagem'] = viagem_upper
+                if viagens is not None:
+                    matrix = matrix[matrix['Viagem'].isin(codes)]
+                matrix['Rank'] = matrix.groupby('Viagem', sort=False).cumcount() + 1
+            else:
+                matrix['Rank'] = np.arange(1, len(matrix) + 1)
+
+            carriers = []
+            if 'Transportadora' in matrix.columns and not matrix.empty:
+                pivot_col = 'Viagem' if has_viagem else None
+                if pivot_col:
+                    pivot = matrix.pivot_table(index='Transportadora', columns='Viagem', values='Tarifa_Real', aggfunc='min')
+                else:
+                    pivot = matrix.groupby('Transportadora')[['Tarifa_Real']].min()
+                pivot = pivot.loc[pivot.min(axis=1).sort_values(na_position='last', kind='mergesort').index]
+                for transportadora, row in pivot.iterrows():
+                    entry = {'transportadora': str(transportadora)}
+                    for col, value in row.items():
+                        entry[str(col)] = None if pd.isna(value) else float(value)
+                    carriers.append(entry)
+
             return {
                 'status': 'success',
-                'tarifa_original': float(best['Tarifa']),
-                'tarifa_real': float(best['Tarifa_Real']),
-                'transportadora': str(best.get('Transportadora', 'N/A')),
-                'veiculo': str(best.get('Veiculo', 'N/A')),
-                'viagem': str(best.get('Viagem', 'N/A')),
-                'origem': str(best.get('Origem', 'N/A')),
-                'destino': str(best.get('Destino', 'N/A')),
+                'fluxo': fluxo_name,
                 'distancia_usada': float(km_value) if km_value else 0,
-                'outras_opcoes': others
+                'quotes': matrix.to_dict('records'),
+                'best_by_viagem': best_by_viagem,
+                'carriers': carriers
             }
-        
+
         except Exception as e:
             return {
                 'status': 'error',
-                'message': f'Erro ao calcular tarifa: {str(e)}'
+                'message': f'Erro ao cotar tarifas: {str(e)}'
             }
     
+    def _build_carrier_matrix(self, fluxo_name, df):
+        """
+        Materializa a melhor e a segunda melhor transportadora por
+        (Origem, Destino, Veiculo, Viagem, faixa de km)
+        
+        O ranking usa um custo de referência independente do km informado:
+        tarifa por km (Tarifa / Distancia) nos fluxos cobrados por distância
+        (SPOTS e padrão), e a própria Tarifa nos demais (MILK RUN, FAIXA).
+        """
+        key_cols = ['Origem', 'Destino', 'Veiculo', 'Viagem', 'DistanciaMin', 'DistanciaMax']
+        work = pd.DataFrame({
+            col: (df[col] if col in df.columns else 'N/A') for col in ['Origem', 'Destino', 'Veiculo', 'Viagem', 'Transportadora']
+        }, index=df.index)
+        for col in ('DistanciaMin', 'DistanciaMax'):
+            work[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+        for col in ('Origem', 'Destino', 'Veiculo', 'Viagem'):
+            work[col] = work[col].astype(str).str.strip().str.upper()
+        work['Tarifa'] = pd.to_numeric(df['Tarifa'], errors='coerce')
+
+        is_range_based = 'DistanciaMin' in df.columns
+        per_km = 'Distancia' in df.columns and (not is_range_based or 'SPOTS' in fluxo_name.upper())
+        if per_km:
+            distancia = pd.to_numeric(df['Distancia'], errors='coerce').replace(0, np.nan)
+            work['Custo_Ref'] = work['Tarifa'] / distancia
+        else:
+            work['Custo_Ref'] = work['Tarifa']
+        work = work.dropna(subset=['Custo_Ref'])
+
+        # Opção mais barata de cada transportadora dentro do grupo
+        work = work.sort_values('Custo_Ref', kind='mergesort')
+        work = work.drop_duplicates(subset=key_cols + ['Transportadora'], keep='first')
+        work['_rank'] = work.groupby(key_cols, dropna=False, sort=False).cumcount()
+
+        counts = work.groupby(key_cols, dropna=False, sort=False).size().rename('Num_Transportadoras').reset_index()
+        best = work[work['_rank'] == 0][key_cols + ['Transportadora', 'Tarifa', 'Custo_Ref']].rename(columns={
+            'Transportadora': 'Melhor_Transportadora', 'Tarifa': 'Melhor_Tarifa', 'Custo_Ref': 'Melhor_Custo'
+        })
+        second = work[work['_rank'] == 1][key_cols + ['Transportadora', 'Tarifa', 'Custo_Ref']].rename(columns={
+            'Transportadora': 'Segunda_Transportadora', 'Tarifa': 'Segunda_Tarifa', 'Custo_Ref': 'Segunda_Custo'
+        })
+
+        matrix = best.merge(second, on=key_cols, how='left').merge(counts, on=key_cols, how='left')
+        return matrix.sort_values(key_cols, kind='mergesort').reset_index(drop=True)
+
+    def get_carrier_matrix(self, fluxo_name):
+        """
+        Retorna a matriz de melhor/segunda transportadora de um fluxo
+        Usa cache Parquet ao lado do parquet do fluxo, refeito quando o fluxo muda
+        """
+        matrix = self.carrier_matrix.get(fluxo_name)
+        if matrix is not None and fluxo_name in self._carrier_index:
+            return matrix
+        if fluxo_name not in self.fluxo_data:
+            return None
+
+        fluxo_dir = self.fluxo_dirs.get(fluxo_name)
+        matrix_path = Path(fluxo_dir) / f"{fluxo_name}_transportadoras.parquet" if fluxo_dir else None
+        source_path = Path(fluxo_dir) / f"{fluxo_name}.parquet" if fluxo_dir else None
+
+        # Matriz já em memória (restaurada do snapshot) só precisa do índice
+        if matrix is None and matrix_path is not None and matrix_path.exists() and source_path.exists() \
+                and matrix_path.stat().st_mtime >= source_path.stat().st_mtime:
+            try:
+                matrix = pd.read_parquet(matrix_path, engine='pyarrow')
+                logger.debug('📁 Loaded carrier matrix for %s from cache (%s rows)', fluxo_name, len(matrix))
+            except Exception as e:
+                logger.warning('⚠️  Failed to load carrier matrix parquet, rebuilding: %s', e)
+                matrix = None
+
+        if matrix is None:
+            with profiling.stage('index'):
+                matrix = self._build_carrier_matrix(fluxo_name, self.fluxo_data[fluxo_name])
+            logger.info('✓ Carrier matrix built for %s: %s rows', fluxo_name, len(matrix))
+            if matrix_path is not None:
+                try:
+                    matrix.to_parquet(matrix_path, engine='pyarrow', compression='snappy')
+                except Exception as e:
+                    logger.warning('⚠️  Failed to create carrier matrix parquet: %s', e)
+
+        # Índice {(origem, destino, veiculo): [opções]} para consulta em O(1)
+        with profiling.stage('index'):
+            index = {}
+            for record in matrix.to_dict('records'):
+                key = (record['Origem'], record['Destino'], record['Veiculo'])
+                index.setdefault(key, []).append(record)
+
+        self.carrier_matrix[fluxo_name] = matrix
+        self._carrier_index[fluxo_name] = index
+        return matrix
+
+    def get_best_carriers(self, fluxo_name, origem, destino, veiculo, viagem=None, km_value=None):
+        """
+        Consulta a matriz pré-calculada: melhor e segunda melhor transportadora
+        para uma rota (chave exata Origem/Destino/Veiculo, sem distinção de maiúsculas)
+        
+        Args:
+            viagem: Tipo de viagem (RT/OW) - None = todos
+            km_value: Distância em KM - filtra a faixa DistanciaMin/Max quando existir
+        """
+        if self.get_carrier_matrix(fluxo_name) is None:
+            return {
+                'status': 'error',
+                'message': f'Fluxo {fluxo_name} não encontrado'
+            }
+
+        key = tuple(str(v if v else 'N/A').strip().upper() for v in (origem, destino, veiculo))
+        options = self._carrier_index[fluxo_name].get(key, [])
+
+        viagem_normalized = self._normalize_viagem_input(viagem)
+        if viagem_normalized:
+            options = [o for o in options if o['Viagem'] == viagem_normalized]
+        if km_value:
+            options = [
+                o for o in options
+                if pd.isna(o['DistanciaMin']) or (o['DistanciaMin'] <= km_value <= o['DistanciaMax'])
+            ]
+
+        if not options:
+            return {
+                'status': 'not_found',
+                'message': 'Nenhuma transportadora encontrada para a rota'
+            }
+        return {
+            'status': 'success',
+            'fluxo': fluxo_name,
+            'opcoes': options
+        }
+
+    def snapshot_state(self):
+        """
+        Tabelas e índices de Tarifa para o snapshot do database
+
+        Returns:
+            ({nome: DataFrame}, metadados JSON) - dados de cada fluxo, matriz de transportadoras
+            (montada aqui se ainda não existir), pastas relativas ao database e aliases de fluxo
+        """
+        db_path = Path(self.db_folder)
+
+        def relative(folder):
+            return Path(folder).relative_to(db_path).as_posix() if folder else None
+
+        tables = {}
+        for fluxo_name, df in self.fluxo_data.items():
+            tables[f"fluxo:{fluxo_name}"] = df
+            matrix = self.get_carrier_matrix(fluxo_name)
+            if matrix is not None:
+                tables[f"carriers:{fluxo_name}"] = matrix
+        meta = {
+            'fluxos': list(self.fluxo_data),
+            'tarifa_base_folder': relative(self.tarifa_base_folder),
+            'fluxo_dirs': {name: relative(folder) for name, folder in self.fluxo_dirs.items()},
+            'fluxo_aliases': dict(self._fluxo_aliases),
+        }
+        return tables, meta
+
+    def restore_state(self, db_folder, meta, tables):
+        """Recoloca o estado salvo por snapshot_state (índice de transportadoras é refeito no primeiro uso)"""
+        db_path = Path(db_folder)
+
+        def absolute(folder):
+            return str(db_path / folder) if folder else None
+
+        self.db_folder = db_folder
+        self.tarifa_base_folder = absolute(meta.get('tarifa_base_folder'))
+        self.fluxo_dirs = {name: absolute(folder) for name, folder in meta.get('fluxo_dirs', {}).items()}
+        self.fluxo_data = {name: tables[f"fluxo:{name}"] for name in meta.get('fluxos', [])}
+        self.carrier_matrix = {name: tables[f"carriers:{name}"] for name in self.fluxo_data
+                               if f"carriers:{name}" in tables}
+        self._carrier_index = {}
+        self._fluxo_aliases = dict(meta.get('fluxo_aliases', {}))
+        self._fluxo_resolve_cache = {}
+        self._geoship_lookup = None
+        self._geoship_loaded = False
+
     def clear_data(self):
         """Limpa todos os dados carregados"""
         self.fluxo_data = {}
         self.tarifa_base_folder = None
+        self.fluxo_dirs = {}
+        self.carrier_matrix = {}
+        self._carrier_index = {}
+        self._fluxo_aliases = {}
+        self._fluxo_resolve_cache = {}
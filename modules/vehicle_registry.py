@@ -0,0 +1,234 @@
+"""
+Cadastro único de veículos (VEÍCULOS.xlsx)
+Carregado uma vez por pasta e compartilhado pelos caminhos Viajante, QME e Tarifa
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VEHICLE_FILES = ["VEÍCULOS.xlsx", "VEICULOS.xlsx", "Veiculos.xlsx", "VEICULOS.xls"]
+
+# Pasta BD padrão do Viajante (onde fica o VEÍCULOS.xlsx)
+DEFAULT_BD_FOLDER = Path(__file__).resolve().parent.parent / "Viajante" / "BD"
+
+# Veículo imediatamente menor, usado na saturação "com veículo menor" do Viajante
+PREVIOUS_VEHICLE = {
+    **{code: 3 for code in (4, 5, 6, 7, 8, 9, 14, 19)},
+    **{code: 1 for code in (2, 3, 12, 13, 15, 16, 17, 18, 20)},
+    1: 10,
+    10: 11,
+    11: 11,
+}
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def canonical_tariff_class(name):
+    """Classe de veículo usada nas tabelas de Tarifa/TDC (ex: 'CARRETA LINE HAUL' -> 'CARRETA')"""
+    if name is None or not str(name).strip():
+        return None
+    clean_name = str(name).strip().upper()
+    if 'BITREM' in clean_name:
+        return 'BITREM'
+    if 'VANDERLEIA' in clean_name:
+        return 'VANDERLEIA'
+    if 'CARRETA' in clean_name:
+        return 'CARRETA'
+    if 'VAN' in clean_name or 'DUCATO' in clean_name:
+        return 'VAN'
+    if '3/4' in clean_name or '0.75' in clean_name:
+        return '3/4'
+    if 'TOCO' in clean_name:
+        return 'TOCO'
+    if 'TRUCK' in clean_name:
+        return 'TRUCK'
+    if 'FIORINO' in clean_name:
+        return 'FIORINO'
+    return clean_name
+
+
+def _detect_columns(df):
+    """Detecta as colunas de código e descrição (prefere 'COD VEICULO' e 'DESCRICAO')"""
+    cols_upper = {str(c).strip().upper(): c for c in df.columns}
+    cod_col = None
+    desc_col = None
+    for key_upper, orig in cols_upper.items():
+        if 'COD' in key_upper and 'VEIC' in key_upper:
+            cod_col = orig
+        if 'DESCR' in key_upper or 'DESC' in key_upper:
+            desc_col = orig
+
+    # fallback: primeira coluna = código, segunda = descrição
+    if cod_col is None and len(df.columns) >= 1:
+        cod_col = df.columns[0]
+    if desc_col is None and len(df.columns) >= 2:
+        desc_col = df.columns[1]
+    return cod_col, desc_col
+
+
+def _file_signature(bd_folder):
+    """(arquivo de veículos encontrado, mtime); muda quando o arquivo é criado ou alterado"""
+    for name in VEHICLE_FILES:
+        path = Path(bd_folder) / name
+        if path.exists():
+            return path, path.stat().st_mtime
+    return None, None
+
+
+def _to_code(value):
+    """Código de veículo como int (aceita 4, 4.0, '4'); None se não for numérico"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+        return int(float(str(value).strip()))
+    except (TypeError, ValueError):
+        return None
+
+
+class VehicleRegistry:
+    """Veículos por código: nome, coluna de capacidade, PESO MAXIMO, M³, veículo menor e classe de tarifa"""
+
+    def __init__(self, bd_folder=None, df=None):
+        """df: conteúdo já lido do VEÍCULOS.xlsx (snapshot do database); sem df o arquivo é lido"""
+        self.bd_folder = Path(bd_folder) if bd_folder else DEFAULT_BD_FOLDER
+        self.signature = _file_signature(self.bd_folder)
+        self.file_path = self.signature[0]
+        self.df = pd.DataFrame()
+        self.vehicles = {}       # {code: {...}}
+        self.code_to_name = {}   # {code (int e str original): nome}
+        self._code_by_name = {}  # {NOME: code}
+        self._display = {}       # {nome original: code}
+
+        if df is not None:
+            self.df = df
+            self._build()
+            return
+        if self.file_path is None:
+            logger.warning('VEÍCULOS.xlsx não encontrado em %s', self.bd_folder)
+            return
+        try:
+            self.df = pd.read_excel(self.file_path, sheet_name=0)
+        except Exception as e:
+            logger.warning('Could not read %s: %s', self.file_path, e)
+            return
+        self._build()
+
+    def _build(self):
+        cod_col, desc_col = _detect_columns(self.df)
+        if desc_col is None:
+            logger.warning('Could not detect vehicle description column in %s', self.file_path)
+            return
+
+        columns = {
+            'capacity_column': 'VEICULOS',
+            'peso_maximo': 'PESO MAXIMO',
+            'capacidade_m3': 'M³ EQUIPAMENTO' if 'M³ EQUIPAMENTO' in self.df.columns else 'CAPACIDADE M³',
+        }
+        for record in self.df.to_dict('records'):
+            raw_code = record.get(cod_col)
+            name = record.get(desc_col)
+            if pd.isna(raw_code) or pd.isna(name):
+                continue
+            name = str(name)
+            code = _to_code(raw_code)
+            self.code_to_name[str(raw_code)] = name
+            if name.strip() and name.strip() not in self._display:
+                self._display[name.strip()] = code if code is not None else str(raw_code).strip()
+            if code is None:
+                continue
+            self.code_to_name[code] = name
+            self._code_by_name[name.upper().strip()] = code
+            vehicle = {'code': code, 'name': name}
+            for key, col in columns.items():
+                value = record.get(col)
+                vehicle[key] = None if value is None or pd.isna(value) else value
+            vehicle['previous_code'] = PREVIOUS_VEHICLE.get(code)
+            vehicle['tariff_class'] = canonical_tariff_class(name)
+            self.vehicles[code] = vehicle
+
+    # ------------------------------------------------------------------
+    def get(self, vehicle):
+        """Veículo por código (4, '4') ou nome ('CARRETA'); None se não existir"""
+        code = self.code_for(vehicle)
+        return self.vehicles.get(code) if code is not None else None
+
+    def code_for(self, vehicle):
+        """Código do veículo a partir do nome (sem diferenciar maiúsculas) ou do próprio código"""
+        if vehicle is None:
+            return None
+        name = str(vehicle).strip().upper()
+        if name in self._code_by_name:
+            return self._code_by_name[name]
+        code = _to_code(vehicle)
+        return code if code in self.vehicles else None
+
+    def name_for(self, code):
+        vehicle = self.vehicles.get(_to_code(code))
+        return vehicle['name'] if vehicle else None
+
+    def capacity_columns(self):
+        """{code: coluna de capacidade no BD_CADASTRO_MDR} (ex: 4 -> '14 x 2,4 x 2,78')"""
+        return {code: v['capacity_column'] for code, v in self.vehicles.items() if v['capacity_column'] is not None}
+
+    def previous_code(self, code):
+        vehicle = self.vehicles.get(_to_code(code))
+        return vehicle['previous_code'] if vehicle else PREVIOUS_VEHICLE.get(_to_code(code))
+
+    def display_map(self):
+        """{descrição: código} na ordem do arquivo, para os combos da interface"""
+        return dict(self._display)
+
+    def names_upper(self):
+        """{NOME: código}, para aceitar nomes de veículo sem diferenciar maiúsculas"""
+        return dict(self._code_by_name)
+
+    def tariff_class(self, vehicle):
+        """Classe de tarifa do veículo (código ou nome); nomes fora do cadastro são normalizados direto"""
+        registered = self.get(vehicle)
+        if registered is not None:
+            return registered['tariff_class']
+        return canonical_tariff_class(vehicle)
+
+
+def get_vehicle_registry(bd_folder=None):
+    """Registry compartilhado por pasta BD; recarrega se o VEÍCULOS.xlsx mudar"""
+    key = os.path.abspath(bd_folder) if bd_folder else str(DEFAULT_BD_FOLDER)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is not None and registry.signature == _file_signature(key):
+            return registry
+        registry = VehicleRegistry(key)
+        _registries[key] = registry
+        return registry
+
+
+def registry_snapshot(bd_folder=None):
+    """(DataFrame lido, metadados) do registry compartilhado, para o snapshot do database"""
+    registry = get_vehicle_registry(bd_folder)
+    if registry.file_path is None or registry.df.empty:
+        return None, None
+    return registry.df, {'bd_folder': str(registry.bd_folder), 'file': str(registry.file_path),
+                         'mtime': registry.signature[1]}
+
+
+def restore_registry(meta, df):
+    """Recoloca o registry salvo no cache compartilhado se o VEÍCULOS.xlsx não mudou; True se usou"""
+    if not meta or df is None:
+        return False
+    key = os.path.abspath(meta['bd_folder'])
+    if _file_signature(key) != (Path(meta['file']), meta['mtime']):
+        return False
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None or registry.signature != _file_signature(key):
+            _registries[key] = VehicleRegistry(key, df=df)
+    return True
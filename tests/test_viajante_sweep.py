@@ -0,0 +1,63 @@
+"""Re-ranking da varredura de veículos pelo frete (Api._run_viajante_sweep)"""
+
+import pandas as pd
+
+import Viajante
+from api import Api
+from modules import profiling
+
+
+class FakeSapLookup:
+    """Tarifa RT fixa por classe de veículo"""
+
+    def __init__(self, tarifas):
+        self.tarifas = tarifas
+
+    def resolve_tarifa_fluxo(self, fluxo):
+        return fluxo
+
+    def quote_tariffs(self, fluxo_name, origem, destino, veiculo, km_value, viagens):
+        return {'best_by_viagem': {'RT': {'status': 'success', 'tarifa_real': self.tarifas[veiculo]}}}
+
+
+def ranking_row(posicao, cod, cargas, sem_capacidade=0):
+    return {'RANKING': posicao, 'COD VEICULO': cod, 'VEÍCULO': cod, 'CARGAS': cargas,
+            'MDRs SEM CAPACIDADE': sem_capacidade}
+
+
+def make_api(monkeypatch, ranking, tarifas):
+    api = Api()
+    api.profiler = profiling.Profiler(log_file=None)
+    api.__dict__['sap_lookup'] = FakeSapLookup(tarifas)
+    monkeypatch.setattr(api, '_normalize_veiculo', lambda veiculo: veiculo)
+    monkeypatch.setattr(Viajante, 'run_viajante_sweep',
+                        lambda *args, **kwargs: {'status': 'success', 'ranking': [dict(r) for r in ranking],
+                                                 'results': []})
+    session = api.sessions.get(None)
+    session.demanda_data = pd.DataFrame({'PN': ['1']})
+    session.cidade_destino = '1080'
+    return api
+
+
+def test_incomplete_vehicle_stays_last_with_lowest_freight(monkeypatch):
+    # Ordem do motor: completos pelas CARGAS, o veículo com MDRs sem capacidade no fim
+    ranking = [ranking_row(1, 'CARRETA', 10), ranking_row(2, 'TRUCK', 14), ranking_row(3, 'VAN', 2, sem_capacidade=3)]
+    api = make_api(monkeypatch, ranking, {'CARRETA': 1000.0, 'TRUCK': 500.0, 'VAN': 100.0})
+
+    result = api._run_viajante_sweep('800005741', fluxo='CROSSDOCK', origem='A', destino='B')
+
+    assert result['status'] == 'success'
+    # VAN tem o menor frete (200) mas a saturação está incompleta: continua em último
+    assert [r['COD VEICULO'] for r in result['ranking']] == ['TRUCK', 'CARRETA', 'VAN']
+    assert [r['RANKING'] for r in result['ranking']] == [1, 2, 3]
+    assert result['ranking'][-1]['FRETE TOTAL (R$)'] == 200.0
+
+
+def test_vehicles_without_tariff_go_after_priced_ones(monkeypatch):
+    ranking = [ranking_row(1, 'CARRETA', 10), ranking_row(2, 'TRUCK', 14)]
+    api = make_api(monkeypatch, ranking, {'CARRETA': None, 'TRUCK': 500.0})
+
+    result = api._run_viajante_sweep('800005741', fluxo='CROSSDOCK', origem='A', destino='B')
+
+    assert [r['COD VEICULO'] for r in result['ranking']] == ['TRUCK', 'CARRETA']
+    assert result['ranking'][1]['FRETE TOTAL (R$)'] is None